@@ -1,8 +1,47 @@
 from dotenv import load_dotenv
 load_dotenv()   # ← make sure this is the very first thing in __init__.py
 
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from .main import router
+from . import cache, clients, embeddings, telemetry, warmup
+from .jobs import publish_queue
+from .ingest import ingestor, INGEST_ENABLED
 
-app = FastAPI(title="Carism Viral‑Automation API", version="0.1.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Pooled HTTP clients shared by scraping, publishing and embeddings
+    await clients.startup()
+    # Models and the LLM client load in the background; see /ready
+    warmup.start()
+    await publish_queue.start()
+    # Keep scored snapshots of the catalogue topics fresh for /trends/*
+    if INGEST_ENABLED:
+        await ingestor.start()
+    yield
+    await ingestor.stop()
+    await publish_queue.stop()
+    await warmup.stop()
+    await embeddings.shutdown()
+    await cache.close_backend()
+    await clients.shutdown()
+
+app = FastAPI(title="Carism Viral‑Automation API", version="0.1.0", lifespan=lifespan)
 app.include_router(router)
+
+@app.exception_handler(embeddings.EmbeddingQueueFull)
+async def embedding_queue_full(request: Request, exc: embeddings.EmbeddingQueueFull):
+    # Backpressure from the local encoder: ask the client to come back shortly
+    return JSONResponse({"detail": str(exc)}, status_code=503, headers={"Retry-After": "1"})
+
+if telemetry.SERVER_TIMING:
+    @app.middleware("http")
+    async def server_timing(request: Request, call_next):
+        # Streamed bodies finish after the headers are sent, so only stages
+        # completed before the response starts are reported
+        timings = telemetry.start_request()
+        response = await call_next(request)
+        if timings:
+            response.headers["Server-Timing"] = telemetry.server_timing_header(timings)
+        return response
@@ -0,0 +1,175 @@
+# <app/cache.py>
+import asyncio, os, sqlite3, threading, time
+from collections import OrderedDict
+
+REDIS_URL = os.getenv("REDIS_URL")
+LOCAL_CACHE_PATH = os.getenv("LOCAL_CACHE_PATH", "cache.sqlite3")
+
+class LRUCache:
+    """Bounded in-process cache with optional per-entry TTL (seconds)."""
+
+    def __init__(self, maxsize=10000, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+
+    def get(self, key, default=None):
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        value, expires = entry
+        if expires is not None and expires < time.time():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value, ttl=None):
+        ttl = ttl if ttl is not None else self.ttl
+        self._data[key] = (value, time.time() + ttl if ttl else None)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        entry = self._data.pop(key, None)
+        return default if entry is None else entry[0]
+
+    def clear(self):
+        self._data.clear()
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __len__(self):
+        return len(self._data)
+
+class MemoryKV:
+    """In-process store with the same async interface as RedisKV (one worker only)."""
+
+    def __init__(self, maxsize=10000):
+        self._lru = LRUCache(maxsize)
+
+    async def mget(self, keys):
+        return [self._lru.get(key) for key in keys]
+
+    async def mset(self, mapping, ttl=None):
+        for key, value in mapping.items():
+            self._lru.set(key, value, ttl=ttl)
+
+    async def delete(self, *keys):
+        for key in keys:
+            self._lru.pop(key)
+
+    async def close(self):
+        self._lru.clear()
+
+class RedisKV:
+    """Bytes key/value store on Redis, batched with MGET and pipelines."""
+
+    def __init__(self, url):
+        import redis.asyncio as redis
+        self.client = redis.from_url(url)
+
+    async def mget(self, keys):
+        if not keys:
+            return []
+        return await self.client.mget(keys)
+
+    async def mset(self, mapping, ttl=None):
+        if not mapping:
+            return
+        async with self.client.pipeline(transaction=False) as pipe:
+            for key, value in mapping.items():
+                pipe.set(key, value, ex=int(ttl) if ttl else None)
+            await pipe.execute()
+
+    async def delete(self, *keys):
+        if keys:
+            await self.client.delete(*keys)
+
+    async def close(self):
+        await self.client.aclose()
+
+class SQLiteKV:
+    """
+    Local stand-in for RedisKV when REDIS_URL is unset.
+
+    Same interface, backed by one SQLite file so entries survive restarts of
+    the worker. Queries run in a thread to keep the event loop free.
+    """
+
+    _PURGE_EVERY = 500  # writes between expired-row sweeps
+
+    def __init__(self, path=LOCAL_CACHE_PATH):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value BLOB, expires REAL)"
+        )
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def _mget(self, keys):
+        found = {}
+        now = time.time()
+        with self._lock:
+            # Stay under SQLite's bound-parameter limit
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, value FROM kv WHERE key IN ({','.join('?' * len(chunk))})"
+                    " AND (expires IS NULL OR expires > ?)",
+                    (*chunk, now),
+                ).fetchall()
+                found.update(rows)
+        return [found.get(key) for key in keys]
+
+    def _mset(self, mapping, ttl):
+        expires = time.time() + ttl if ttl else None
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO kv (key, value, expires) VALUES (?, ?, ?)",
+                [(key, value, expires) for key, value in mapping.items()],
+            )
+            self._writes += len(mapping)
+            if self._writes >= self._PURGE_EVERY:
+                self._conn.execute("DELETE FROM kv WHERE expires IS NOT NULL AND expires <= ?", (time.time(),))
+                self._writes = 0
+            self._conn.commit()
+
+    def _delete(self, keys):
+        with self._lock:
+            self._conn.executemany("DELETE FROM kv WHERE key = ?", [(key,) for key in keys])
+            self._conn.commit()
+
+    async def mget(self, keys):
+        if not keys:
+            return []
+        return await asyncio.to_thread(self._mget, list(keys))
+
+    async def mset(self, mapping, ttl=None):
+        if mapping:
+            await asyncio.to_thread(self._mset, mapping, ttl)
+
+    async def delete(self, *keys):
+        if keys:
+            await asyncio.to_thread(self._delete, keys)
+
+    async def close(self):
+        with self._lock:
+            self._conn.close()
+
+_backend = None
+
+def get_backend():
+    """Shared second-tier store: Redis when REDIS_URL is set, SQLite otherwise."""
+    global _backend
+    if _backend is None:
+        _backend = RedisKV(REDIS_URL) if REDIS_URL else SQLiteKV()
+    return _backend
+
+async def close_backend():
+    global _backend
+    if _backend is not None:
+        backend, _backend = _backend, None
+        await backend.close()
@@ -0,0 +1,111 @@
+# <app/clients.py>
+import asyncio, os
+import aiohttp
+import httpx
+
+# Shared connection pools, created in the app lifespan (or lazily on first use)
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "100"))  # total open connections
+HTTP_POOL_PER_HOST = int(os.getenv("HTTP_POOL_PER_HOST", "20"))
+HTTP_KEEPALIVE = float(os.getenv("HTTP_KEEPALIVE", "30"))  # idle seconds before a connection closes
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "30"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
+HTTP2 = os.getenv("HTTP2", "true").lower() in ("1", "true", "yes")
+
+try:
+    import h2  # noqa: F401  (httpx only negotiates HTTP/2 when h2 is installed)
+    _HTTP2_AVAILABLE = True
+except ImportError:
+    _HTTP2_AVAILABLE = False
+
+_session = None
+_session_loop = None
+_httpx = None
+_httpx_loop = None
+_requests = {"aiohttp": 0, "httpx": 0}
+
+async def _count_aiohttp(session, ctx, params):
+    _requests["aiohttp"] += 1
+
+async def _count_httpx(request):
+    _requests["httpx"] += 1
+
+def get_session() -> aiohttp.ClientSession:
+    """
+    The shared aiohttp session (scraping, Azure embeddings).
+
+    Must be called from inside the event loop. A session left over from a
+    different loop (tests, scripts) is replaced rather than reused.
+    """
+    global _session, _session_loop
+    loop = asyncio.get_running_loop()
+    if _session is None or _session.closed or _session_loop is not loop:
+        trace = aiohttp.TraceConfig()
+        trace.on_request_start.append(_count_aiohttp)
+        _session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=HTTP_POOL_SIZE,
+                limit_per_host=HTTP_POOL_PER_HOST,
+                keepalive_timeout=HTTP_KEEPALIVE,
+                ttl_dns_cache=300,
+            ),
+            timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+            trace_configs=[trace],
+        )
+        _session_loop = loop
+    return _session
+
+def get_httpx() -> httpx.AsyncClient:
+    """The shared httpx client (publishing), HTTP/2 when h2 is installed."""
+    global _httpx, _httpx_loop
+    loop = asyncio.get_running_loop()
+    if _httpx is None or _httpx.is_closed or _httpx_loop is not loop:
+        _httpx = httpx.AsyncClient(
+            http2=HTTP2 and _HTTP2_AVAILABLE,
+            limits=httpx.Limits(
+                max_connections=HTTP_POOL_SIZE,
+                max_keepalive_connections=HTTP_POOL_PER_HOST,
+                keepalive_expiry=HTTP_KEEPALIVE,
+            ),
+            timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+            event_hooks={"request": [_count_httpx]},
+        )
+        _httpx_loop = loop
+    return _httpx
+
+async def startup():
+    get_session()
+    get_httpx()
+
+async def shutdown():
+    global _session, _httpx
+    session, client = _session, _httpx
+    _session = _httpx = None
+    if session is not None and not session.closed:
+        await session.close()
+    if client is not None and not client.is_closed:
+        await client.aclose()
+
+def pool_stats() -> dict:
+    """Connection pool usage for observability (best effort; pools may not exist yet)."""
+    stats = {
+        "requests": dict(_requests),
+        "limits": {"total": HTTP_POOL_SIZE, "per_host": HTTP_POOL_PER_HOST},
+        "http2": HTTP2 and _HTTP2_AVAILABLE,
+    }
+
+    if _session is not None and not _session.closed:
+        connector = _session.connector
+        stats["aiohttp"] = {
+            "in_use": len(getattr(connector, "_acquired", ())),
+            "idle": sum(len(conns) for conns in getattr(connector, "_conns", {}).values()),
+        }
+
+    if _httpx is not None and not _httpx.is_closed:
+        pool = getattr(getattr(_httpx, "_transport", None), "_pool", None)
+        connections = list(getattr(pool, "connections", []))
+        stats["httpx"] = {
+            "open": len(connections),
+            "idle": sum(1 for c in connections if c.is_idle()),
+        }
+
+    return stats
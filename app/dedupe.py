@@ -1,49 +1,186 @@
 # <app/dedupe.py>
-import hashlib
-from .utils import async_retry, embed_text
-import numpy as np
+import os
+from .utils import embed_texts, normalize_rows
+from .telemetry import instrumented
+from .items import as_items
 
-@async_retry()
+# Above this many items switch from exact blocked search to LSH buckets
+DEDUPE_LSH_MIN_ITEMS = int(os.getenv("DEDUPE_LSH_MIN_ITEMS", "20000"))
+DEDUPE_LSH_BITS = int(os.getenv("DEDUPE_LSH_BITS", "12"))
+DEDUPE_LSH_TABLES = int(os.getenv("DEDUPE_LSH_TABLES", "20"))
+DEDUPE_BLOCK_SIZE = int(os.getenv("DEDUPE_BLOCK_SIZE", "512"))
+DEDUPE_KEPT_CHUNK = int(os.getenv("DEDUPE_KEPT_CHUNK", "8192"))
+
+class DedupeIndex:
+    """
+    Running first-wins index of kept unit vectors.
+
+    Each add() compares a block against everything kept so far (in chunks, so
+    the similarity matrix never exceeds block x kept_chunk), then resolves the
+    block against its own earlier rows in order. Lets a stream of batches be
+    deduped incrementally with the same result as one big call.
+    """
+
+    def __init__(self, similarity_threshold=0.85, kept_chunk=DEDUPE_KEPT_CHUNK):
+        self.threshold = similarity_threshold
+        self.kept_chunk = kept_chunk
+        self._kept = None
+        self.size = 0
+        self._headlines = set()  # exact-match fallback when embedding fails
+
+    def add(self, unit):
+        """Add a block of unit vectors; return the block-local indices that were kept."""
+        import numpy as np
+        unit = np.asarray(unit, dtype=np.float32)
+        if len(unit) == 0:
+            return []
+        candidate = np.ones(len(unit), dtype=bool)
+
+        # Drop rows too similar to anything kept in earlier blocks
+        for k in range(0, self.size, self.kept_chunk):
+            sims = unit @ self._kept[k:min(k + self.kept_chunk, self.size)].T
+            candidate &= ~(sims > self.threshold).any(axis=1)
+
+        # Resolve the block itself: a kept row knocks out later rows it matches
+        intra = (unit @ unit.T) > self.threshold
+        kept = []
+        for j in range(len(unit)):
+            if not candidate[j]:
+                continue
+            candidate[j + 1:] &= ~intra[j, j + 1:]
+            kept.append(j)
+
+        self._append(unit[kept])
+        return kept
+
+    def _append(self, rows):
+        import numpy as np
+        if self._kept is None:
+            self._kept = np.empty((max(len(rows), 64), rows.shape[1]), dtype=np.float32)
+        needed = self.size + len(rows)
+        if needed > len(self._kept):
+            # Grow geometrically so appends stay amortized O(1) per row
+            grown = np.empty((max(needed, 2 * len(self._kept)), self._kept.shape[1]), dtype=np.float32)
+            grown[:self.size] = self._kept[:self.size]
+            self._kept = grown
+        self._kept[self.size:needed] = rows
+        self.size = needed
+
+    async def dedupe(self, items, provider="local"):
+        """Embed a batch of items and return the ones not seen before, in order."""
+        if not items:
+            return []
+        items = as_items(items)
+        try:
+            vectors = await embed_texts([item.headline for item in items], provider=provider)
+        except Exception as e:
+            # If embedding fails, fall back to exact match
+            print(f"Embedding failed ({e}), using exact match")
+            fresh = []
+            for item in items:
+                if item["headline"] not in self._headlines:
+                    self._headlines.add(item["headline"])
+                    fresh.append(item)
+            return fresh
+
+        kept = self.add(normalize_rows(vectors))
+        _attach_embeddings(items, kept, vectors)
+        kept = [items[i] for i in kept]
+        self._headlines.update(item.headline for item in kept)
+        return kept
+
+def _attach_embeddings(items, kept, vectors):
+    """Keep each surviving item's vector on it (one compact copy, not views of the whole batch)."""
+    rows = vectors[kept]
+    for i, row in zip(kept, rows):
+        items[i].embedding = row
+
+def _select_exact(unit, threshold, block_size=DEDUPE_BLOCK_SIZE, kept_chunk=DEDUPE_KEPT_CHUNK):
+    """Exact first-wins selection: feed DedupeIndex one block at a time."""
+    index = DedupeIndex(threshold, kept_chunk=kept_chunk)
+    kept_idx = []
+    for start in range(0, len(unit), block_size):
+        kept_idx.extend(start + j for j in index.add(unit[start:start + block_size]))
+    return kept_idx
+
+def _select_lsh(unit, threshold, n_bits=DEDUPE_LSH_BITS, n_tables=DEDUPE_LSH_TABLES, seed=0):
+    """
+    Approximate first-wins selection using random-hyperplane LSH.
+
+    Each kept row is filed under one bucket per table; a new row is only
+    compared (exactly) against kept rows sharing at least one bucket. Never
+    drops a non-duplicate, but may keep a duplicate whose buckets all differ -
+    more tables raise recall, more bits shrink buckets.
+    """
+    import numpy as np
+    n, dim = unit.shape
+    rng = np.random.default_rng(seed)
+    planes = rng.standard_normal((dim, n_tables * n_bits)).astype(np.float32)
+
+    # Bucket key per (row, table): pack the sign bits into one integer
+    bits = (unit @ planes > 0).reshape(n, n_tables, n_bits)
+    keys = bits.astype(np.int64) @ (1 << np.arange(n_bits, dtype=np.int64))
+
+    tables = [{} for _ in range(n_tables)]
+    kept_idx = []
+
+    for i in range(n):
+        row_keys = keys[i].tolist()
+        candidates = []
+        for table, key in zip(tables, row_keys):
+            bucket = table.get(key)
+            if bucket:
+                candidates.extend(bucket)
+
+        # Repeats across tables are harmless for an any() check
+        if candidates and (unit[candidates] @ unit[i] > threshold).any():
+            continue
+
+        kept_idx.append(i)
+        for table, key in zip(tables, row_keys):
+            table.setdefault(key, []).append(i)
+
+    return kept_idx
+
+def select_unique(vectors, similarity_threshold=0.85):
+    """
+    Indices of rows to keep, in input order.
+
+    A row is kept when its cosine similarity to every previously kept row is
+    <= similarity_threshold (first occurrence wins). Exact below
+    DEDUPE_LSH_MIN_ITEMS rows, LSH-approximate above it.
+    """
+    if len(vectors) == 0:
+        return []
+
+    unit = normalize_rows(vectors)
+    if len(unit) >= DEDUPE_LSH_MIN_ITEMS:
+        return _select_lsh(unit, similarity_threshold)
+    return _select_exact(unit, similarity_threshold)
+
+@instrumented("dedupe_headlines")
 async def dedupe_headlines(items, similarity_threshold=0.85):
     """Remove duplicates based on semantic similarity"""
     if not items:
         return []
-    
-    # For backwards compatibility, handle both list of dicts and list of items
-    if isinstance(items[0], dict):
-        items_list = items
-    else:
-        items_list = [item if isinstance(item, dict) else item.dict() for item in items]
-    
-    unique_items = []
-    seen_embeddings = []
-    
-    for item in items_list:
-        try:
-            # Get embedding for current headline
-            current_embedding = await embed_text(item["headline"], provider="local")
-            current_vec = np.array(current_embedding)
-            
-            # Check if it's too similar to existing items
-            is_duplicate = False
-            for seen_vec in seen_embeddings:
-                # Cosine similarity
-                similarity = np.dot(current_vec, seen_vec) / (
-                    np.linalg.norm(current_vec) * np.linalg.norm(seen_vec)
-                )
-                
-                if similarity > similarity_threshold:
-                    is_duplicate = True
-                    break
-            
-            if not is_duplicate:
-                unique_items.append(item)
-                seen_embeddings.append(current_vec)
-                
-        except Exception as e:
-            # If embedding fails, fall back to exact match
-            print(f"Embedding failed for: {item['headline']}, using exact match")
-            if item["headline"] not in [u["headline"] for u in unique_items]:
+
+    # Dicts and pydantic models become Items; Items pass through as they are
+    items_list = as_items(items)
+
+    try:
+        # One batched call for every headline instead of one per item
+        vectors = await embed_texts([item.headline for item in items_list], provider="local")
+    except Exception as e:
+        # If embedding fails, fall back to exact match
+        print(f"Embedding failed ({e}), using exact match")
+        unique_items = []
+        seen_headlines = set()
+        for item in items_list:
+            if item.headline not in seen_headlines:
+                seen_headlines.add(item.headline)
                 unique_items.append(item)
-    
-    return unique_items
+        return unique_items
+
+    kept = select_unique(vectors, similarity_threshold)
+    _attach_embeddings(items_list, kept, vectors)
+    return [items_list[i] for i in kept]
@@ -0,0 +1,339 @@
+# <app/embeddings.py>
+import asyncio, hashlib, os, threading
+from concurrent.futures import ThreadPoolExecutor
+from .cache import LRUCache, get_backend
+
+LOCAL_MODEL = os.getenv("EMBED_LOCAL_MODEL", "all-MiniLM-L6-v2")
+EMBED_DEVICE = os.getenv("EMBED_DEVICE") or None  # "cpu", "cuda", "mps" - auto-detected when unset
+EMBED_THREADS = int(os.getenv("EMBED_THREADS", "0"))  # 0 = leave torch default
+EMBED_WARMUP = os.getenv("EMBED_WARMUP", "true").lower() in ("1", "true", "yes")
+OPENAI_EMBED_MODEL = os.getenv("OPENAI_EMBED_MODEL", "text-embedding-3-small")
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "10000"))
+EMBED_CACHE_TTL = int(os.getenv("EMBED_CACHE_TTL", str(7 * 24 * 3600)))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))  # model.encode batch size
+# Local inference runs in a thread pool (threads share one copy of the weights;
+# torch releases the GIL while encoding) so the event loop never blocks on it
+EMBED_POOL_SIZE = int(os.getenv("EMBED_POOL_SIZE", "1"))
+# Extra wait for more calls to merge when a pool thread is idle; while every
+# thread is busy, calls merge anyway until one frees up (or this much time passes)
+EMBED_MAX_BATCH_LATENCY_MS = float(os.getenv("EMBED_MAX_BATCH_LATENCY_MS", "0"))
+EMBED_MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", "256"))  # texts that trigger an early flush
+EMBED_MAX_QUEUE = int(os.getenv("EMBED_MAX_QUEUE", "20000"))  # texts queued or encoding before rejecting
+
+# Model behind each provider - part of the cache key so a model swap never reuses stale vectors
+MODEL_NAMES = {
+    "local": LOCAL_MODEL,
+    "openai": OPENAI_EMBED_MODEL,
+    "azure": "carismindex",
+}
+
+# One loaded model/client per provider, shared by every request in this worker
+_models = {}
+_status = {}
+_lock = threading.Lock()
+
+def _load_local():
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        raise ImportError(
+            "sentence-transformers not installed. "
+            "Run: pip install sentence-transformers"
+        )
+
+    if EMBED_THREADS:
+        import torch
+        torch.set_num_threads(EMBED_THREADS)
+
+    # Downloads on first use (~400MB), cached on disk afterwards
+    return SentenceTransformer(LOCAL_MODEL, device=EMBED_DEVICE)
+
+def _load_openai():
+    OPENAI_KEY = os.getenv("OPENAI_API_KEY")
+
+    if not OPENAI_KEY:
+        raise ValueError("OpenAI API key not configured")
+
+    import openai
+    return openai.AsyncOpenAI(api_key=OPENAI_KEY)
+
+_LOADERS = {
+    "local": _load_local,
+    "openai": _load_openai,
+}
+
+def get_model(provider: str = "local"):
+    """
+    Return the process-wide model (or client) for a provider, loading it on first use.
+
+    Loading is guarded by a lock so concurrent first requests only load once.
+    """
+    model = _models.get(provider)
+    if model is not None:
+        return model
+
+    if provider not in _LOADERS:
+        raise ValueError(f"Unknown provider: {provider}")
+
+    with _lock:
+        model = _models.get(provider)
+        if model is None:
+            _status[provider] = "loading"
+            try:
+                model = _LOADERS[provider]()
+            except Exception:
+                _status[provider] = "error"
+                raise
+            _models[provider] = model
+            _status[provider] = "ready"
+    return model
+
+def model_status() -> dict:
+    """Load state per provider: "loading", "ready" or "error" (absent = never requested)."""
+    return dict(_status)
+
+def is_ready(provider: str = "local") -> bool:
+    return _status.get(provider) == "ready"
+
+async def warm_up(providers=("local",)):
+    """
+    Load models ahead of the first request (called from the app lifespan).
+
+    Runs the load in a thread so the event loop stays responsive, and does one
+    throwaway encode so lazy weight initialisation is paid here too. Failures
+    are logged, not raised - the API still serves non-embedding endpoints.
+    """
+    for provider in providers:
+        try:
+            await asyncio.to_thread(get_model, provider)
+            if provider == "local":
+                await local_encoder.encode(["warm up"])
+        except Exception as e:
+            print(f"Embedding warm-up failed for {provider}: {e}")
+
+async def shutdown():
+    """Release loaded models and close any API clients."""
+    local_encoder.close()
+    with _lock:
+        models = list(_models.items())
+        _models.clear()
+        _status.clear()
+
+    for provider, model in models:
+        close = getattr(model, "close", None)
+        if provider != "local" and close is not None:
+            try:
+                await close()
+            except Exception as e:
+                print(f"Failed to close {provider} client: {e}")
+
+    if EMBED_DEVICE and EMBED_DEVICE.startswith("cuda"):
+        import torch
+        torch.cuda.empty_cache()
+
+class EmbeddingQueueFull(RuntimeError):
+    """Raised when the local encoder already holds EMBED_MAX_QUEUE texts."""
+
+class LocalEncoder:
+    """
+    Micro-batching front for the local model, run off the event loop.
+
+    Calls that arrive while every pool thread is encoding are merged into one
+    model.encode() that starts as soon as a thread frees up; with an idle
+    thread a call starts after max_batch_latency_ms (immediately by default).
+    A batch is also flushed once max_batch texts are waiting. Calls larger
+    than max_batch go through in max_batch pieces, pool_size at a time, so
+    they queue like many small calls. Queue depth counts texts waiting or
+    encoding; a call whose first piece would push it past max_queue (while
+    other work is queued) is rejected with EmbeddingQueueFull.
+    """
+
+    def __init__(self, pool_size=EMBED_POOL_SIZE, max_batch_latency_ms=EMBED_MAX_BATCH_LATENCY_MS,
+                 max_batch=EMBED_MAX_BATCH, max_queue=EMBED_MAX_QUEUE, batch_size=EMBED_BATCH_SIZE):
+        self.pool_size = pool_size
+        self.max_batch_latency = max_batch_latency_ms / 1000
+        self.max_batch = max_batch
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.depth = 0
+        self._executor = None
+        self._loop = None
+        self._pending = []  # (texts, future) waiting for the next flush
+        self._pending_texts = 0
+        self._timer = None
+        self._running = 0
+        self._tasks = set()
+        self.counters = {"calls": 0, "encodes": 0, "texts": 0, "merged_calls": 0, "rejected": 0}
+
+    def _bind(self, loop):
+        # State is per event loop (tests and benchmarks run several)
+        if self._loop is not loop:
+            self._loop = loop
+            self._pending, self._pending_texts, self._timer = [], 0, None
+            self.depth = self._running = 0
+
+    async def encode(self, texts):
+        """Embed texts with the local model; returns an (n, d) float32 matrix."""
+        self._bind(asyncio.get_running_loop())
+        texts = list(texts)
+        step = self.max_batch
+        if self.depth and self.depth + min(len(texts), step) > self.max_queue:
+            self.counters["rejected"] += 1
+            raise EmbeddingQueueFull(f"local encoder queue full ({self.depth} texts)")
+        self.counters["calls"] += 1
+        if len(texts) <= step:
+            return await self._submit(texts)
+
+        import numpy as np
+        parts = []
+        window = step * self.pool_size
+        for start in range(0, len(texts), window):
+            end = min(start + window, len(texts))
+            parts.extend(await asyncio.gather(*(self._submit(texts[i:i + step]) for i in range(start, end, step))))
+        return np.concatenate(parts)
+
+    async def _submit(self, texts):
+        loop = self._loop
+        self.depth += len(texts)
+        future = loop.create_future()
+        self._pending.append((texts, future))
+        self._pending_texts += len(texts)
+        idle = self._running < self.pool_size
+        if self._pending_texts >= self.max_batch or (idle and self.max_batch_latency <= 0):
+            self._flush()
+        elif idle and self._timer is None:
+            self._timer = loop.call_later(self.max_batch_latency, self._flush)
+        # else: every thread is busy; _run() flushes when one frees up
+        try:
+            return await future
+        finally:
+            self.depth -= len(texts)
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending, self._pending_texts = self._pending, [], 0
+        if batch:
+            self._running += 1
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def _encode(self, texts):
+        import numpy as np
+        model = get_model("local")
+        vectors = model.encode(texts, batch_size=self.batch_size, convert_to_numpy=True, show_progress_bar=False)
+        return np.asarray(vectors, dtype=np.float32)
+
+    async def _run(self, batch):
+        texts = [text for chunk, _ in batch for text in chunk]
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.pool_size, thread_name_prefix="embed")
+        self.counters["encodes"] += 1
+        self.counters["texts"] += len(texts)
+        self.counters["merged_calls"] += len(batch) - 1
+        try:
+            vectors = await asyncio.get_running_loop().run_in_executor(self._executor, self._encode, texts)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self._running -= 1
+            if self._pending and self._running < self.pool_size:
+                self._flush()
+
+        offset = 0
+        for chunk, future in batch:
+            if not future.done():  # caller may have been cancelled
+                future.set_result(vectors[offset:offset + len(chunk)])
+            offset += len(chunk)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {**self.counters, "depth": self.depth, "pool_size": self.pool_size, "max_queue": self.max_queue}
+
+local_encoder = LocalEncoder()
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache keyed by (provider, model, normalized-text hash).
+
+    Tier 1 is a bounded in-process LRU of float32 vectors, tier 2 the shared
+    Redis/SQLite store (see app/cache.py) holding the raw float32 bytes with
+    a TTL. Backend failures are counted and treated as misses.
+    """
+
+    def __init__(self, maxsize=EMBED_CACHE_SIZE, ttl=EMBED_CACHE_TTL):
+        self.memory = LRUCache(maxsize)
+        self.ttl = ttl
+        self.counters = {"memory_hits": 0, "backend_hits": 0, "misses": 0, "backend_errors": 0}
+
+    @staticmethod
+    def key(provider: str, text: str) -> str:
+        normalized = " ".join(text.split())
+        digest = hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+        return f"emb:{provider}:{MODEL_NAMES.get(provider, '')}:{digest}"
+
+    async def get_many(self, keys: list) -> dict:
+        """Return {key: vector} for every key found in either tier."""
+        import numpy as np
+        found = {}
+        remote = []
+        for key in dict.fromkeys(keys):
+            vec = self.memory.get(key)
+            if vec is None:
+                remote.append(key)
+            else:
+                found[key] = vec
+        self.counters["memory_hits"] += len(found)
+
+        if remote:
+            try:
+                values = await get_backend().mget(remote)
+            except Exception as e:
+                print(f"Embedding cache backend read failed: {e}")
+                self.counters["backend_errors"] += 1
+                values = [None] * len(remote)
+
+            for key, raw in zip(remote, values):
+                if raw is None:
+                    self.counters["misses"] += 1
+                    continue
+                vec = np.frombuffer(raw, dtype=np.float32)
+                self.memory.set(key, vec)
+                found[key] = vec
+                self.counters["backend_hits"] += 1
+        return found
+
+    async def set_many(self, vectors: dict):
+        """Store {key: vector} in both tiers."""
+        import numpy as np
+        payload = {}
+        for key, vec in vectors.items():
+            vec = np.asarray(vec, dtype=np.float32)
+            self.memory.set(key, vec)
+            payload[key] = vec.tobytes()
+        try:
+            await get_backend().mset(payload, ttl=self.ttl)
+        except Exception as e:
+            print(f"Embedding cache backend write failed: {e}")
+            self.counters["backend_errors"] += 1
+
+    def stats(self) -> dict:
+        lookups = self.counters["memory_hits"] + self.counters["backend_hits"] + self.counters["misses"]
+        hits = lookups - self.counters["misses"]
+        return {
+            **self.counters,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_size": len(self.memory),
+            "memory_maxsize": self.memory.maxsize,
+        }
+
+embedding_cache = EmbeddingCache()
@@ -1,14 +1,194 @@
-from langchain_openai import ChatOpenAI
 from .utils import async_retry
-import os
+from .cache import MemoryKV, get_backend
+from .telemetry import cache_requests, instrumented
+import asyncio, hashlib, itertools, json, os, threading, time
 
-llm = ChatOpenAI(model="gpt-4o", temperature=0.5)
+GENERATE_MODEL = os.getenv("GENERATE_MODEL", "gpt-4o")
+GENERATE_TEMPERATURE = float(os.getenv("GENERATE_TEMPERATURE", "0.5"))
+GENERATE_MAX_TOKENS = int(os.getenv("GENERATE_MAX_TOKENS", "300"))  # per completion
+GENERATE_CONCURRENCY = int(os.getenv("GENERATE_CONCURRENCY", "4"))  # batch completions in flight
+GENERATE_TOKEN_BUDGET = int(os.getenv("GENERATE_TOKEN_BUDGET", "50000"))  # per batch request
+GENERATE_BATCH_MAX_JOBS = int(os.getenv("GENERATE_BATCH_MAX_JOBS", "500"))
+COPY_CACHE_TTL = int(os.getenv("COPY_CACHE_TTL", str(24 * 3600)))  # 0 disables
+COPY_CACHE_SIZE = int(os.getenv("COPY_CACHE_SIZE", "2000"))
+COPY_CACHE_BACKEND = os.getenv("COPY_CACHE_BACKEND", "memory")  # "memory" or "redis"
 
-@async_retry()
-async def generate_copy(headline:str, tone:str, platform:str):
-    prompt = (f"Write a {tone} {platform} post (max 50 words) about: '{headline}'.\n"
-              f"Return JSON with keys text, image_prompt.")
-    resp = llm.invoke(prompt)
-    return resp.content
+PROMPT_VERSION = "v1"  # bump whenever build_prompt changes so old copy isn't served
 
+# langchain_openai takes about a second to import, so the client is built on
+# first use (or by warm_up() in the background) rather than at app import
+_llm = None
+_llm_lock = threading.Lock()
 
+def get_llm():
+    global _llm
+    if _llm is None:
+        with _llm_lock:
+            if _llm is None:
+                from langchain_openai import ChatOpenAI
+                _llm = ChatOpenAI(model=GENERATE_MODEL, temperature=GENERATE_TEMPERATURE,
+                                  max_tokens=GENERATE_MAX_TOKENS)
+    return _llm
+
+def llm_ready() -> bool:
+    return _llm is not None
+
+async def warm_up():
+    """Import langchain and build the client off the event loop."""
+    try:
+        await asyncio.to_thread(get_llm)
+    except Exception as e:
+        print(f"LLM warm-up failed: {e}")
+
+def build_prompt(headline: str, tone: str, platform: str) -> str:
+    return (f"Write a {tone} {platform} post (max 50 words) about: '{headline}'.\n"
+            f"Return JSON with keys text, image_prompt.")
+
+class CopyCache:
+    """
+    Cache of generated copy keyed by a hash of prompt version, model, temperature and prompt.
+
+    Entries remember what they cost, so hits can report the tokens and
+    latency they saved. Backend is per-worker LRU memory or the shared
+    Redis/SQLite store; failures degrade to misses.
+    """
+
+    def __init__(self, ttl=COPY_CACHE_TTL, maxsize=COPY_CACHE_SIZE, backend=COPY_CACHE_BACKEND):
+        self.ttl = ttl
+        self.backend_name = backend
+        self._backend = MemoryKV(maxsize) if backend == "memory" else None
+        self.counters = {"hits": 0, "misses": 0, "bypassed": 0, "backend_errors": 0,
+                         "tokens_saved": 0, "ms_saved": 0.0}
+
+    @property
+    def backend(self):
+        return self._backend or get_backend()
+
+    @staticmethod
+    def key(prompt: str) -> str:
+        raw = f"{PROMPT_VERSION}|{GENERATE_MODEL}|{GENERATE_TEMPERATURE}|{prompt}"
+        return "copy:" + hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def get(self, key):
+        if self.ttl <= 0:
+            return None
+        try:
+            raw = (await self.backend.mget([key]))[0]
+        except Exception as e:
+            print(f"Copy cache read failed: {e}")
+            self.counters["backend_errors"] += 1
+            raw = None
+        if raw is None:
+            self.counters["misses"] += 1
+            cache_requests.inc(cache="copy", upstream="api.openai.com", result="miss")
+            return None
+        entry = json.loads(raw)
+        self.counters["hits"] += 1
+        cache_requests.inc(cache="copy", upstream="api.openai.com", result="hit")
+        self.counters["tokens_saved"] += entry.get("tokens", 0)
+        self.counters["ms_saved"] += entry.get("ms", 0.0)
+        return entry
+
+    async def set(self, key, entry):
+        if self.ttl <= 0:
+            return
+        try:
+            await self.backend.mset({key: json.dumps(entry).encode("utf-8")}, ttl=self.ttl)
+        except Exception as e:
+            print(f"Copy cache write failed: {e}")
+            self.counters["backend_errors"] += 1
+
+    def stats(self) -> dict:
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return {
+            **self.counters,
+            "ms_saved": round(self.counters["ms_saved"], 1),
+            "hit_rate": round(self.counters["hits"] / lookups, 4) if lookups else 0.0,
+            "backend": self.backend_name,
+            "prompt_version": PROMPT_VERSION,
+        }
+
+copy_cache = CopyCache()
+
+@async_retry(name="openai.chat", upstream="api.openai.com", deadline=90)
+@instrumented("openai_chat", upstream="api.openai.com")
+async def _complete(prompt: str):
+    """Return (content, total_tokens) - async client, so the event loop keeps serving."""
+    resp = await get_llm().ainvoke(prompt)
+    usage = getattr(resp, "usage_metadata", None) or {}
+    return resp.content, usage.get("total_tokens", 0)
+
+async def _cached(headline, tone, platform, bypass_cache=False):
+    """Cached entry for this job, or None on a miss (or when bypassing)."""
+    if bypass_cache:
+        copy_cache.counters["bypassed"] += 1
+        return None
+    return await copy_cache.get(copy_cache.key(build_prompt(headline, tone, platform)))
+
+async def _generate(headline: str, tone: str, platform: str):
+    """Call the model and store the result (also refreshes a bypassed entry). Returns (content, tokens)."""
+    prompt = build_prompt(headline, tone, platform)
+    start = time.perf_counter()
+    content, tokens = await _complete(prompt)
+    entry = {"content": content, "tokens": tokens, "ms": round((time.perf_counter() - start) * 1000, 1)}
+    await copy_cache.set(copy_cache.key(prompt), entry)
+    return content, tokens
+
+@instrumented("generate_copy")
+async def generate_copy(headline:str, tone:str, platform:str, bypass_cache: bool = False):
+    cached = await _cached(headline, tone, platform, bypass_cache)
+    if cached is not None:
+        return cached["content"]
+    content, _ = await _generate(headline, tone, platform)
+    return content
+
+def _estimate_tokens(headline, tone, platform):
+    # Worst case for one job: prompt (~4 chars/token) plus a full completion
+    return len(build_prompt(headline, tone, platform)) // 4 + GENERATE_MAX_TOKENS
+
+async def generate_batch(headlines, tones, platforms, concurrency=None, token_budget=None, bypass_cache=False):
+    """
+    Generate copy for every headline × tone × platform, yielding results as they complete.
+
+    At most `concurrency` completions run at once. Each job reserves its
+    worst-case token cost from `token_budget` before starting (reconciled with
+    actual usage afterwards); jobs that no longer fit are yielded as skipped.
+    Cache hits cost no budget. Each result:
+    {headline, tone, platform, cached, content | error, tokens, ms}.
+    """
+    semaphore = asyncio.Semaphore(concurrency or GENERATE_CONCURRENCY)
+    budget = {"left": token_budget or GENERATE_TOKEN_BUDGET}
+
+    async def run(headline, tone, platform):
+        result = {"headline": headline, "tone": tone, "platform": platform, "tokens": 0, "cached": False}
+        cached = await _cached(headline, tone, platform, bypass_cache)
+        if cached is not None:
+            result.update(content=cached["content"], cached=True, ms=0.0)
+            return result
+
+        async with semaphore:
+            reserved = _estimate_tokens(headline, tone, platform)
+            if reserved > budget["left"]:
+                result["error"] = "token budget exhausted"
+                return result
+            budget["left"] -= reserved
+
+            start = time.perf_counter()
+            try:
+                result["content"], tokens = await _generate(headline, tone, platform)
+                result["tokens"] = tokens
+                budget["left"] += reserved - tokens
+            except Exception as e:
+                result["error"] = f"{type(e).__name__}: {e}"
+                budget["left"] += reserved  # unknown spend; assume nothing billed
+            result["ms"] = round((time.perf_counter() - start) * 1000, 1)
+        return result
+
+    tasks = [asyncio.ensure_future(run(h, t, p)) for h, t, p in itertools.product(headlines, tones, platforms)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Client went away mid-stream: stop paying for completions nobody reads
+        for task in tasks:
+            task.cancel()
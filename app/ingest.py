@@ -0,0 +1,204 @@
+# <app/ingest.py>
+import asyncio, os, random, time
+from .scrape import gather_sources
+from .dedupe import dedupe_headlines
+from .score import score_items
+from .topics import default_topics, topic_index
+
+INGEST_ENABLED = os.getenv("INGEST_ENABLED", "true").lower() in ("1", "true", "yes")
+INGEST_INTERVAL = float(os.getenv("INGEST_INTERVAL", "900"))  # seconds between refreshes of one topic
+INGEST_JITTER = float(os.getenv("INGEST_JITTER", "0.1"))  # ± fraction of the interval
+INGEST_STAGGER = float(os.getenv("INGEST_STAGGER", "60"))  # first pass spread over this many seconds
+INGEST_CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", "2"))  # topics refreshing at once
+INGEST_MAX_AGE = float(os.getenv("INGEST_MAX_AGE", str(3 * 900)))  # older snapshots are ignored
+# Upstream quota guards: only the configured catalogue is ingested unless INGEST_DYNAMIC_TOPICS
+# (topics added via /topics), never more than INGEST_MAX_TOPICS, and at most INGEST_DAILY_REFRESHES
+# topic refreshes per day (0 = no cap). Everything else is fetched live on request.
+INGEST_DYNAMIC_TOPICS = os.getenv("INGEST_DYNAMIC_TOPICS", "false").lower() in ("1", "true", "yes")
+INGEST_MAX_TOPICS = int(os.getenv("INGEST_MAX_TOPICS", "20"))
+INGEST_DAILY_REFRESHES = int(os.getenv("INGEST_DAILY_REFRESHES", "0"))
+
+def _raw(item):
+    """Copy of a scraped item without what dedupe/score attach (embedding, viralScore)."""
+    raw = item.copy()
+    if isinstance(raw, dict):
+        raw.pop("viralScore", None)
+        raw.pop("embedding", None)
+    else:
+        raw.viralScore = raw.embedding = None
+    return raw
+
+class TrendIngestor:
+    """
+    Background refresher keeping a materialized snapshot per catalogue topic.
+
+    Each topic has its own loop: the first refresh is staggered across
+    INGEST_STAGGER seconds, later ones every INGEST_INTERVAL ± jitter, with at
+    most INGEST_CONCURRENCY topics refreshing at once, so upstream calls are
+    spread out instead of bursting. A snapshot holds the raw items (for
+    /trends/scrape), the deduped and scored items (for /trends/discover) and
+    the fetch timings.
+
+    Every refresh costs one request per source and page, so ingestion is
+    kept to the configured catalogue (plus /topics additions only with
+    INGEST_DYNAMIC_TOPICS), capped at max_topics and, optionally, at
+    daily_refreshes per day. Changes are picked up on the next reconcile pass.
+    """
+
+    def __init__(self, interval=INGEST_INTERVAL, jitter=INGEST_JITTER, stagger=INGEST_STAGGER,
+                 concurrency=INGEST_CONCURRENCY, max_age=INGEST_MAX_AGE, max_topics=INGEST_MAX_TOPICS,
+                 dynamic_topics=INGEST_DYNAMIC_TOPICS, daily_refreshes=INGEST_DAILY_REFRESHES):
+        self.interval = interval
+        self.jitter = jitter
+        self.stagger = stagger
+        self.concurrency = concurrency
+        self.max_age = max_age
+        self.max_topics = max_topics
+        self.dynamic_topics = dynamic_topics
+        self.daily_refreshes = daily_refreshes
+        self.snapshots = {}
+        self._tasks = {}
+        self._supervisor = None
+        self._limit = None
+        self._budget_day = None
+        self._budget_used = 0
+        self.counters = {"refreshes": 0, "refresh_errors": 0, "served": 0, "live_fallbacks": 0,
+                         "budget_skipped": 0}
+
+    async def refresh(self, topic):
+        """Scrape, dedupe and score one topic now and store the snapshot."""
+        result = await gather_sources(topic, partial=True)
+        # "items" must look like a live /trends/scrape, so it can't share objects with "scored"
+        items = [_raw(item) for item in result["items"]]
+        deduped = await dedupe_headlines(result["items"])
+        scored = score_items(deduped)
+        self.snapshots[topic] = {
+            "items": items,
+            "scored": scored,
+            "timings": result["timings"],
+            "fetched_at": time.time(),
+        }
+        self.counters["refreshes"] += 1
+        return self.snapshots[topic]
+
+    def snapshot_items(self, snapshot, key="scored"):
+        """Copies of a snapshot's items, safe for the caller to mutate."""
+        return [item.copy() for item in snapshot[key]]
+
+    def get(self, topic):
+        """(snapshot, age in seconds) if a fresh enough one exists, else (None, None)."""
+        snapshot = self.snapshots.get(topic)
+        if snapshot is None:
+            return None, None
+        age = time.time() - snapshot["fetched_at"]
+        if age > self.max_age:
+            return None, None
+        return snapshot, age
+
+    def _spend(self) -> bool:
+        """Take one refresh from today's budget; False once it is used up."""
+        if not self.daily_refreshes:
+            return True
+        day = int(time.time() // 86400)
+        if day != self._budget_day:
+            self._budget_day, self._budget_used = day, 0
+        if self._budget_used >= self.daily_refreshes:
+            return False
+        self._budget_used += 1
+        return True
+
+    async def _loop(self, topic, delay):
+        await asyncio.sleep(delay)
+        while True:
+            try:
+                async with self._limit:
+                    if self._spend():
+                        await self.refresh(topic)
+                    else:
+                        self.counters["budget_skipped"] += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.counters["refresh_errors"] += 1
+                print(f"Ingest refresh failed for {topic!r}: {e}")
+            await asyncio.sleep(self.interval * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+    def _catalogue(self):
+        topics = default_topics() + (topic_index.topics if self.dynamic_topics else [])
+        return list(dict.fromkeys(topics))[:self.max_topics]
+
+    def _reconcile(self):
+        """Start loops for new catalogue topics, stop loops for removed ones."""
+        topics = self._catalogue()
+        for topic in set(self._tasks) - set(topics):
+            self._tasks.pop(topic).cancel()
+            self.snapshots.pop(topic, None)
+        new = [t for t in topics if t not in self._tasks]
+        for i, topic in enumerate(new):
+            delay = self.stagger * i / max(len(new), 1)
+            self._tasks[topic] = asyncio.create_task(self._loop(topic, delay))
+
+    async def _supervise(self):
+        while True:
+            try:
+                self._reconcile()
+            except Exception as e:
+                print(f"Ingest reconcile failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def start(self):
+        self._limit = asyncio.Semaphore(self.concurrency)
+        self._supervisor = asyncio.create_task(self._supervise())
+
+    async def stop(self):
+        tasks = list(self._tasks.values()) + ([self._supervisor] if self._supervisor else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = {}
+        self._supervisor = None
+
+    async def gather(self, topics):
+        """
+        Like gather_sources(list): snapshots where available, one live fetch for
+        the rest. Adds "snapshot_age" ({topic: seconds, or None when fetched live}).
+        """
+        topics = list(dict.fromkeys(topics))
+        items, timings, ages, missing = {}, {}, {}, []
+        for topic in topics:
+            snapshot, age = self.get(topic)
+            if snapshot is None:
+                missing.append(topic)
+                continue
+            items[topic] = self.snapshot_items(snapshot, "items")
+            timings[topic] = snapshot["timings"]["topics"][topic]
+            ages[topic] = round(age, 1)
+        self.counters["served"] += len(topics) - len(missing)
+
+        live = {"timings": {"total_ms": 0.0, "partial": False}}
+        if missing:
+            self.counters["live_fallbacks"] += len(missing)
+            live = await gather_sources(missing)
+            for topic in missing:
+                items[topic] = [item for item in live["items"] if item["topic"] == topic]
+                timings[topic] = live["timings"]["topics"][topic]
+                ages[topic] = None
+
+        return {
+            "topics_searched": topics,
+            "items": [item for topic in topics for item in items[topic]],
+            "timings": {**live["timings"], "topics": timings},
+            "snapshot_age": ages,
+        }
+
+    def stats(self) -> dict:
+        now = time.time()
+        return {
+            **self.counters,
+            "topics": len(self._tasks),
+            "max_topics": self.max_topics,
+            "refreshes_today": self._budget_used if self.daily_refreshes else None,
+            "snapshots": {t: round(now - s["fetched_at"], 1) for t, s in self.snapshots.items()},
+        }
+
+ingestor = TrendIngestor()
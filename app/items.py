@@ -0,0 +1,125 @@
+# <app/items.py>
+import json, sys
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional: stdlib json is the (slower) fallback
+    orjson = None
+
+class Item:
+    """
+    One scraped story, shared by every pipeline stage (scrape → dedupe →
+    score → response).
+
+    Slotted, so an item is a fixed-size record instead of a per-item dict,
+    and `source`/`topic` are interned (a handful of distinct values across
+    thousands of items). It also behaves like the dicts it replaces -
+    item["headline"], item.get("score", 0), item["viralScore"] = x,
+    dict(item) - so stages written against dicts work on either.
+
+    `embedding` is the headline's vector once dedupe has computed it, so
+    later stages (the seen index) don't embed again. It is never serialized.
+    """
+
+    __slots__ = ("source", "headline", "url", "published", "topic", "score", "snippet", "viralScore", "embedding")
+
+    # Always present in the JSON form, then the ones omitted while None
+    _REQUIRED = ("source", "headline", "url", "published")
+    _OPTIONAL = ("score", "snippet", "topic", "viralScore")
+
+    def __init__(self, source="", headline="", url="#", published=None, topic=None, score=None, snippet=None,
+                 viralScore=None, embedding=None):
+        self.source = sys.intern(source)
+        self.headline = headline
+        self.url = url
+        self.published = published
+        self.topic = sys.intern(topic) if topic else topic
+        self.score = score
+        self.snippet = snippet
+        self.viralScore = viralScore
+        self.embedding = embedding
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build from a dict (or pydantic model); unknown keys are dropped."""
+        if isinstance(data, cls):
+            return data
+        if not isinstance(data, dict):
+            data = data.__dict__  # pydantic model fields, without a model_dump() pass
+        return cls(**{k: data[k] for k in cls.__slots__ if k in data})
+
+    def to_dict(self) -> dict:
+        out = {k: getattr(self, k) for k in self._REQUIRED}
+        for k in self._OPTIONAL:
+            value = getattr(self, k)
+            if value is not None:
+                out[k] = value
+        return out
+
+    def copy(self):
+        clone = Item.__new__(Item)
+        for k in self.__slots__:
+            setattr(clone, k, getattr(self, k))
+        return clone
+
+    # dict compatibility ---------------------------------------------------
+
+    def keys(self):
+        return self.to_dict().keys()
+
+    def __getitem__(self, key):
+        try:
+            value = getattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key) from None
+        if value is None and key in self._OPTIONAL:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in self.__slots__ and (key not in self._OPTIONAL or getattr(self, key) is not None)
+
+    def get(self, key, default=None):
+        value = getattr(self, key, None) if key in self.__slots__ else None
+        return default if value is None else value
+
+    def __eq__(self, other):
+        if isinstance(other, (Item, dict)):
+            return self.to_dict() == dict(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return f"Item({self.to_dict()!r})"
+
+def as_items(items):
+    """Items from dicts, pydantic models or Items (already-Items are reused, not copied)."""
+    return [item if isinstance(item, Item) else Item.from_dict(item) for item in items]
+
+def _default(obj):
+    if isinstance(obj, Item):
+        return obj.to_dict()
+    # numpy scalars/arrays that slip into a payload
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def dumps(obj) -> bytes:
+    """JSON bytes, with Items serialized directly (orjson when installed)."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response rendered by dumps(). Return it from an endpoint to skip
+    FastAPI's jsonable_encoder pass over the payload.
+    """
+
+    def render(self, content) -> bytes:
+        return dumps(content)
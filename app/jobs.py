@@ -0,0 +1,415 @@
+# <app/jobs.py>
+import asyncio, hashlib, json, os, sqlite3, threading, time, uuid
+import httpx
+from .cache import REDIS_URL
+from .publish import post_linkedin, post_facebook, identities
+from .retry import backoff, CircuitOpenError, CIRCUIT_RESET
+
+PUBLISH_QUEUE_PATH = os.getenv("PUBLISH_QUEUE_PATH", "publish_queue.sqlite3")
+PUBLISH_WORKERS = int(os.getenv("PUBLISH_WORKERS", "4"))
+PUBLISH_MAX_ATTEMPTS = int(os.getenv("PUBLISH_MAX_ATTEMPTS", "5"))
+PUBLISH_POLL_INTERVAL = float(os.getenv("PUBLISH_POLL_INTERVAL", "1"))
+PUBLISH_RETRY_DELAY = float(os.getenv("PUBLISH_RETRY_DELAY", "5"))  # base backoff between attempts
+PUBLISH_STALE_AFTER = float(os.getenv("PUBLISH_STALE_AFTER", "300"))  # "running" this long = worker lost
+PUBLISH_IDEMPOTENCY_TTL = int(os.getenv("PUBLISH_IDEMPOTENCY_TTL", str(7 * 24 * 3600)))
+# Token buckets per platform: sustained posts per minute and burst size
+PUBLISH_RATE = {
+    "linkedin": float(os.getenv("PUBLISH_RATE_LINKEDIN", "10")),
+    "facebook": float(os.getenv("PUBLISH_RATE_FACEBOOK", "30")),
+}
+PUBLISH_BURST = int(os.getenv("PUBLISH_BURST", "5"))
+
+PUBLISHERS = {
+    "linkedin": post_linkedin,
+    "facebook": post_facebook,
+}
+
+def idempotency_key(platform, payload, key=None):
+    """Client-supplied key, or a hash of platform + payload so a resubmitted post is a no-op."""
+    if key:
+        return f"{platform}:{key}"
+    body = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return f"{platform}:" + hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+def classify_publish_error(exc):
+    """
+    "retry" when the post certainly didn't go out, "dead" otherwise.
+
+    Publishing isn't idempotent upstream: a read timeout or a 500 may mean the
+    post was created and only the response was lost, so those are never retried.
+    An open circuit means no request was sent at all.
+    """
+    if isinstance(exc, CircuitOpenError):
+        return "retry"
+    if isinstance(exc, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)):
+        return "retry"
+    if isinstance(exc, httpx.HTTPStatusError) and exc.response.status_code in (429, 503):
+        return "retry"
+    return "dead"
+
+class TokenBucket:
+    def __init__(self, per_minute, burst=PUBLISH_BURST):
+        self.rate = per_minute / 60
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self):
+        """Take a token if one is available now; never waits."""
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def release(self):
+        """Give back a token taken but not used."""
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+class SQLiteJobStore:
+    """
+    Job table in a local SQLite file; claims are atomic across processes sharing it.
+
+    Like RedisJobStore: an idempotency key expires after PUBLISH_IDEMPOTENCY_TTL
+    (or as soon as its job is dead), and a job "running" longer than
+    PUBLISH_STALE_AFTER is dead-lettered.
+    """
+
+    def __init__(self, path=PUBLISH_QUEUE_PATH):
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY, platform TEXT, payload TEXT, idempotency_key TEXT UNIQUE,
+                status TEXT, attempts INTEGER DEFAULT 0, result TEXT, error TEXT,
+                run_after REAL, created_at REAL, updated_at REAL
+            )""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, run_after)")
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _job(row):
+        if row is None:
+            return None
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def _enqueue(self, platform, payload, key):
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            # Free the key once it has expired or its job is dead, so the post can be submitted again
+            self._conn.execute(
+                "UPDATE jobs SET idempotency_key = NULL WHERE idempotency_key = ?"
+                " AND (status = 'dead' OR (status = 'done' AND created_at < ?))",
+                (key, now - PUBLISH_IDEMPOTENCY_TTL),
+            )
+            try:
+                self._conn.execute(
+                    "INSERT INTO jobs (id, platform, payload, idempotency_key, status, run_after, created_at, updated_at)"
+                    " VALUES (?, ?, ?, ?, 'queued', ?, ?, ?)",
+                    (job_id, platform, json.dumps(payload), key, now, now, now),
+                )
+                created = True
+            except sqlite3.IntegrityError:
+                created = False
+            row = self._conn.execute("SELECT * FROM jobs WHERE idempotency_key = ?", (key,)).fetchone()
+        return self._job(row), created
+
+    def _claim(self, platforms):
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # A job left "running" by a dead worker may already be live - never re-run it
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'dead', error = 'worker lost mid-publish; not retried', updated_at = ?"
+                    " WHERE status = 'running' AND updated_at < ?",
+                    (now, now - PUBLISH_STALE_AFTER),
+                )
+                marks = ", ".join("?" * len(platforms))
+                row = self._conn.execute(
+                    f"SELECT * FROM jobs WHERE status = 'queued' AND run_after <= ? AND platform IN ({marks})"
+                    " ORDER BY run_after LIMIT 1",
+                    (now, *platforms),
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'running', attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                        (now, row["id"]),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        job = self._job(row)
+        job["status"], job["attempts"] = "running", job["attempts"] + 1
+        return job
+
+    def _update(self, job_id, **fields):
+        fields["updated_at"] = time.time()
+        if "result" in fields:
+            fields["result"] = json.dumps(fields["result"])
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def _get(self, job_id):
+        with self._lock:
+            return self._job(self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def _counts(self):
+        with self._lock:
+            return dict(self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+    async def enqueue(self, platform, payload, key):
+        return await asyncio.to_thread(self._enqueue, platform, payload, key)
+
+    async def claim(self, platforms):
+        """Oldest ready job for one of `platforms`, marked running; None if there is none."""
+        return await asyncio.to_thread(self._claim, list(platforms))
+
+    async def update(self, job_id, **fields):
+        await asyncio.to_thread(self._update, job_id, **fields)
+
+    async def get(self, job_id):
+        return await asyncio.to_thread(self._get, job_id)
+
+    async def counts(self):
+        return await asyncio.to_thread(self._counts)
+
+    async def close(self):
+        with self._lock:
+            self._conn.close()
+
+class RedisJobStore:
+    """
+    Jobs as Redis hashes plus a sorted set of ready job ids scored by run_after.
+
+    A sorted set rather than a stream, so retries can be scheduled for later;
+    claiming is one Lua script, so workers in every process share the queue.
+    Claimed ids sit in a second sorted set scored by claim time, so jobs left
+    "running" by a lost worker are dead-lettered after PUBLISH_STALE_AFTER,
+    the same as the SQLite store. A claim looks at the oldest 100 ready ids
+    for one on a platform the caller can publish to right now.
+    """
+
+    _CLAIM = """
+    local stale = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[3])
+    for _, id in ipairs(stale) do
+        redis.call('HSET', ARGV[2] .. id, 'status', 'dead', 'updated_at', ARGV[1],
+                   'error', 'worker lost mid-publish; not retried')
+        redis.call('ZREM', KEYS[2], id)
+    end
+    local allowed = {}
+    for i = 4, #ARGV do allowed[ARGV[i]] = true end
+    local picked = false
+    for _, id in ipairs(redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, 100)) do
+        if allowed[redis.call('HGET', ARGV[2] .. id, 'platform')] then
+            picked = id
+            break
+        end
+    end
+    if not picked then return false end
+    redis.call('ZREM', KEYS[1], picked)
+    redis.call('ZADD', KEYS[2], ARGV[1], picked)
+    local key = ARGV[2] .. picked
+    redis.call('HSET', key, 'status', 'running', 'updated_at', ARGV[1])
+    redis.call('HINCRBY', key, 'attempts', 1)
+    return picked
+    """
+
+    def __init__(self, url=REDIS_URL, prefix="publish:"):
+        import redis.asyncio as redis
+        self.client = redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+        self.ready = prefix + "ready"
+        self.running = prefix + "running"
+        self._claim_script = self.client.register_script(self._CLAIM)
+
+    def _key(self, job_id):
+        return f"{self.prefix}job:{job_id}"
+
+    @staticmethod
+    def _job(data):
+        if not data:
+            return None
+        job = dict(data)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job.get("result") else None
+        job["attempts"] = int(job.get("attempts", 0))
+        for field in ("run_after", "created_at", "updated_at"):
+            job[field] = float(job[field]) if job.get(field) else None
+        return job
+
+    async def enqueue(self, platform, payload, key):
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        idem = f"{self.prefix}idem:{key}"
+        claimed = await self.client.set(idem, job_id, nx=True, ex=PUBLISH_IDEMPOTENCY_TTL)
+        if not claimed:
+            existing = await self.get(await self.client.get(idem))
+            if existing is not None and existing["status"] != "dead":
+                return existing, False
+            # A dead job doesn't hold its key: take it over
+            await self.client.set(idem, job_id, ex=PUBLISH_IDEMPOTENCY_TTL)
+
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.hset(self._key(job_id), mapping={
+                "id": job_id, "platform": platform, "payload": json.dumps(payload),
+                "idempotency_key": key, "status": "queued", "attempts": 0,
+                "result": "", "error": "", "run_after": now, "created_at": now, "updated_at": now,
+            })
+            pipe.zadd(self.ready, {job_id: now})
+            await pipe.execute()
+        return await self.get(job_id), True
+
+    async def claim(self, platforms):
+        now = time.time()
+        job_id = await self._claim_script(keys=[self.ready, self.running],
+                                          args=[now, f"{self.prefix}job:", now - PUBLISH_STALE_AFTER, *platforms])
+        return await self.get(job_id) if job_id else None
+
+    async def update(self, job_id, **fields):
+        fields["updated_at"] = time.time()
+        if "result" in fields:
+            fields["result"] = json.dumps(fields["result"])
+        fields = {name: "" if value is None else value for name, value in fields.items()}
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.hset(self._key(job_id), mapping=fields)
+            if fields.get("status", "running") != "running":
+                pipe.zrem(self.running, job_id)
+            if fields.get("status") == "queued":
+                pipe.zadd(self.ready, {job_id: fields["run_after"]})
+            await pipe.execute()
+
+    async def get(self, job_id):
+        return self._job(await self.client.hgetall(self._key(job_id)))
+
+    async def counts(self):
+        return {"queued": await self.client.zcard(self.ready), "running": await self.client.zcard(self.running)}
+
+    async def close(self):
+        await self.client.aclose()
+
+class PublishQueue:
+    """
+    Publish jobs drained by a pool of in-process async workers.
+
+    A worker first takes a token from every platform bucket that has one,
+    then claims a job for one of those platforms and hands the other tokens
+    back, so a rate-limited platform never holds a claimed job (or a worker)
+    while other platforms' jobs wait, and a claim is stamped just as its
+    send starts. Jobs that certainly didn't go out are retried with backoff up
+    to PUBLISH_MAX_ATTEMPTS; everything else is dead-lettered (status "dead").
+    """
+
+    def __init__(self, store=None, workers=PUBLISH_WORKERS, publishers=None):
+        self._store = store
+        self.workers = workers
+        self.publishers = publishers or PUBLISHERS
+        self.buckets = {platform: TokenBucket(rate) for platform, rate in PUBLISH_RATE.items()}
+        self._tasks = []
+        self._wakeup = None
+        self.counters = {"enqueued": 0, "duplicates": 0, "published": 0, "retried": 0, "dead": 0}
+
+    @property
+    def store(self):
+        if self._store is None:
+            self._store = RedisJobStore() if REDIS_URL else SQLiteJobStore()
+        return self._store
+
+    async def enqueue(self, platform, payload, key=None):
+        """Queue a post; returns (job, created). An existing job is returned for a repeated key."""
+        if platform not in self.publishers:
+            raise ValueError(f"Unknown platform: {platform}")
+        job, created = await self.store.enqueue(platform, payload, idempotency_key(platform, payload, key))
+        self.counters["enqueued" if created else "duplicates"] += 1
+        if created and self._wakeup is not None:
+            self._wakeup.set()
+        return job, created
+
+    async def get(self, job_id):
+        return await self.store.get(job_id)
+
+    async def run_once(self):
+        """Claim and process one job. Returns False when nothing was ready (or no platform had a token)."""
+        buckets = {platform: self.buckets.setdefault(platform, TokenBucket(60)) for platform in self.publishers}
+        ready = [platform for platform, bucket in buckets.items() if bucket.try_acquire()]
+        job = await self.store.claim(ready) if ready else None
+        for platform in ready:
+            if job is None or platform != job["platform"]:
+                buckets[platform].release()
+        if job is None:
+            return False
+
+        platform = job["platform"]
+        try:
+            result = await self.publishers[platform](job["payload"])
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if isinstance(e, CircuitOpenError):
+                # Nothing was sent: wait out the breaker, without spending an attempt
+                self.counters["retried"] += 1
+                run_after = time.time() + CIRCUIT_RESET + backoff(0, PUBLISH_RETRY_DELAY)
+                await self.store.update(job["id"], status="queued", error=error, run_after=run_after,
+                                        attempts=job["attempts"] - 1)
+            elif classify_publish_error(e) == "retry" and job["attempts"] < PUBLISH_MAX_ATTEMPTS:
+                self.counters["retried"] += 1
+                run_after = time.time() + backoff(job["attempts"] - 1, PUBLISH_RETRY_DELAY)
+                await self.store.update(job["id"], status="queued", error=error, run_after=run_after)
+            else:
+                self.counters["dead"] += 1
+                await self.store.update(job["id"], status="dead", error=error)
+        else:
+            self.counters["published"] += 1
+            await self.store.update(job["id"], status="done", result=result, error=None)
+        return True
+
+    async def _worker(self):
+        while True:
+            try:
+                if await self.run_once():
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Publish worker error: {e}")
+            # Idle: wait for an enqueue or the next poll (delayed retries, other processes)
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), PUBLISH_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    async def start(self):
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._store is not None:
+            await self._store.close()
+            self._store = None
+
+    async def stats(self):
+        return {
+            **self.counters,
+            "workers": len(self._tasks),
+            "jobs": await self.store.counts(),
+            "identities": identities.stats(),
+        }
+
+publish_queue = PublishQueue()
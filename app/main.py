@@ -1,19 +1,30 @@
-from fastapi import APIRouter, Header, HTTPException, Depends
+from fastapi import APIRouter, Header, HTTPException, Depends, Query, Request, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from starlette.requests import ClientDisconnect
 from fastapi.security.api_key import APIKeyHeader
-from pydantic import BaseModel, Field
-from typing import List
+from pydantic import BaseModel, Field, field_validator
+from typing import List, Literal, Optional
 from fastapi.security import APIKeyHeader
 from fastapi.openapi.models import APIKey
 from fastapi.openapi.models import APIKey as OpenAPIKey
-import os
+import asyncio, json, os, random
 from .scrape import gather_sources
 from .dedupe import dedupe_headlines
 from .score import score_items
-from .generate import generate_copy
-from .publish import post_linkedin, post_facebook
+from .generate import generate_copy, generate_batch, copy_cache, GENERATE_BATCH_MAX_JOBS
+from .jobs import publish_queue
 from fastapi import Security
-from .scrape import gather_sources, TRENDING_TOPICS
-from .utils import find_similar_topics
+from .scrape import gather_sources, scrape_cache, TRENDING_TOPICS
+from .topics import topic_index
+from .utils import parse_timestamp
+from .pipeline import discover_stream, breakthrough_stream, iter_ndjson_lines, to_ndjson, to_sse, BULK_MAX_BYTES
+from .embeddings import model_status, embedding_cache, local_encoder
+from .clients import pool_stats
+from .retry import retry_stats
+from .seen import seen_index
+from .ingest import ingestor
+from .items import FastJSONResponse
+from . import telemetry, warmup
 
 router = APIRouter()
 
@@ -35,15 +46,57 @@ def verify_key(x_api_key: str = Depends(api_key_header)):
 def get_version():
    return {"version": APP_VERSION}
 
-@router.get("/health")  # No auth required - for Render health checks
+@router.get("/health")  # No auth required - for Render health checks (liveness)
 def health_check():
-   return {"status": "healthy"}
+   return {"status": "healthy", "models": model_status(), "encoder": local_encoder.stats()}
+
+@router.get("/ready")  # No auth required - readiness: 503 until background warm-up finishes
+def readiness(response: Response):
+   status = warmup.status()
+   if not status["ready"]:
+       response.status_code = 503
+   return status
+
+@router.get("/cache/stats", dependencies=[Depends(verify_key)])
+def cache_stats():
+   """Hit/miss counters for sizing the caches."""
+   return {
+       "embeddings": embedding_cache.stats(),
+       "scrape": scrape_cache.stats(),
+       "copy": copy_cache.stats(),
+       "seen": seen_index.stats(),
+   }
+
+@router.get("/http/stats", dependencies=[Depends(verify_key)])
+def http_stats():
+   """Shared HTTP connection pool usage."""
+   return pool_stats()
+
+@router.get("/ingest/stats", dependencies=[Depends(verify_key)])
+def ingest_stats():
+   """Background ingestion counters and snapshot age per topic."""
+   return ingestor.stats()
+
+@router.get("/retry/stats", dependencies=[Depends(verify_key)])
+def retry_policy_stats():
+   """Retry counters per policy, retry budget and circuit breaker states."""
+   return retry_stats()
+
+@router.get("/metrics", dependencies=[Depends(verify_key)], response_class=PlainTextResponse)
+def prometheus_metrics():
+   """Stage latency histograms, cache and retry counters in Prometheus text format."""
+   return PlainTextResponse(telemetry.render(), media_type="text/plain; version=0.0.4")
 
 class TrendItem(BaseModel):
    source: str
    headline: str
    url: str
-   published: str
+   published: Optional[float] = None  # epoch seconds; ISO/RFC-2822/"3 hours ago" accepted on input
+
+   @field_validator("published", mode="before")
+   @classmethod
+   def _normalize_published(cls, value):
+       return parse_timestamp(value)
 
 class BreakthroughRequest(BaseModel):
    items: List[TrendItem]
@@ -53,78 +106,272 @@ class CopyRequest(BaseModel):
    headline: str
    tone: str = "curious"
    platform: str = "linkedin"
+   bypass_cache: bool = False  # force fresh creative output
+
+class BatchCopyRequest(BaseModel):
+   headlines: List[str]
+   tones: List[str] = ["curious"]
+   platforms: List[str] = ["linkedin"]
+   concurrency: Optional[int] = Field(None, ge=1, le=32)
+   token_budget: Optional[int] = Field(None, ge=1)
+   bypass_cache: bool = False
+
+class TopicsRequest(BaseModel):
+   topics: List[str] = []
+   replace: bool = False  # True = reload the catalogue from this list
+
+async def _gather(topic=None, live=True):
+    """
+    gather_sources, with a blown deadline (partial mode off) reported as 504.
+
+    With live=False a list of topics is served from ingest snapshots where
+    possible (see app/ingest.py) and the result carries "snapshot_age".
+    """
+    try:
+        if not live and isinstance(topic, list):
+            return await ingestor.gather(topic)
+        return await gather_sources(topic)
+    except asyncio.TimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+
+async def _exclude_seen(items, enabled):
+    """Filter items through the cross-run seen index. Returns (items, excluded)."""
+    if not enabled:
+        return items, 0
+    fresh = await seen_index.filter_new(items, record=False)
+    return fresh, len(items) - len(fresh)
+
+async def _record_seen(returned, enabled):
+    """Mark what the caller actually received as seen (only those, not everything that was scored)."""
+    if enabled:
+        await seen_index.record(returned)
 
 @router.get("/trends/scrape", dependencies=[Depends(verify_key)])
-async def scrape(topic: str = None):
+async def scrape(topic: str = None, live: bool = False):
     """
     Fetch trending marketing intelligence topics.
     
     - **topic**: Optional specific topic to search. If not provided, randomly selects from trending marketing topics.
+    - **live**: Skip the background snapshot and fetch now.
     """
-    return await gather_sources(topic)
+    topic = topic or random.choice(TRENDING_TOPICS)
+    snapshot, age = (None, None) if live else ingestor.get(topic)
+    if snapshot is None:
+        return FastJSONResponse({**await _gather(topic), "snapshot_age": None})
+    ingestor.counters["served"] += 1
+    return FastJSONResponse({
+        "topic_searched": topic,
+        "items": ingestor.snapshot_items(snapshot, "items"),
+        "timings": snapshot["timings"],
+        "snapshot_age": round(age, 1),
+    })
 
 @router.post("/trends/breakthrough", dependencies=[Depends(verify_key)])
 async def breakthrough(req: BreakthroughRequest):
    deduped = await dedupe_headlines(req.items)
    scored = score_items(deduped)
-   return [x for x in scored if x["viralScore"] >= req.threshold]
+   return FastJSONResponse([x for x in scored if x["viralScore"] >= req.threshold])
+
+class DuplexStreamingResponse(StreamingResponse):
+   """
+   StreamingResponse for a handler that is still reading the request body
+   while it responds. The stock one listens for disconnects on receive(),
+   which would swallow the body messages; here a disconnect surfaces from
+   request.stream() or from send(), both as ClientDisconnect.
+   """
+
+   async def __call__(self, scope, receive, send):
+       try:
+           await self.stream_response(send)
+       except OSError:
+           raise ClientDisconnect()
+       if self.background is not None:
+           await self.background()
+
+@router.post("/trends/breakthrough/bulk", dependencies=[Depends(verify_key)])
+async def breakthrough_bulk(request: Request, threshold: float = Query(0.7, ge=0, le=1)):
+   """
+   Bulk /trends/breakthrough: the body is NDJSON, one TrendItem per line,
+   optionally gzip-compressed (`Content-Encoding: gzip`).
+
+   Lines are validated and deduped in chunks as they upload, and items at or
+   above `threshold` stream back as NDJSON `item` events, then one `done`
+   event with totals. Invalid lines produce `error` events and are skipped.
+   Input past BULK_MAX_ITEMS items or BULK_MAX_BYTES (uncompressed) is cut
+   off and reported in `done.truncated`.
+   """
+   length = request.headers.get("content-length")
+   if length and length.isdigit() and int(length) > BULK_MAX_BYTES:
+       raise HTTPException(status_code=413, detail=f"Body larger than {BULK_MAX_BYTES} bytes")
+   gzipped = request.headers.get("content-encoding", "").lower() in ("gzip", "x-gzip") \
+       or request.headers.get("content-type", "").startswith(("application/gzip", "application/x-gzip"))
+
+   lines = iter_ndjson_lines(request.stream(), gzipped=gzipped)
+   events = breakthrough_stream(lines, TrendItem.model_validate_json, threshold=threshold)
+
+   async def body():
+       async for event in events:
+           yield to_ndjson(event)
+
+   return DuplexStreamingResponse(body(), media_type="application/x-ndjson")
 
 @router.post("/content/generate", dependencies=[Depends(verify_key)])
 async def gen(req: CopyRequest):
-   return await generate_copy(req.headline, req.tone, req.platform)
+   return await generate_copy(req.headline, req.tone, req.platform, bypass_cache=req.bypass_cache)
+
+@router.post("/content/generate/batch", dependencies=[Depends(verify_key)])
+async def gen_batch(req: BatchCopyRequest):
+   """
+   Generate copy for every headline × tone × platform concurrently.
+   
+   Streams one JSON object per line (NDJSON) as each completion finishes.
+   """
+   jobs = len(req.headlines) * len(req.tones) * len(req.platforms)
+   if jobs > GENERATE_BATCH_MAX_JOBS:
+       raise HTTPException(status_code=422, detail=f"{jobs} jobs requested, max is {GENERATE_BATCH_MAX_JOBS}")
+
+   async def lines():
+       async for result in generate_batch(
+           req.headlines, req.tones, req.platforms,
+           concurrency=req.concurrency, token_budget=req.token_budget,
+           bypass_cache=req.bypass_cache
+       ):
+           yield json.dumps(result) + "\n"
+
+   return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+async def _enqueue_post(platform, payload, idempotency_key):
+   job, created = await publish_queue.enqueue(platform, payload, idempotency_key)
+   return {"status": job["status"], "job_id": job["id"], "duplicate": not created}
+
+@router.post("/publish/linkedin", status_code=202, dependencies=[Depends(verify_key)])
+async def publish_li(payload: dict, idempotency_key: Optional[str] = Header(None)):
+   """Queue a LinkedIn post; poll /publish/jobs/{job_id} for the outcome."""
+   return await _enqueue_post("linkedin", payload, idempotency_key)
 
-@router.post("/publish/linkedin", dependencies=[Depends(verify_key)])
-async def publish_li(payload: dict):
-   return await post_linkedin(payload)
+@router.post("/publish/facebook", status_code=202, dependencies=[Depends(verify_key)])
+async def publish_fb(payload: dict, idempotency_key: Optional[str] = Header(None)):
+   """Queue a Facebook Page post; poll /publish/jobs/{job_id} for the outcome."""
+   return await _enqueue_post("facebook", payload, idempotency_key)
 
-@router.post("/publish/facebook", dependencies=[Depends(verify_key)])
-async def publish_fb(payload: dict):
-   return await post_facebook(payload)
+@router.get("/publish/jobs/{job_id}", dependencies=[Depends(verify_key)])
+async def publish_job(job_id: str):
+   job = await publish_queue.get(job_id)
+   if job is None:
+       raise HTTPException(status_code=404, detail="Unknown job")
+   return job
+
+@router.get("/publish/stats", dependencies=[Depends(verify_key)])
+async def publish_stats():
+   return await publish_queue.stats()
+
+@router.get("/topics", dependencies=[Depends(verify_key)])
+def list_topics():
+   return {"count": len(topic_index.topics), "topics": topic_index.topics}
+
+@router.post("/topics", dependencies=[Depends(verify_key)])
+async def update_topics(req: TopicsRequest):
+   """Add topics to the discover catalogue (or replace it). Only new topics are embedded."""
+   if req.replace:
+       embedded = await topic_index.load(req.topics)
+   else:
+       embedded = await topic_index.add(req.topics)
+   return {"count": len(topic_index.topics), "embedded": embedded}
+
+@router.post("/topics/reload", dependencies=[Depends(verify_key)])
+async def reload_topics():
+   """Re-read the default catalogue (TOPICS_FILE or the built-in list)."""
+   embedded = await topic_index.reload()
+   return {"count": len(topic_index.topics), "embedded": embedded}
 
 @router.get("/trends/discover", dependencies=[Depends(verify_key)])
-async def discover_trends(interest: str = None):
-    """Discover trending topics related to user interest using AI"""
+async def discover_trends(interest: str = None, top_k: int = Query(3, ge=1, le=50), exclude_seen: bool = False,
+                          live: bool = False):
+    """Discover trending topics related to user interest using AI
+    
+    - **top_k**: How many of the most similar topics to scrape (concurrently).
+    - **live**: Skip the background snapshots and fetch every topic now.
+    - **exclude_seen**: Drop stories already returned by an earlier exclude_seen
+      run within SEEN_WINDOW_DAYS (same URL or near-identical headline).
+    """
     
     if interest:
         # Find similar trending topics using embeddings
-        similar = await find_similar_topics(
-            interest,
-            TRENDING_TOPICS,
-            provider="local",
-            top_k=5
-        )
-        
-        # Gather content for top similar topics
-        all_items = []
-        topics_searched = []
+        similar = await topic_index.search(interest, top_k=top_k)
         
-        for topic, similarity_score in similar[:3]:  # Top 3 most similar
-            result = await gather_sources(topic)
-            all_items.extend(result["items"])
-            topics_searched.append({
+        # Gather content for all similar topics at once (snapshots unless live)
+        result = await _gather([topic for topic, _ in similar], live=live)
+        ages = result.get("snapshot_age", {})
+        topics_searched = [
+            {
                 "topic": topic,
-                "similarity": round(similarity_score, 2)
-            })
+                "similarity": round(similarity_score, 2),
+                "ms": result["timings"]["topics"][topic]["ms"],
+                "snapshot_age": ages.get(topic)
+            }
+            for topic, similarity_score in similar
+        ]
         
         # Dedupe and score
-        deduped = await dedupe_headlines(all_items)
-        scored = score_items(deduped)
+        deduped = await dedupe_headlines(result["items"])
+        deduped, excluded = await _exclude_seen(deduped, exclude_seen)
+        scored = score_items(deduped, top_n=20)  # Top 20 results
+        await _record_seen(scored, exclude_seen)
         
-        return {
+        return FastJSONResponse({
             "user_interest": interest,
             "discovered_topics": topics_searched,
-            "total_results": len(scored),
-            "trending_content": scored[:20]  # Top 20 results
-        }
+            "total_results": len(deduped),
+            "excluded_seen": excluded,
+            "trending_content": scored,
+            "timings": result["timings"],
+            "snapshot_age": max((a for a in ages.values() if a is not None), default=None)
+        })
     else:
-        # Default behavior - random topic
-        result = await gather_sources()
-        items = result["items"]
-        deduped = await dedupe_headlines(items)
-        scored = score_items(deduped)
+        # Default behavior - random topic, already deduped in its snapshot if there is one
+        topic = random.choice(TRENDING_TOPICS)
+        snapshot, age = (None, None) if live else ingestor.get(topic)
+        if snapshot is not None:
+            ingestor.counters["served"] += 1
+            result = {"topic_searched": topic, "timings": snapshot["timings"]}
+            deduped = ingestor.snapshot_items(snapshot)
+        else:
+            result = await _gather(topic)
+            deduped = await dedupe_headlines(result["items"])
+        deduped, excluded = await _exclude_seen(deduped, exclude_seen)
+        scored = score_items(deduped, top_n=20)
+        await _record_seen(scored, exclude_seen)
         
-        return {
+        return FastJSONResponse({
             "topic_searched": result["topic_searched"],
-            "total_results": len(scored),
-            "trending_content": scored[:20]
-        }
+            "total_results": len(deduped),
+            "excluded_seen": excluded,
+            "trending_content": scored,
+            "timings": result["timings"],
+            "snapshot_age": round(age, 1) if snapshot is not None else None
+        })
+
+@router.get("/trends/discover/stream", dependencies=[Depends(verify_key)])
+async def discover_trends_stream(
+    interest: str = None,
+    top_k: int = Query(3, ge=1, le=50),
+    format: Literal["ndjson", "sse"] = "ndjson",
+):
+    """Streaming /trends/discover: items are deduped, scored and sent as each source responds
+    
+    - **format**: `ndjson` (one JSON object per line) or `sse` (Server-Sent Events).
+    """
+    if interest:
+        topics = [topic for topic, _ in await topic_index.search(interest, top_k=top_k)]
+    else:
+        topics = [random.choice(TRENDING_TOPICS)]
+
+    encode = to_sse if format == "sse" else to_ndjson
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+
+    async def events():
+        yield encode({"type": "topics", "topics": topics})
+        async for event in discover_stream(topics):
+            yield encode(event)
+
+    return StreamingResponse(events(), media_type=media_type, headers={"Cache-Control": "no-cache"})
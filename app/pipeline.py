@@ -0,0 +1,176 @@
+# <app/pipeline.py>
+import os, time, zlib
+from .scrape import iter_sources
+from .dedupe import DedupeIndex
+from .score import score_items
+from .items import Item, dumps
+
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", "50000"))
+BULK_MAX_BYTES = int(os.getenv("BULK_MAX_BYTES", str(64 * 2**20)))  # uncompressed NDJSON
+BULK_MAX_LINE_BYTES = int(os.getenv("BULK_MAX_LINE_BYTES", str(64 * 2**10)))
+BULK_CHUNK_ITEMS = int(os.getenv("BULK_CHUNK_ITEMS", "512"))  # items embedded + deduped per step
+BULK_MAX_ERRORS = 20  # invalid lines reported individually; the rest are only counted
+
+_INFLATE_STEP = 256 * 2**10
+
+class BulkLimitExceeded(ValueError):
+    pass
+
+async def discover_stream(topics, similarity_threshold=0.85, deadline=None):
+    """
+    Streaming scrape → dedupe → score pipeline.
+
+    Yields events as soon as they're known instead of waiting for the slowest
+    source:
+      {"type": "item", ...item}      new (not yet seen) item, scored on arrival
+      {"type": "source", ...}        one (topic, source) fetch finished
+      {"type": "done", ...}          totals and time-to-first-item
+    Items from one source arrive best-first; across sources order is arrival order.
+    """
+    index = DedupeIndex(similarity_threshold)
+    start = time.perf_counter()
+    first_item_ms = None
+    total = 0
+
+    async for result in iter_sources(topics, deadline=deadline):
+        fresh = await index.dedupe(result["items"])
+        for item in score_items(fresh):
+            if first_item_ms is None:
+                first_item_ms = round((time.perf_counter() - start) * 1000, 1)
+            total += 1
+            yield {"type": "item", **item}
+
+        yield {
+            "type": "source",
+            "topic": result["topic"],
+            "source": result["source"],
+            "ms": result["ms"],
+            "count": len(result["items"]),
+            "new": len(fresh),
+            "error": result["error"],
+            "cache": result["cache"],
+        }
+
+    yield {
+        "type": "done",
+        "total_results": total,
+        "first_item_ms": first_item_ms,
+        "total_ms": round((time.perf_counter() - start) * 1000, 1),
+    }
+
+async def iter_ndjson_lines(chunks, gzipped=False, max_bytes=BULK_MAX_BYTES, max_line=BULK_MAX_LINE_BYTES):
+    """
+    Yield (line number, bytes) for each non-blank line of an NDJSON body
+    arriving as byte chunks, decompressing gzip on the fly. At most max_bytes
+    of decompressed data are produced (decompression is capped per step, so a
+    small gzip bomb can't expand past it) and only one partial line is held.
+    Raises BulkLimitExceeded when either limit is hit.
+    """
+    decoder = zlib.decompressobj(zlib.MAX_WBITS | 32) if gzipped else None  # gzip or zlib header
+    total = 0
+    number = 0
+    pending = b""
+
+    def lines(data):
+        nonlocal pending, number, total
+        total += len(data)
+        if total > max_bytes:
+            raise BulkLimitExceeded(f"body exceeds {max_bytes} bytes")
+        *complete, pending = (pending + data).split(b"\n")
+        if len(pending) > max_line:
+            raise BulkLimitExceeded(f"line {number + len(complete) + 1} exceeds {max_line} bytes")
+        for line in complete:
+            number += 1
+            if len(line) > max_line:
+                raise BulkLimitExceeded(f"line {number} exceeds {max_line} bytes")
+            if line.strip():
+                yield number, line
+
+    async for chunk in chunks:
+        if decoder is None:
+            for out in lines(chunk):
+                yield out
+            continue
+        data = chunk
+        while data:
+            # Inflate in bounded steps, never past what's still allowed (+1 byte to detect the overflow)
+            out = decoder.decompress(data, max(min(max_bytes - total + 1, _INFLATE_STEP), 1))
+            data = decoder.unconsumed_tail
+            for line in lines(out):
+                yield line
+    if decoder is not None:
+        for line in lines(decoder.flush()):
+            yield line
+    if pending.strip():
+        number += 1
+        yield number, pending
+
+def _error_detail(e):
+    if hasattr(e, "errors"):  # pydantic ValidationError
+        return [{"loc": list(err["loc"]), "msg": err["msg"]} for err in e.errors(include_url=False)]
+    return f"{type(e).__name__}: {e}"
+
+async def breakthrough_stream(lines, parse, threshold=0.7, similarity_threshold=0.85,
+                              chunk_items=BULK_CHUNK_ITEMS, max_items=BULK_MAX_ITEMS):
+    """
+    Bulk /trends/breakthrough over (line number, bytes) lines.
+
+    Lines are validated with parse(bytes) -> item (dict or model) and handled
+    chunk_items at a time: embedded, deduped against everything kept so far
+    and scored, so memory is one chunk plus the running dedupe index
+    (~1.5 KB per unique headline, capped by max_items). Yields:
+      {"type": "item", ...item}   unique item with viralScore >= threshold
+      {"type": "error", ...}      invalid line (first BULK_MAX_ERRORS only)
+      {"type": "done", ...}       totals; "truncated" says why input was cut short
+    """
+    index = DedupeIndex(similarity_threshold)
+    start = time.perf_counter()
+    counts = {"received": 0, "invalid": 0, "unique": 0, "returned": 0}
+    truncated = None
+    batch = []
+
+    async def flush():
+        fresh = await index.dedupe(batch)
+        batch.clear()
+        counts["unique"] += len(fresh)
+        for item in score_items(fresh):
+            if item.viralScore < threshold:
+                break  # sorted best-first
+            item.embedding = None  # don't hold vectors past this chunk
+            counts["returned"] += 1
+            yield {"type": "item", **item}
+
+    try:
+        async for number, line in lines:
+            if counts["received"] >= max_items:
+                truncated = f"more than {max_items} items"
+                break
+            counts["received"] += 1
+            try:
+                batch.append(Item.from_dict(parse(line)))
+            except Exception as e:
+                counts["invalid"] += 1
+                if counts["invalid"] <= BULK_MAX_ERRORS:
+                    yield {"type": "error", "line": number, "detail": _error_detail(e)}
+                continue
+            if len(batch) >= chunk_items:
+                async for event in flush():
+                    yield event
+    except BulkLimitExceeded as e:
+        truncated = str(e)
+
+    if batch:
+        async for event in flush():
+            yield event
+    yield {
+        "type": "done",
+        **counts,
+        "truncated": truncated,
+        "total_ms": round((time.perf_counter() - start) * 1000, 1),
+    }
+
+def to_ndjson(event) -> bytes:
+    return dumps(event) + b"\n"
+
+def to_sse(event) -> bytes:
+    return b"event: " + event["type"].encode() + b"\ndata: " + dumps(event) + b"\n\n"
@@ -1,76 +1,168 @@
-import os
-import httpx
+import asyncio, hashlib, json, os
 from .utils import async_retry
+from .clients import get_httpx
+from .telemetry import instrumented
 
 LI_TOKEN   = os.getenv("LI_ACCESS_TOKEN")
 FB_TOKEN   = os.getenv("FB_PAGE_TOKEN")
 FB_PAGE_ID = os.getenv("FB_PAGE_ID")
+# Extra accounts, selected with payload["account"]:
+#   LI_ACCOUNTS={"brand": "<access token>"}
+#   FB_ACCOUNTS={"brand": {"token": "<page token>", "page_id": "<optional>"}}
+LI_ACCOUNTS = json.loads(os.getenv("LI_ACCOUNTS") or "{}")
+FB_ACCOUNTS = json.loads(os.getenv("FB_ACCOUNTS") or "{}")
 
-@async_retry()
-async def post_linkedin(payload: dict) -> dict:
+class IdentityCache:
+    """
+    Identities (LinkedIn author URN, Facebook page id) resolved once per access token.
+
+    Keyed by a hash of the token, so a rotated token naturally triggers a new
+    lookup; concurrent posts for the same account share one in-flight lookup.
+    """
+
+    def __init__(self):
+        self._ids = {}
+        self._inflight = {}
+        self.counters = {"hits": 0, "lookups": 0, "invalidations": 0}
+
+    @staticmethod
+    def _key(platform, token):
+        return platform + ":" + hashlib.sha256((token or "").encode("utf-8")).hexdigest()
+
+    async def resolve(self, platform, token, lookup):
+        """Cached identity for the token, calling `lookup()` (async) only on a miss."""
+        key = self._key(platform, token)
+        if key in self._ids:
+            self.counters["hits"] += 1
+            return self._ids[key]
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.counters["lookups"] += 1
+            task = asyncio.ensure_future(lookup())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        identity = await asyncio.shield(task)
+        self._ids[key] = identity
+        return identity
+
+    def invalidate(self, platform, token):
+        self.counters["invalidations"] += 1
+        self._ids.pop(self._key(platform, token), None)
+
+    def stats(self) -> dict:
+        return {**self.counters, "cached": len(self._ids)}
+
+identities = IdentityCache()
+
+def _linkedin_token(account=None):
+    if not account:
+        return LI_TOKEN
+    if account not in LI_ACCOUNTS:
+        raise ValueError(f"Unknown LinkedIn account: {account}")
+    return LI_ACCOUNTS[account]
+
+def _facebook_credentials(account=None):
+    """(page token, configured page id or None)."""
+    if not account:
+        return FB_TOKEN, FB_PAGE_ID
+    if account not in FB_ACCOUNTS:
+        raise ValueError(f"Unknown Facebook account: {account}")
+    return FB_ACCOUNTS[account]["token"], FB_ACCOUNTS[account].get("page_id")
+
+# No retries here: a lost response could mean a double post. The publish queue
+# (app/jobs.py) decides what is safe to retry.
+@async_retry(retries=1, name="publish.linkedin", upstream="api.linkedin.com")
+@instrumented("publish", upstream="api.linkedin.com")
+async def post_linkedin(payload: dict, client=None) -> dict:
     """
     Publish a post to LinkedIn using the UGC API.
-    payload: { text: str, imageUrl?: str }
+    payload: { text: str, imageUrl?: str, account?: str }
+    client: httpx.AsyncClient to use (defaults to the shared pool)
     Returns: { status: "ok", id: "urn:li:ugcPost:..." }
     """
     # Use projection to request profile fields (mandatory in v2)
     me_url   = "https://api.linkedin.com/v2/me?projection=(id)"
     post_url = "https://api.linkedin.com/v2/ugcPosts"
+    token    = _linkedin_token(payload.get("account"))
     headers  = {
-        "Authorization": f"Bearer {LI_TOKEN}",
+        "Authorization": f"Bearer {token}",
         "Content-Type": "application/json",
         "X-Restli-Protocol-Version": "2.0.0",
     }
-    async with httpx.AsyncClient() as client:
-        # 1. Fetch profile URN
+    client = client or get_httpx()
+
+    async def fetch_author():
         profile_resp = await client.get(me_url, headers=headers)
         profile_resp.raise_for_status()
-        me = profile_resp.json()
-        author_urn = f"urn:li:person:{me['id']}"
-
-        # 2. Build the post body
-        body = {
-            "author": author_urn,
-            "lifecycleState": "PUBLISHED",
-            "visibility": {"com.linkedin.ugc.MemberNetworkVisibility": "PUBLIC"},
-            "specificContent": {
-                "com.linkedin.ugc.ShareContent": {
-                    "shareCommentary": {"text": payload.get("text")},
-                    "shareMediaCategory": "NONE",
-                }
+        return f"urn:li:person:{profile_resp.json()['id']}"
+
+    # 1. Profile URN - looked up once per access token
+    author_urn = await identities.resolve("linkedin", token, fetch_author)
+
+    # 2. Build the post body
+    body = {
+        "author": author_urn,
+        "lifecycleState": "PUBLISHED",
+        "visibility": {"com.linkedin.ugc.MemberNetworkVisibility": "PUBLIC"},
+        "specificContent": {
+            "com.linkedin.ugc.ShareContent": {
+                "shareCommentary": {"text": payload.get("text")},
+                "shareMediaCategory": "NONE",
             }
         }
-        # 3. Attach image if provided
-        if payload.get("imageUrl"):
-            share = body["specificContent"]["com.linkedin.ugc.ShareContent"]
-            share["shareMediaCategory"] = "IMAGE"
-            share["media"] = [{
-                "status": "READY",
-                "description": {"text": payload.get("text")},
-                "media": payload.get("imageUrl"),
-                "title": {"text": ""},
-            }]
-
-        # 4. Send POST to LinkedIn
+    }
+    # 3. Attach image if provided
+    if payload.get("imageUrl"):
+        share = body["specificContent"]["com.linkedin.ugc.ShareContent"]
+        share["shareMediaCategory"] = "IMAGE"
+        share["media"] = [{
+            "status": "READY",
+            "description": {"text": payload.get("text")},
+            "media": payload.get("imageUrl"),
+            "title": {"text": ""},
+        }]
+
+    # 4. Send POST to LinkedIn
+    post_resp = await client.post(post_url, headers=headers, json=body)
+    if post_resp.status_code == 401:
+        # Nothing was posted; the cached identity may belong to a revoked/rotated
+        # token. Look it up again (raises if the token itself is bad) and retry once.
+        identities.invalidate("linkedin", token)
+        body["author"] = await identities.resolve("linkedin", token, fetch_author)
         post_resp = await client.post(post_url, headers=headers, json=body)
-        post_resp.raise_for_status()
-        data = post_resp.json()
-        return {"status": "ok", "id": data.get("id")}  
+    post_resp.raise_for_status()
+    data = post_resp.json()
+    return {"status": "ok", "id": data.get("id")}  
 
-@async_retry()
-async def post_facebook(payload: dict) -> dict:
+@async_retry(retries=1, name="publish.facebook", upstream="graph.facebook.com")
+@instrumented("publish", upstream="graph.facebook.com")
+async def post_facebook(payload: dict, client=None) -> dict:
     """
     Publish a post to a Facebook Page.
-    payload: { text: str, link?: str }
+    payload: { text: str, link?: str, account?: str }
+    client: httpx.AsyncClient to use (defaults to the shared pool)
     Returns: { status: "ok", id: "<pageID>_<postID>" }
     """
-    post_url = f"https://graph.facebook.com/v14.0/{FB_PAGE_ID}/feed"
-    params = {"access_token": FB_TOKEN, "message": payload.get("text")}
+    token, page_id = _facebook_credentials(payload.get("account"))
+    client = client or get_httpx()
+
+    async def fetch_page_id():
+        # A page access token's /me is the page itself
+        me_resp = await client.get("https://graph.facebook.com/v14.0/me",
+                                   params={"access_token": token, "fields": "id"})
+        me_resp.raise_for_status()
+        return me_resp.json()["id"]
+
+    if not page_id:
+        page_id = await identities.resolve("facebook", token, fetch_page_id)
+
+    post_url = f"https://graph.facebook.com/v14.0/{page_id}/feed"
+    params = {"access_token": token, "message": payload.get("text")}
     if payload.get("link"):
         params["link"] = payload.get("link")
 
-    async with httpx.AsyncClient() as client:
-        fb_resp = await client.post(post_url, params=params)
-        fb_resp.raise_for_status()
-        data = fb_resp.json()
-        return {"status": "ok", "id": data.get("id")}  
+    fb_resp = await client.post(post_url, params=params)
+    fb_resp.raise_for_status()
+    data = fb_resp.json()
+    return {"status": "ok", "id": data.get("id")}  
@@ -0,0 +1,210 @@
+# <app/retry.py>
+import asyncio, functools, os, random, time
+from email.utils import parsedate_to_datetime
+import aiohttp
+import httpx
+from .telemetry import retries as retry_counter
+
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "30"))  # cap for one backoff sleep
+# Process-wide retry budget: every call earns RETRY_BUDGET_RATIO retry tokens (up to
+# RETRY_BUDGET_MAX), every retry spends one - retries stay a bounded share of traffic
+RETRY_BUDGET_RATIO = float(os.getenv("RETRY_BUDGET_RATIO", "0.2"))
+RETRY_BUDGET_MAX = float(os.getenv("RETRY_BUDGET_MAX", "20"))
+# Per-host circuit breaker
+CIRCUIT_FAILURES = int(os.getenv("CIRCUIT_FAILURES", "5"))  # consecutive failures to open
+CIRCUIT_RESET = float(os.getenv("CIRCUIT_RESET", "30"))  # seconds before a trial call
+
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open."""
+
+class RetryBudget:
+    def __init__(self, ratio=RETRY_BUDGET_RATIO, max_tokens=RETRY_BUDGET_MAX):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+
+    def deposit(self):
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+class CircuitBreaker:
+    """closed → (CIRCUIT_FAILURES in a row) → open → (CIRCUIT_RESET s) → half-open: one trial call."""
+
+    def __init__(self, failures=CIRCUIT_FAILURES, reset=CIRCUIT_RESET):
+        self.threshold = failures
+        self.reset = reset
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self.trial_running:
+            self.trial_running = True
+            return True
+        return False
+
+    def success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+
+    def release(self):
+        """The call ended without an outcome (cancelled): free the trial slot, keep the state."""
+        self.trial_running = False
+
+    def failure(self):
+        self.failures += 1
+        if self.trial_running or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+        self.trial_running = False
+
+budget = RetryBudget()
+breakers = {}
+metrics = {}
+
+def _status_and_headers(exc):
+    if isinstance(exc, aiohttp.ClientResponseError):
+        return exc.status, exc.headers or {}
+    response = getattr(exc, "response", None)
+    if response is not None and hasattr(response, "status_code"):
+        return response.status_code, response.headers
+    status = getattr(exc, "status_code", None) or getattr(exc, "status", None)
+    return (status if isinstance(status, int) else None), {}
+
+def _retry_after(headers):
+    value = headers.get("Retry-After") if headers else None
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        try:
+            return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+        except (TypeError, ValueError):
+            return None
+
+def classify(exc):
+    """
+    Return (retryable, retry_after_seconds) for an exception.
+
+    Retryable: timeouts, connection errors and HTTP 408/425/429/5xx. Everything
+    else (4xx auth/validation errors, bugs, open circuits) fails immediately.
+    """
+    if isinstance(exc, CircuitOpenError):
+        return False, None
+    status, headers = _status_and_headers(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUS, _retry_after(headers)
+    if isinstance(exc, (asyncio.TimeoutError, TimeoutError, ConnectionError,
+                        aiohttp.ClientConnectionError, aiohttp.ServerTimeoutError,
+                        httpx.TimeoutException, httpx.NetworkError)):
+        return True, None
+    # openai SDK errors without a status
+    if type(exc).__name__ in ("APIConnectionError", "APITimeoutError"):
+        return True, None
+    return False, None
+
+def backoff(attempt, delay, max_delay=RETRY_MAX_DELAY):
+    """Exponential backoff with equal jitter: half fixed, half random."""
+    base = min(max_delay, delay * 2 ** attempt)
+    return base / 2 + random.uniform(0, base / 2)
+
+def async_retry(retries=3, delay=1, deadline=None, name=None, upstream=None):
+    """
+    Retry an async call on transient upstream errors.
+
+    Args:
+        retries: Total attempts (first call included)
+        delay: Base backoff in seconds, doubled per attempt (with jitter, capped
+            at RETRY_MAX_DELAY); a Retry-After header takes precedence
+        deadline: Seconds for all attempts together; no retry starts past it
+        name: Policy name for metrics (defaults to the function name)
+        upstream: Host for the circuit breaker - a string, or a callable taking
+            the wrapped function's arguments
+    """
+    def decorator(fn):
+        policy = name or fn.__qualname__
+        stats = metrics.setdefault(policy, {
+            "calls": 0, "successes": 0, "failures": 0, "retries": 0, "non_retryable": 0,
+            "budget_exhausted": 0, "deadline_exceeded": 0, "short_circuited": 0,
+        })
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            stats["calls"] += 1
+            budget.deposit()
+            host = upstream(*args, **kwargs) if callable(upstream) else upstream
+            breaker = breakers.setdefault(host, CircuitBreaker()) if host else None
+            started = time.monotonic()
+
+            for attempt in range(retries):
+                if breaker is not None and not breaker.allow():
+                    stats["short_circuited"] += 1
+                    raise CircuitOpenError(f"circuit open for {host}")
+                try:
+                    if deadline is None:
+                        result = await fn(*args, **kwargs)
+                    else:
+                        remaining = deadline - (time.monotonic() - started)
+                        result = await asyncio.wait_for(fn(*args, **kwargs), max(remaining, 0.001))
+                except Exception as e:
+                    retryable, retry_after = classify(e)
+                    if breaker is not None:
+                        # Only upstream-health errors count against the host
+                        if retryable:
+                            breaker.failure()
+                        else:
+                            breaker.success()
+                    if not retryable:
+                        stats["non_retryable"] += 1
+                        raise
+                    if attempt == retries - 1:
+                        stats["failures"] += 1
+                        raise
+                    sleep = retry_after if retry_after is not None else backoff(attempt, delay)
+                    if deadline is not None and time.monotonic() - started + sleep >= deadline:
+                        stats["deadline_exceeded"] += 1
+                        raise
+                    if not budget.withdraw():
+                        stats["budget_exhausted"] += 1
+                        raise
+                    stats["retries"] += 1
+                    retry_counter.inc(policy=policy, upstream=host or "")
+                    await asyncio.sleep(sleep)
+                except BaseException:
+                    # Cancelled mid-call (client gone, deadline): says nothing about the host
+                    if breaker is not None:
+                        breaker.release()
+                    raise
+                else:
+                    if breaker is not None:
+                        breaker.success()
+                    stats["successes"] += 1
+                    return result
+        return wrapper
+    return decorator
+
+def retry_stats() -> dict:
+    return {
+        "policies": {name: dict(stats) for name, stats in metrics.items()},
+        "budget": {"tokens": round(budget.tokens, 2), "max": budget.max_tokens, "ratio": budget.ratio},
+        "circuits": {host: {"state": b.state, "failures": b.failures} for host, b in breakers.items()},
+    }
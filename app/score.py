@@ -1,72 +1,125 @@
 # <app/score.py>
-from datetime import datetime, timezone
-import re
-
-def score_items(items):
-    """Score items based on multiple viral indicators"""
-    scored_items = []
-    
-    # Viral indicator keywords with their score boosts
-    viral_indicators = {
-        # AI/Tech trends
-        "ai": 0.15, "chatgpt": 0.2, "gpt": 0.15, "llm": 0.15,
-        "automation": 0.1, "machine learning": 0.15,
-        
-        # Marketing trends
-        "roi": 0.1, "conversion": 0.1, "engagement": 0.1,
-        "personalization": 0.12, "customer data": 0.12,
-        
-        # Hot topics
-        "privacy": 0.15, "cookieless": 0.15, "first-party data": 0.15,
-        "tiktok": 0.12, "gen z": 0.12, "sustainability": 0.1,
-        
-        # Urgency/Trending
-        "breaking": 0.15, "just announced": 0.15, "new study": 0.12,
-        "2025": 0.1, "trends": 0.1, "future": 0.08
-    }
-    
+import heapq, json, os, re, time
+from .telemetry import instrumented
+
+SCORE_INDICATORS_FILE = os.getenv("SCORE_INDICATORS_FILE")  # optional JSON {"term": boost}
+RECENCY_MAX_BOOST = float(os.getenv("RECENCY_MAX_BOOST", "0.2"))  # boost for brand-new items
+RECENCY_HALF_LIFE_HOURS = float(os.getenv("RECENCY_HALF_LIFE_HOURS", "36"))
+
+# Viral indicator keywords with their score boosts
+DEFAULT_INDICATORS = {
+    # AI/Tech trends
+    "ai": 0.15, "chatgpt": 0.2, "gpt": 0.15, "llm": 0.15,
+    "automation": 0.1, "machine learning": 0.15,
+
+    # Marketing trends
+    "roi": 0.1, "conversion": 0.1, "engagement": 0.1,
+    "personalization": 0.12, "customer data": 0.12,
+
+    # Hot topics
+    "privacy": 0.15, "cookieless": 0.15, "first-party data": 0.15,
+    "tiktok": 0.12, "gen z": 0.12, "sustainability": 0.1,
+
+    # Urgency/Trending
+    "breaking": 0.15, "just announced": 0.15, "new study": 0.12,
+    "2025": 0.1, "trends": 0.1, "future": 0.08
+}
+
+_WORD = re.compile(r"\w+")
+
+class IndicatorMatcher:
+    """
+    Indicator table compiled into a phrase lookup keyed by word tuples.
+
+    Terms and headlines are tokenized the same way, so matches respect word
+    boundaries ("ai" no longer fires on "said") and "first-party data"
+    matches "first party data". Cost per headline depends on its length and
+    the distinct term lengths, not on how many terms the table holds.
+    """
+
+    def __init__(self, table):
+        self.phrases = {}
+        for term, boost in table.items():
+            words = tuple(_WORD.findall(term.lower()))
+            if words:
+                self.phrases[words] = float(boost)
+        self.lengths = sorted({len(words) for words in self.phrases})
+
+    def boost(self, words) -> float:
+        """Sum of boosts for every distinct indicator found in the tokenized headline."""
+        found = set()
+        for i in range(len(words)):
+            for n in self.lengths:
+                if i + n > len(words):
+                    break
+                phrase = tuple(words[i:i + n])
+                if phrase in self.phrases:
+                    found.add(phrase)
+        return sum(self.phrases[phrase] for phrase in found)
+
+def load_indicators(path=SCORE_INDICATORS_FILE):
+    """Indicator table from a JSON file ({"term": boost}), or the built-in one."""
+    if not path:
+        return DEFAULT_INDICATORS
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+_matcher = IndicatorMatcher(load_indicators())
+
+def set_indicators(table):
+    """Swap in a new indicator table (compiled once, used by every later call)."""
+    global _matcher
+    _matcher = IndicatorMatcher(table)
+
+def _score(item, matcher, now):
+    score = 0.5  # Base score
+    headline_lower = item["headline"].lower()
+
+    # Check for viral indicators
+    score += matcher.boost(_WORD.findall(headline_lower))
+
+    # Boost for Reddit upvotes
+    reddit_score = item.get("score", 0)
+    if reddit_score > 1000:
+        score += 0.25
+    elif reddit_score > 500:
+        score += 0.2
+    elif reddit_score > 100:
+        score += 0.15
+    elif reddit_score > 50:
+        score += 0.1
+
+    # Boost for recent content: exponential decay on age.
+    # `published` is epoch seconds, normalized once by gather_sources / the API models
+    published = item.get("published")
+    if isinstance(published, (int, float)) and not isinstance(published, bool):
+        hours_old = max(now - published, 0) / 3600
+        score += RECENCY_MAX_BOOST * 0.5 ** (hours_old / RECENCY_HALF_LIFE_HOURS)
+
+    # Check headline quality
+    if len(headline_lower.split()) > 5:  # Not too short
+        score += 0.05
+
+    if "?" in item["headline"]:  # Questions often get engagement
+        score += 0.05
+
+    # Cap at 1.0
+    return min(score, 1.0)
+
+@instrumented("score_items")
+def score_items(items, top_n=None):
+    """
+    Score items based on multiple viral indicators
+
+    Every item in the batch is scored against one reference time. With top_n,
+    only the best top_n are returned (heap selection instead of a full sort).
+    """
+    matcher = _matcher
+    now = time.time()
     for item in items:
-        score = 0.5  # Base score
-        headline_lower = item["headline"].lower()
-        
-        # Check for viral indicators
-        for indicator, boost in viral_indicators.items():
-            if indicator in headline_lower:
-                score += boost
-        
-        # Boost for Reddit upvotes
-        reddit_score = item.get("score", 0)
-        if reddit_score > 1000:
-            score += 0.25
-        elif reddit_score > 500:
-            score += 0.2
-        elif reddit_score > 100:
-            score += 0.15
-        elif reddit_score > 50:
-            score += 0.1
-        
-        # Boost for recent content
-        published = item.get("published", "")
-        if isinstance(published, (int, float)):
-            # Unix timestamp
-            pub_date = datetime.fromtimestamp(published, tz=timezone.utc)
-            hours_old = (datetime.now(timezone.utc) - pub_date).total_seconds() / 3600
-            
-            if hours_old < 24:
-                score += 0.2
-            elif hours_old < 72:
-                score += 0.1
-        
-        # Check headline quality
-        if len(headline_lower.split()) > 5:  # Not too short
-            score += 0.05
-        
-        if "?" in item["headline"]:  # Questions often get engagement
-            score += 0.05
-        
-        # Cap at 1.0
-        item["viralScore"] = min(score, 1.0)
-        scored_items.append(item)
-    
+        item["viralScore"] = _score(item, matcher, now)
+
     # Sort by viral score
-    return sorted(scored_items, key=lambda x: x["viralScore"], reverse=True)
+    if top_n is not None:
+        return heapq.nlargest(top_n, items, key=lambda x: x["viralScore"])
+    return sorted(items, key=lambda x: x["viralScore"], reverse=True)
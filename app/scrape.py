@@ -1,13 +1,37 @@
 # <app/scrape.py>
-import aiohttp, asyncio, os, random
-from .utils import async_retry
+import asyncio, json, math, os, random, time
+from collections import OrderedDict
+from urllib.parse import urlencode, urlsplit
+from .utils import async_retry, parse_timestamp
+from .clients import get_session
+from .cache import MemoryKV, get_backend
+from .items import Item, as_items, dumps
+from .telemetry import cache_requests, instrumented
 
 AI_KEY = os.getenv("AI_SEARCH_KEY")
 AI_ENDPOINT = os.getenv("AI_SEARCH_ENDPOINT", "").rstrip("/")
 AI_INDEX = os.getenv("AI_SEARCH_INDEX", "carismindex")
+AI_SEARCH_PAGE_SIZE = int(os.getenv("AI_SEARCH_PAGE_SIZE", "50"))
+AI_SEARCH_FILTER = os.getenv("AI_SEARCH_FILTER")  # optional OData $filter, e.g. "publishedAt ge 2025-01-01T00:00:00Z"
 SERP_KEY = os.getenv("SERPAPI_KEY")
 HEADERS = {"User-Agent": "CarismBot/1.0"}
 
+# Fan-out limits for one gather_sources call
+SCRAPE_CONCURRENCY = int(os.getenv("SCRAPE_CONCURRENCY", "12"))  # fetches in flight overall
+SCRAPE_SOURCE_CONCURRENCY = int(os.getenv("SCRAPE_SOURCE_CONCURRENCY", "4"))  # per upstream
+SCRAPE_DEADLINE = float(os.getenv("SCRAPE_DEADLINE", "25"))  # seconds for the whole fan-out
+SCRAPE_PARTIAL = os.getenv("SCRAPE_PARTIAL", "true").lower() in ("1", "true", "yes")
+# Pagination: items wanted per (topic, source), and a hard cap on pages fetched for it
+SCRAPE_ITEM_BUDGET = int(os.getenv("SCRAPE_ITEM_BUDGET", "100"))
+SCRAPE_MAX_PAGES = int(os.getenv("SCRAPE_MAX_PAGES", "4"))
+SCRAPE_VALIDATORS_SIZE = int(os.getenv("SCRAPE_VALIDATORS_SIZE", "512"))  # ETag/Last-Modified entries kept
+SCRAPE_VALIDATORS_BYTES = int(os.getenv("SCRAPE_VALIDATORS_BYTES", str(16 * 1024 * 1024)))  # and their bodies' total
+
+# Per-(topic, source) result cache
+SCRAPE_CACHE_TTL = float(os.getenv("SCRAPE_CACHE_TTL", "300"))  # fresh for this long, 0 disables
+SCRAPE_CACHE_STALE = float(os.getenv("SCRAPE_CACHE_STALE", "900"))  # then served stale while refreshing
+SCRAPE_CACHE_BACKEND = os.getenv("SCRAPE_CACHE_BACKEND", "memory")  # "memory" or "redis"
+
 # Marketing Intelligence trending topics
 TRENDING_TOPICS = [
     "AI marketing automation",
@@ -27,112 +51,473 @@ TRENDING_TOPICS = [
     "marketing mix modeling MMM"
 ]
 
-@async_retry()
+class ScrapeCache:
+    """
+    TTL cache for parsed source results with single-flight and stale-while-revalidate.
+
+    - fresh entries (younger than ttl) are served directly
+    - stale entries (up to ttl + stale) are served while one background refresh runs
+    - concurrent misses for the same key share a single in-flight fetch
+    Only successful fetches are stored. The backend is per-worker memory, or the
+    shared Redis/SQLite store so every worker sees the same results.
+    """
+
+    def __init__(self, ttl=SCRAPE_CACHE_TTL, stale=SCRAPE_CACHE_STALE, backend=SCRAPE_CACHE_BACKEND):
+        self.ttl = ttl
+        self.stale = stale
+        self.backend_name = backend
+        self._backend = MemoryKV() if backend == "memory" else None
+        self._inflight = {}
+        self._refreshing = set()
+        self.counters = {"hits": 0, "stale_hits": 0, "misses": 0, "coalesced": 0,
+                         "refreshes": 0, "refresh_errors": 0, "backend_errors": 0}
+
+    @property
+    def backend(self):
+        return self._backend or get_backend()
+
+    async def _read(self, key):
+        try:
+            raw = (await self.backend.mget([key]))[0]
+        except Exception as e:
+            print(f"Scrape cache read failed: {e}")
+            self.counters["backend_errors"] += 1
+            return None
+        return json.loads(raw) if raw else None
+
+    async def _write(self, key, items):
+        entry = dumps({"items": items, "fetched_at": time.time()})
+        try:
+            await self.backend.mset({key: entry}, ttl=self.ttl + self.stale)
+        except Exception as e:
+            print(f"Scrape cache write failed: {e}")
+            self.counters["backend_errors"] += 1
+
+    def _flight(self, key, fetcher):
+        """Start (or join) the single in-flight fetch for key."""
+        task = self._inflight.get(key)
+        if task is not None:
+            self.counters["coalesced"] += 1
+            return task
+
+        async def run():
+            try:
+                items, error = await fetcher()
+                if error is None:
+                    await self._write(key, items)
+                return items, error
+            finally:
+                self._inflight.pop(key, None)
+
+        task = asyncio.ensure_future(run())
+        self._inflight[key] = task
+        return task
+
+    def _refresh(self, key, fetcher):
+        if key in self._inflight:
+            return
+        self.counters["refreshes"] += 1
+        task = self._flight(key, fetcher)
+        self._refreshing.add(task)
+
+        def done(t):
+            self._refreshing.discard(t)
+            if t.cancelled() or t.exception() or t.result()[1]:
+                self.counters["refresh_errors"] += 1
+        task.add_done_callback(done)
+
+    async def get_or_fetch(self, key, fetcher):
+        """
+        Return (items, error, status) where status is "hit", "stale", "miss" or "bypass".
+
+        fetcher is an async callable returning (items, error).
+        """
+        if self.ttl <= 0:
+            items, error = await fetcher()
+            return items, error, "bypass"
+
+        entry = await self._read(key)
+        if entry is not None:
+            age = time.time() - entry["fetched_at"]
+            if age < self.ttl:
+                self.counters["hits"] += 1
+                return entry["items"], None, "hit"
+            if age < self.ttl + self.stale:
+                self.counters["stale_hits"] += 1
+                self._refresh(key, fetcher)
+                return entry["items"], None, "stale"
+
+        self.counters["misses"] += 1
+        # Shielded so a caller hitting its deadline doesn't cancel the shared fetch
+        items, error = await asyncio.shield(self._flight(key, fetcher))
+        return items, error, "miss"
+
+    def stats(self) -> dict:
+        served = self.counters["hits"] + self.counters["stale_hits"] + self.counters["misses"]
+        return {
+            **self.counters,
+            "hit_rate": round((served - self.counters["misses"]) / served, 4) if served else 0.0,
+            "inflight": len(self._inflight),
+            "backend": self.backend_name,
+            "ttl": self.ttl,
+            "stale": self.stale,
+        }
+
+scrape_cache = ScrapeCache()
+
+def _host(session, url, *args, **kwargs):
+    return urlsplit(url).netloc
+
+class ValidatorCache:
+    """
+    Last ETag/Last-Modified per request plus the payload they validate,
+    kept as compact JSON bytes and bounded by entry count and total bytes
+    (least recently used first out; a payload over the byte limit isn't kept).
+    """
+
+    def __init__(self, maxsize=SCRAPE_VALIDATORS_SIZE, maxbytes=SCRAPE_VALIDATORS_BYTES):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.bytes = 0
+        self._data = OrderedDict()
+
+    def get(self, key):
+        """(etag, last_modified, body) or None."""
+        entry = self._data.get(key)
+        if entry is not None:
+            self._data.move_to_end(key)
+        return entry
+
+    def set(self, key, etag, last_modified, body):
+        self.pop(key)
+        if len(body) > self.maxbytes:
+            return
+        self._data[key] = (etag, last_modified, body)
+        self.bytes += len(body)
+        while len(self._data) > self.maxsize or self.bytes > self.maxbytes:
+            _, (_, _, old) = self._data.popitem(last=False)
+            self.bytes -= len(old)
+
+    def pop(self, key):
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self.bytes -= len(entry[2])
+
+    def __len__(self):
+        return len(self._data)
+
+_validators = ValidatorCache()
+
+# Timing sits inside the retry loop, so every attempt is one upstream sample
+@async_retry(name="scrape.fetch", upstream=_host)
+@instrumented("fetch", upstream=_host)
 async def fetch(session, url, params=None, headers=None):
-    async with session.get(url, params=params, headers=headers or HEADERS, timeout=30) as r:
+    """
+    GET a JSON payload. When the previous response for the same request
+    carried an ETag or Last-Modified, it is revalidated and a 304 reuses the
+    remembered payload instead of downloading it again.
+    """
+    key = url + "?" + urlencode(sorted((params or {}).items()))
+    previous = _validators.get(key)
+    headers = dict(headers or HEADERS)
+    if previous is not None:
+        etag, last_modified, _ = previous
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+    async with session.get(url, params=params, headers=headers) as r:
+        if r.status == 304 and previous is not None:
+            cache_requests.inc(cache="conditional", upstream=_host(session, url), result="not_modified")
+            return json.loads(previous[2])
         r.raise_for_status()
-        return await r.json()
+        data = await r.json()
+        etag, last_modified = r.headers.get("ETag"), r.headers.get("Last-Modified")
 
-async def gather_sources(topic=None):
-    """Return unified list of trending content for a specific topic."""
-    
-    # Use provided topic or pick a random trending one
-    if not topic:
-        topic = random.choice(TRENDING_TOPICS)
-    
-    async with aiohttp.ClientSession() as session:
-        # Search Reddit marketing subreddits
-        reddit = fetch(
-            session,
-            "https://www.reddit.com/r/marketing/search.json",
-            params={
-                "q": topic,
-                "t": "week",
-                "limit": 25,
-                "sort": "relevance",
-                "restrict_sr": "true"
-            },
+    if previous is not None:
+        cache_requests.inc(cache="conditional", upstream=_host(session, url), result="modified")
+    if etag or last_modified:
+        _validators.set(key, etag, last_modified, dumps(data))
+    return data
+
+def _reddit_request(topic):
+    return (
+        "https://www.reddit.com/r/marketing/search.json",
+        {
+            "q": topic,
+            "t": "week",
+            "limit": min(SCRAPE_ITEM_BUDGET, 100),  # Reddit's page maximum
+            "sort": "relevance",
+            "restrict_sr": "true"
+        },
+        None,
+    )
+
+def _reddit_next(params, data):
+    """Params for the page after `data` (cursor pagination), or None at the end."""
+    after = (data.get("data") or {}).get("after") if isinstance(data, dict) else None
+    return {**params, "after": after} if after else None
+
+def _parse_reddit(data, topic):
+    if not isinstance(data, dict) or "data" not in data:
+        return []
+    return [
+        Item(
+            source="reddit",
+            headline=p["data"]["title"],
+            url="https://reddit.com" + p["data"]["permalink"],
+            published=parse_timestamp(p["data"]["created_utc"]),
+            score=p["data"]["score"],  # Reddit upvotes
+            topic=topic
         )
+        for p in data["data"]["children"]
+        if p["data"]["score"] > 5  # Quality filter
+    ]
 
-        # Search Azure AI Search with the topic
-        ai_news = fetch(
-            session,
-            f"{AI_ENDPOINT}/indexes/{AI_INDEX}/docs",
-            params={
-                "api-version": "2023-11-01",
-                "search": topic,
-                "$searchFields": "title,description",
-                "$top": 25
-            },
-            headers={
-                **HEADERS,
-                "api-key": AI_KEY,
-            }
+def _ai_search_request(topic):
+    return (
+        f"{AI_ENDPOINT}/indexes/{AI_INDEX}/docs",
+        {
+            "api-version": "2023-11-01",
+            "search": topic,
+            "$searchFields": "title,description",
+            # Only the fields _parse_ai_search reads
+            "$select": "title,link,publishedAt",
+            "$top": min(SCRAPE_ITEM_BUDGET, AI_SEARCH_PAGE_SIZE),
+            **({"$filter": AI_SEARCH_FILTER} if AI_SEARCH_FILTER else {}),
+        },
+        {
+            **HEADERS,
+            "api-key": AI_KEY,
+        },
+    )
+
+def _ai_search_page(params, index):
+    """Params for page `index` (offset pagination, so pages can be fetched concurrently)."""
+    return {**params, "$skip": index * params["$top"]} if index else params
+
+def _parse_ai_search(data, topic):
+    if not isinstance(data, dict) or "value" not in data:
+        return []
+    return [
+        Item(
+            source="ai-search",
+            headline=a.get("title", "Untitled"),
+            url=a.get("link", "#"),
+            published=parse_timestamp(a.get("publishedAt")),
+            topic=topic
+        )
+        for a in data.get("value", [])
+    ]
+
+def _serp_request(topic):
+    return (
+        "https://serpapi.com/search.json",
+        {
+            "api_key": SERP_KEY,
+            "engine": "google_news",
+            "q": f"{topic} marketing trends"
+        },
+        None,
+    )
+
+def _parse_serp(data, topic):
+    if not isinstance(data, dict):
+        return []
+    return [
+        Item(
+            source="serpapi",
+            headline=s["title"],
+            url=s["link"],
+            published=parse_timestamp(s.get("date")),
+            snippet=s.get("snippet", ""),
+            topic=topic
+        )
+        for s in data.get("news_results", [])
+    ]
+
+# name -> (request builder, parser, enabled?) in the order items are returned
+SOURCES = {
+    "reddit": (_reddit_request, _parse_reddit, lambda: True),
+    "ai-search": (_ai_search_request, _parse_ai_search, lambda: bool(AI_ENDPOINT)),
+    "serpapi": (_serp_request, _parse_serp, lambda: bool(SERP_KEY)),
+}
+
+# name -> ("cursor", next params from a page) or ("offset", params for page i).
+# Sources not listed are one request (SerpAPI's google_news engine returns
+# every result in one response and takes no paging parameters).
+PAGING = {
+    "reddit": ("cursor", _reddit_next),
+    "ai-search": ("offset", _ai_search_page),
+}
+
+async def _fetch_pages(session, name, topic, limit_all, limit_source, budget=None):
+    """Fetch and parse pages of one (source, topic) until the item budget is met."""
+    build, parse, _ = SOURCES[name]
+    url, params, headers = build(topic)
+    kind, paging = PAGING.get(name, (None, None))
+    budget = SCRAPE_ITEM_BUDGET if budget is None else budget
+
+    async def page(page_params):
+        async with limit_all, limit_source:
+            return await fetch(session, url, params=page_params, headers=headers)
+
+    if kind == "offset":
+        # Page offsets are known upfront: fetch them concurrently
+        count = min(SCRAPE_MAX_PAGES, max(1, math.ceil(budget / params["$top"])))
+        pages = await asyncio.gather(*(page(paging(params, i)) for i in range(count)), return_exceptions=True)
+        if isinstance(pages[0], BaseException):
+            raise pages[0]
+        items = []
+        for data in pages:
+            if isinstance(data, BaseException):
+                print(f"{name} page for {topic!r} failed: {data}")
+                continue
+            items.extend(parse(data, topic))
+    elif kind == "cursor":
+        items = []
+        page_params = params
+        for _ in range(SCRAPE_MAX_PAGES):
+            data = await page(page_params)
+            items.extend(parse(data, topic))
+            page_params = paging(page_params, data)
+            if len(items) >= budget or page_params is None:
+                break
+    else:
+        items = parse(await page(params), topic)
+    return items[:budget]
+
+async def _fetch_source(session, name, topic, limit_all, limit_source):
+    """Fetch and parse one (source, topic) pair via the cache. Never raises; failures land in "error"."""
+    async def load():
+        try:
+            return await _fetch_pages(session, name, topic, limit_all, limit_source), None
+        except Exception as e:
+            return [], f"{type(e).__name__}: {e}"
+
+    start = time.perf_counter()
+    items, error, status = await scrape_cache.get_or_fetch(f"scrape:{name}:{topic}", load)
+    # Cache hits come back as plain dicts
+    items = as_items(items)
+    elapsed_ms = round((time.perf_counter() - start) * 1000, 1)
+    cache_requests.inc(cache="scrape", upstream=name, result=status)
+    return {"source": name, "topic": topic, "items": items, "ms": elapsed_ms, "error": error, "cache": status}
+
+def _start_fetches(topics, session=None):
+    """Schedule every (topic, enabled source) fetch; returns (sources, {(topic, source): task})."""
+    sources = [name for name, (_, _, enabled) in SOURCES.items() if enabled()]
+    limit_all = asyncio.Semaphore(SCRAPE_CONCURRENCY)
+    limit_source = {name: asyncio.Semaphore(SCRAPE_SOURCE_CONCURRENCY) for name in sources}
+
+    session = session or get_session()
+    tasks = {
+        (t, name): asyncio.create_task(
+            _fetch_source(session, name, t, limit_all, limit_source[name])
         )
+        for t in topics
+        for name in sources
+    }
+    return sources, tasks
 
-        tasks = [reddit, ai_news]
-        
-        # Search Google News for the topic
-        if SERP_KEY:
-            serp = fetch(
-                session,
-                "https://serpapi.com/search.json",
-                params={
-                    "api_key": SERP_KEY,
-                    "engine": "google_news",
-                    "q": f"{topic} marketing trends"
-                },
+async def iter_sources(topics, deadline=None, session=None):
+    """
+    Yield each (topic, source) result as soon as it completes, fastest first.
+
+    Result dicts are those of _fetch_source ({source, topic, items, ms, error,
+    cache}). Fetches still running at the deadline are cancelled and yielded
+    with error "deadline exceeded".
+    """
+    deadline = SCRAPE_DEADLINE if deadline is None else deadline
+    _, tasks = _start_fetches(list(dict.fromkeys(topics)), session)
+    pending = set(tasks.values())
+    loop = asyncio.get_running_loop()
+    ends_at = loop.time() + deadline
+    try:
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, timeout=max(ends_at - loop.time(), 0), return_when=asyncio.FIRST_COMPLETED
             )
-            tasks.append(serp)
-
-        raw = await asyncio.gather(*tasks, return_exceptions=True)
-
-        # Process Reddit results
-        reddit_items = []
-        if isinstance(raw[0], dict) and "data" in raw[0]:
-            reddit_items = [
-                {
-                    "source": "reddit",
-                    "headline": p["data"]["title"],
-                    "url": "https://reddit.com" + p["data"]["permalink"],
-                    "published": p["data"]["created_utc"],
-                    "score": p["data"]["score"],  # Reddit upvotes
-                    "topic": topic
-                }
-                for p in raw[0]["data"]["children"]
-                if p["data"]["score"] > 5  # Quality filter
-            ]
-
-        # Process AI Search results
-        ai_items = []
-        if isinstance(raw[1], dict) and "value" in raw[1]:
-            ai_items = [
-                {
-                    "source": "ai-search",
-                    "headline": a.get("title", "Untitled"),
-                    "url": a.get("link", "#"),
-                    "published": a.get("publishedAt", "2025-01-01T00:00:00Z"),
-                    "topic": topic
-                }
-                for a in raw[1].get("value", [])
-            ]
-
-        # Process SERP results
-        serp_items = []
-        if SERP_KEY and len(raw) > 2 and isinstance(raw[2], dict):
-            serp_items = [
-                {
-                    "source": "serpapi",
-                    "headline": s["title"],
-                    "url": s["link"],
-                    "published": s.get("date"),
-                    "snippet": s.get("snippet", ""),
-                    "topic": topic
-                }
-                for s in raw[2].get("news_results", [])
-            ]
+            if not done:
+                break
+            for task in done:
+                yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
 
-        return {
-            "topic_searched": topic,
-            "items": reddit_items + ai_items + serp_items
-        }
+    for (t, name), task in tasks.items():
+        if task in pending:
+            yield {"source": name, "topic": t, "items": [], "ms": None,
+                   "error": "deadline exceeded", "cache": None}
+
+@instrumented("gather_sources")
+async def gather_sources(topic=None, deadline=None, partial=None, session=None):
+    """
+    Return unified list of trending content for a topic or a list of topics.
+
+    Every (topic, source) fetch runs concurrently over one session, capped by
+    SCRAPE_CONCURRENCY overall and SCRAPE_SOURCE_CONCURRENCY per source. Fetches
+    still running after `deadline` seconds are cancelled; with `partial` the
+    finished ones are returned, otherwise a TimeoutError is raised.
+
+    Uses the app-wide pooled session unless one is passed in.
+
+    A single topic returns {"topic_searched", "items", "timings"}; a list returns
+    {"topics_searched", "items", "timings"} with items grouped in topic order.
+    """
+    deadline = SCRAPE_DEADLINE if deadline is None else deadline
+    partial = SCRAPE_PARTIAL if partial is None else partial
+
+    # Use provided topic or pick a random trending one
+    single = not isinstance(topic, (list, tuple))
+    if single:
+        topics = [topic or random.choice(TRENDING_TOPICS)]
+    else:
+        topics = list(dict.fromkeys(topic))
+
+    start = time.perf_counter()
+    sources, tasks = _start_fetches(topics, session)
+    pending = set()
+    if tasks:
+        _, pending = await asyncio.wait(tasks.values(), timeout=deadline)
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+        if not partial:
+            raise asyncio.TimeoutError(
+                f"{len(pending)} of {len(tasks)} source fetches exceeded the {deadline}s deadline"
+            )
+
+    items = []
+    timings = {}
+    for t in topics:
+        per_source = {}
+        for name in sources:
+            task = tasks[(t, name)]
+            if task.cancelled():
+                per_source[name] = {"ms": None, "count": 0, "error": "deadline exceeded"}
+                continue
+            result = task.result()
+            items.extend(result["items"])
+            per_source[name] = {
+                "ms": result["ms"],
+                "count": len(result["items"]),
+                "error": result["error"],
+                "cache": result["cache"],
+            }
+        finished = [r["ms"] for r in per_source.values() if r["ms"] is not None]
+        timings[t] = {"ms": max(finished, default=None), "sources": per_source}
+
+    result = {
+        "items": items,
+        "timings": {
+            "total_ms": round((time.perf_counter() - start) * 1000, 1),
+            "partial": bool(pending),
+            "topics": timings,
+        },
+    }
+    if single:
+        return {"topic_searched": topics[0], **result}
+    return {"topics_searched": topics, **result}
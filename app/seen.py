@@ -0,0 +1,282 @@
+# <app/seen.py>
+import asyncio, hashlib, json, os, time
+from contextlib import contextmanager
+from .utils import embed_texts, normalize_rows
+
+SEEN_INDEX_PATH = os.getenv("SEEN_INDEX_PATH", "seen_index")  # directory, shared by every worker
+SEEN_WINDOW_DAYS = float(os.getenv("SEEN_WINDOW_DAYS", "7"))
+SEEN_THRESHOLD = float(os.getenv("SEEN_THRESHOLD", "0.9"))
+SEEN_QUERY_CHUNK = int(os.getenv("SEEN_QUERY_CHUNK", "65536"))  # stored rows scored per step
+
+_SCALE = 127.0  # unit vector components in [-1, 1] -> int8
+
+def url_hash(url) -> int:
+    """Stable 63-bit hash of a URL (0 for a missing one, which never matches)."""
+    if not url or url == "#":
+        return 0
+    return int.from_bytes(hashlib.blake2b(url.encode("utf-8"), digest_size=8).digest(), "little") >> 1
+
+class SeenIndex:
+    """
+    Persistent, time-windowed index of headlines already handled.
+
+    Rows are int8-quantized unit vectors (one byte per dimension, ~384 bytes
+    per headline for MiniLM), insertion times and URL hashes, kept in
+    memory-mapped files under `path` so millions of rows fit per worker and
+    survive restarts. Rows are appended in time order, so the window is a
+    suffix found by binary search and eviction drops a prefix.
+
+    Worker processes share the directory: every query holds a shared flock
+    on `path/lock` and every append or compaction an exclusive one, and each
+    re-reads the header under the lock, so a process always sees the row
+    count (and file size) the others last wrote.
+
+    A batch query is a URL-hash membership test plus one chunked int8 ->
+    float32 matrix product against the rows inside the window, so its cost
+    is linear in window size (about 3s for 200 headlines against 1M rows on
+    one core; an hourly 7-day window of a few thousand rows is milliseconds).
+    """
+
+    def __init__(self, path=SEEN_INDEX_PATH, window_days=SEEN_WINDOW_DAYS, threshold=SEEN_THRESHOLD,
+                 query_chunk=SEEN_QUERY_CHUNK):
+        self.path = path
+        self.window = window_days * 86400
+        self.threshold = threshold
+        self.query_chunk = query_chunk
+        self.dim = None
+        self.size = 0
+        self.capacity = 0
+        self._vectors = self._times = self._urls = None
+        self._opened = False
+        self._lock = asyncio.Lock()
+        self.counters = {"queries": 0, "queried": 0, "seen_vector": 0, "seen_url": 0, "added": 0, "evicted": 0}
+
+    # storage -----------------------------------------------------------
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _map(self, capacity):
+        import numpy as np
+        specs = (("vectors.i8", np.int8, (capacity, self.dim)),
+                 ("times.f8", np.float64, (capacity,)),
+                 ("urls.u8", np.uint64, (capacity,)))
+        maps = []
+        for name, dtype, shape in specs:
+            nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+            with open(self._file(name), "ab") as f:
+                if f.tell() < nbytes:
+                    f.truncate(nbytes)
+            maps.append(np.memmap(self._file(name), dtype=dtype, mode="r+", shape=shape))
+        self._vectors, self._times, self._urls = maps
+        self.capacity = capacity
+
+    def _open(self):
+        """(Re)load the header written by whichever process touched the index last."""
+        self._opened = True
+        header = self._file("header.json")
+        if os.path.exists(header):
+            with open(header, encoding="utf-8") as f:
+                meta = json.load(f)
+            self.dim, self.size = meta["dim"], meta["size"]
+            if meta["capacity"] != self.capacity:
+                self._map(meta["capacity"])
+
+    @contextmanager
+    def _locked(self, exclusive):
+        import fcntl
+        os.makedirs(self.path, exist_ok=True)
+        with open(self._file("lock"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                self._open()
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _flush(self):
+        for m in (self._vectors, self._times, self._urls):
+            m.flush()
+        os.makedirs(self.path, exist_ok=True)
+        tmp = self._file("header.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"dim": self.dim, "size": self.size, "capacity": self.capacity}, f)
+        os.replace(tmp, self._file("header.json"))
+
+    def _reserve(self, dim, extra):
+        if self.dim is None:
+            self.dim = dim
+            os.makedirs(self.path, exist_ok=True)
+        elif dim != self.dim:
+            raise ValueError(f"Seen index holds {self.dim}-d vectors, got {dim}-d")
+        needed = self.size + extra
+        if needed > self.capacity:
+            # Grow geometrically; the files are extended in place
+            self._map(max(needed, 2 * self.capacity, 1024))
+
+    def _window_start(self, now):
+        import numpy as np
+        if not self.size:
+            return 0
+        return int(np.searchsorted(self._times[:self.size], now - self.window, side="left"))
+
+    # sync work, run in a thread -----------------------------------------
+
+    def _query(self, unit, hashes, now):
+        with self._locked(exclusive=False):
+            return self._query_locked(unit, hashes, now)
+
+    def _query_locked(self, unit, hashes, now):
+        import numpy as np
+        seen = np.zeros(len(hashes), dtype=bool)
+        start = self._window_start(now)
+        if self.size <= start or self.dim is None:
+            return seen, seen.copy()
+
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        by_url = (hashes != 0) & np.isin(hashes, self._urls[start:self.size])
+
+        by_vector = np.zeros(len(hashes), dtype=bool)
+        # Rows already matched by URL skip the (linear-cost) vector scan
+        todo = np.flatnonzero(~by_url)
+        if unit is not None and len(todo) and unit.shape[1] == self.dim:
+            # Quantized dot product ≈ cosine * 127²; compare in that scale
+            query = np.round(unit[todo] * _SCALE).astype(np.float32)
+            limit = self.threshold * _SCALE * _SCALE
+            hit = np.zeros(len(todo), dtype=bool)
+            for k in range(start, self.size, self.query_chunk):
+                block = self._vectors[k:min(k + self.query_chunk, self.size)].astype(np.float32)
+                hit |= ((query @ block.T) >= limit).any(axis=1)
+            by_vector[todo] = hit
+        return by_vector, by_url
+
+    def _add(self, unit, hashes, now):
+        if not len(hashes):
+            return
+        with self._locked(exclusive=True):
+            self._add_locked(unit, hashes, now)
+
+    def _add_locked(self, unit, hashes, now):
+        import numpy as np
+        n = len(hashes)
+        self._reserve(unit.shape[1], n)
+        # Keep times non-decreasing even if the clock steps back
+        if self.size:
+            now = max(now, float(self._times[self.size - 1]))
+        rows = slice(self.size, self.size + n)
+        self._vectors[rows] = np.clip(np.round(unit * _SCALE), -127, 127).astype(np.int8)
+        self._times[rows] = now
+        self._urls[rows] = np.asarray(hashes, dtype=np.uint64)
+        self.size += n
+        self.counters["added"] += n
+
+        # Compact once a quarter of the rows have aged out of the window
+        if self._window_start(now) * 4 >= self.size:
+            self._evict(now)
+        self._flush()
+
+    def _evict(self, now):
+        start = self._window_start(now)
+        if not start:
+            return 0
+        live = self.size - start
+        # Shift the live suffix to the front in chunks (memmap to memmap)
+        for k in range(0, live, self.query_chunk):
+            end = min(k + self.query_chunk, live)
+            self._vectors[k:end] = self._vectors[start + k:start + end]
+            self._times[k:end] = self._times[start + k:start + end]
+            self._urls[k:end] = self._urls[start + k:start + end]
+        self.size = live
+        self.counters["evicted"] += start
+        return start
+
+    # async API ----------------------------------------------------------
+
+    async def seen(self, vectors, urls, now=None):
+        """
+        Boolean mask: was each row seen within the window, by URL or at
+        cosine similarity >= threshold? vectors may be None (URL check only).
+        """
+        unit = normalize_rows(vectors) if vectors is not None and len(vectors) else None
+        hashes = [url_hash(u) for u in urls]
+        async with self._lock:
+            by_vector, by_url = await asyncio.to_thread(self._query, unit, hashes, now or time.time())
+        self.counters["queries"] += 1
+        self.counters["queried"] += len(hashes)
+        self.counters["seen_vector"] += int(by_vector.sum())
+        self.counters["seen_url"] += int((by_url & ~by_vector).sum())
+        return by_vector | by_url
+
+    async def add(self, vectors, urls, now=None):
+        if not len(urls):
+            return
+        unit = normalize_rows(vectors)
+        hashes = [url_hash(u) for u in urls]
+        async with self._lock:
+            await asyncio.to_thread(self._add, unit, hashes, now or time.time())
+
+    async def evict(self, now=None):
+        """Drop rows older than the window now. Returns how many were dropped."""
+        async with self._lock:
+            def run():
+                with self._locked(exclusive=True):
+                    dropped = self._evict(now or time.time())
+                    if dropped:
+                        self._flush()
+                    return dropped
+            return await asyncio.to_thread(run)
+
+    async def filter_new(self, items, provider="local", record=True):
+        """
+        Items not seen within the window, in order; with record, those are
+        added to the index. If embedding fails only URLs are checked (and
+        nothing is recorded, since there are no vectors to store).
+        """
+        if not items:
+            return []
+        urls = [item.get("url") for item in items]
+        try:
+            vectors = _stored_embeddings(items)
+            if vectors is None:
+                vectors = await embed_texts([item["headline"] for item in items], provider=provider)
+        except Exception as e:
+            print(f"Embedding failed ({e}), checking seen URLs only")
+            vectors = None
+
+        mask = await self.seen(vectors, urls)
+        fresh = [i for i, was_seen in enumerate(mask) if not was_seen]
+        if record and vectors is not None and fresh:
+            await self.add(vectors[fresh], [urls[i] for i in fresh])
+        return [items[i] for i in fresh]
+
+    async def record(self, items, provider="local"):
+        """Add items to the index (reusing the vectors dedupe attached, embedding the rest)."""
+        if not items:
+            return
+        vectors = _stored_embeddings(items)
+        if vectors is None:
+            vectors = await embed_texts([item["headline"] for item in items], provider=provider)
+        await self.add(vectors, [item.get("url") for item in items])
+
+    def stats(self) -> dict:
+        if not self._opened:
+            self._open()
+        return {
+            **self.counters,
+            "size": self.size,
+            "capacity": self.capacity,
+            "dim": self.dim,
+            "bytes_per_row": (self.dim or 0) + 16,
+            "window_days": self.window / 86400,
+            "threshold": self.threshold,
+        }
+
+def _stored_embeddings(items):
+    """The vectors dedupe already attached to the items, or None if any is missing."""
+    rows = [getattr(item, "embedding", None) for item in items]
+    if any(row is None for row in rows):
+        return None
+    import numpy as np
+    return np.stack(rows)
+
+seen_index = SeenIndex()
@@ -0,0 +1,142 @@
+# <app/telemetry.py>
+import asyncio, contextvars, functools, os, time
+from contextlib import contextmanager
+
+SERVER_TIMING = os.getenv("SERVER_TIMING", "false").lower() in ("1", "true", "yes")
+# Histogram buckets in seconds: sub-ms scoring up to slow LLM calls
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in self.values.items():
+            lines.append(f"{self.name}{_labels(dict(key))} {value}")
+        return lines
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.series = {}  # labels -> [per-bucket counts..., +Inf count], sum
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+        counts = series[0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+                break
+        else:
+            counts[-1] += 1
+        series[1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total) in self.series.items():
+            labels = dict(key)
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels({**labels, 'le': bound})} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(labels)} {round(total, 6)}")
+            lines.append(f"{self.name}_count{_labels(labels)} {cumulative}")
+        return lines
+
+stage_seconds = Histogram("viral_stage_duration_seconds", "Time spent per stage, labelled by upstream where there is one")
+stage_errors = Counter("viral_stage_errors_total", "Stage calls that raised")
+cache_requests = Counter("viral_cache_requests_total", "Cache lookups by cache, upstream and result")
+retries = Counter("viral_retries_total", "Retry attempts by policy and upstream")
+
+_REGISTRY = [stage_seconds, stage_errors, cache_requests, retries]
+
+# Per-request (stage, seconds) list, set by the Server-Timing middleware
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+def _record(stage, upstream, elapsed, failed):
+    labels = {"stage": stage, "upstream": upstream or ""}
+    stage_seconds.observe(elapsed, **labels)
+    if failed:
+        stage_errors.inc(**labels)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((stage, elapsed))
+
+@contextmanager
+def timed(stage, upstream=None):
+    """Time the block into viral_stage_duration_seconds (and Server-Timing)."""
+    start = time.perf_counter()
+    failed = False
+    try:
+        yield
+    except Exception:
+        failed = True
+        raise
+    finally:
+        _record(stage, upstream, time.perf_counter() - start, failed)
+
+def instrumented(stage=None, upstream=None):
+    """
+    Decorator form of timed() for sync and async functions.
+
+    upstream: a string, or a callable taking the wrapped function's arguments
+    (same convention as async_retry).
+    """
+    def decorator(fn):
+        name = stage or fn.__name__
+
+        def label(args, kwargs):
+            return upstream(*args, **kwargs) if callable(upstream) else upstream
+
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                with timed(name, label(args, kwargs)):
+                    return await fn(*args, **kwargs)
+        else:
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with timed(name, label(args, kwargs)):
+                    return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def render() -> str:
+    """Every metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in _REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+def start_request():
+    """Begin collecting stage timings for the current request; returns the list."""
+    timings = []
+    _request_timings.set(timings)
+    return timings
+
+def server_timing_header(timings) -> str:
+    """Server-Timing value, one entry per stage (repeated stages summed)."""
+    totals = {}
+    for stage, elapsed in timings:
+        totals[stage] = totals.get(stage, 0.0) + elapsed
+    return ", ".join(f"{stage};dur={elapsed * 1000:.1f}" for stage, elapsed in totals.items())
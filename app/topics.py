@@ -0,0 +1,88 @@
+# <app/topics.py>
+import asyncio, json, os
+from .scrape import TRENDING_TOPICS
+from .utils import embed_texts, normalize_rows
+
+TOPICS_FILE = os.getenv("TOPICS_FILE")  # optional catalogue overriding TRENDING_TOPICS
+
+def read_topics_file(path):
+    """Topics from a JSON list or a text file with one topic per line (# comments allowed)."""
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".json"):
+            return [str(t) for t in json.load(f)]
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+def default_topics():
+    """The configured catalogue: TOPICS_FILE if set, else TRENDING_TOPICS."""
+    return read_topics_file(TOPICS_FILE) if TOPICS_FILE else TRENDING_TOPICS
+
+class TopicIndex:
+    """
+    Embedded topic catalogue held as a normalized (n, d) matrix.
+
+    Topics are embedded once; reloading or extending the catalogue only
+    embeds topics the index hasn't seen. A query is one matrix-vector
+    product plus argpartition, cheap even for thousands of topics.
+    """
+
+    def __init__(self, provider="local"):
+        self.provider = provider
+        self.topics = []
+        self.matrix = None  # (n, d) float32 once loaded
+        self._vectors = {}
+        self._loaded = False
+        self._lock = asyncio.Lock()
+
+    async def _set(self, topics):
+        import numpy as np
+        topics = list(dict.fromkeys(t.strip() for t in topics if t and t.strip()))
+        new = [t for t in topics if t not in self._vectors]
+        if new:
+            vectors = normalize_rows(await embed_texts(new, self.provider))
+            self._vectors.update(zip(new, vectors))
+
+        # Forget removed topics, then swap in the new snapshot in one go
+        self._vectors = {t: self._vectors[t] for t in topics}
+        self.matrix = np.stack([self._vectors[t] for t in topics]) if topics else np.zeros((0, 0), dtype=np.float32)
+        self.topics = topics
+        self._loaded = True
+        return len(new)
+
+    async def load(self, topics):
+        """Replace the catalogue. Returns how many topics had to be embedded."""
+        async with self._lock:
+            return await self._set(topics)
+
+    async def add(self, topics):
+        """Append topics to the catalogue. Returns how many were new."""
+        async with self._lock:
+            return await self._set(self.topics + list(topics))
+
+    async def reload(self):
+        """Reload the default catalogue, e.g. after editing TOPICS_FILE."""
+        return await self.load(default_topics())
+
+    async def ensure_loaded(self):
+        if not self._loaded:
+            async with self._lock:
+                if not self._loaded:
+                    await self._set(default_topics())
+
+    async def search(self, query: str, top_k: int = 5):
+        """Return [(topic, similarity)] for the top_k topics closest to query, best first."""
+        await self.ensure_loaded()
+        topics, matrix = self.topics, self.matrix
+        if not topics or top_k <= 0:
+            return []
+
+        query_vec = normalize_rows(await embed_texts([query], self.provider))[0]
+        scores = matrix @ query_vec
+
+        import numpy as np
+        k = min(top_k, len(topics))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+
+        return [(topics[i], float(scores[i])) for i in top]
+
+topic_index = TopicIndex()
@@ -1,23 +1,143 @@
 # <app/utils.py>
 import time, functools, asyncio
-import aiohttp
-import os
+import os, re
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from .embeddings import get_model, embedding_cache, local_encoder, OPENAI_EMBED_MODEL
+from .clients import get_session
+from .retry import async_retry  # re-exported: modules import it from here
+from .telemetry import cache_requests, instrumented
 
-def async_retry(retries=3, delay=1):
-    def decorator(fn):
-        @functools.wraps(fn)
-        async def wrapper(*args, **kwargs):
-            for attempt in range(retries):
+# Extra absolute formats seen from upstreams (SerpAPI google_news, plain dates)
+_DATE_FORMATS = (
+    "%m/%d/%Y, %I:%M %p, %z UTC",
+    "%m/%d/%Y, %I:%M %p, %z",
+    "%m/%d/%Y",
+    "%Y-%m-%d %H:%M:%S",
+    "%b %d, %Y",
+    "%d %b %Y",
+)
+_RELATIVE = re.compile(
+    r"^(\d+|an?|one)\s+(second|sec|minute|min|hour|hr|day|week|month|year)s?\s+ago$", re.I
+)
+_UNIT_SECONDS = {
+    "second": 1, "sec": 1, "minute": 60, "min": 60, "hour": 3600, "hr": 3600,
+    "day": 86400, "week": 7 * 86400, "month": 30 * 86400, "year": 365 * 86400,
+}
+
+@functools.lru_cache(maxsize=8192)
+def _parse_absolute(text: str):
+    """Epoch seconds for an ISO-8601, RFC-2822 or known upstream date string, else None."""
+    dt = None
+    try:
+        dt = datetime.fromisoformat(text.replace("Z", "+00:00"))
+    except ValueError:
+        try:
+            dt = parsedate_to_datetime(text)
+        except (TypeError, ValueError):
+            for fmt in _DATE_FORMATS:
                 try:
-                    return await fn(*args, **kwargs)
-                except Exception as e:
-                    if attempt == retries - 1:
-                        raise
-                    await asyncio.sleep(delay)
-        return wrapper
-    return decorator
+                    dt = datetime.strptime(text, fmt)
+                    break
+                except ValueError:
+                    continue
+    if dt is None:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+def parse_timestamp(value, now=None):
+    """
+    Normalize a `published` value to epoch seconds (float), or None if unknown.
+    
+    Accepts epoch numbers (seconds or milliseconds), ISO-8601, RFC-2822,
+    SerpAPI-style dates and relative forms like "3 hours ago" / "yesterday".
+    Absolute strings are parsed once and cached.
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value / 1000 if value > 1e12 else float(value)
+    
+    text = str(value).strip()
+    if not text:
+        return None
+    try:
+        return parse_timestamp(float(text))
+    except ValueError:
+        pass
+    
+    now = time.time() if now is None else now
+    lowered = text.lower()
+    if lowered in ("just now", "now", "today"):
+        return now
+    if lowered == "yesterday":
+        return now - 86400
+    match = _RELATIVE.match(lowered)
+    if match:
+        count, unit = match.groups()
+        count = int(count) if count.isdigit() else 1
+        return now - count * _UNIT_SECONDS[unit]
+    
+    return _parse_absolute(text)
+
+# OpenAI caps one embeddings request at 2048 inputs / ~300k tokens;
+# stay well under it (4 chars ≈ 1 token)
+OPENAI_EMBED_MAX_INPUTS = int(os.getenv("OPENAI_EMBED_MAX_INPUTS", "512"))
+OPENAI_EMBED_MAX_CHARS = int(os.getenv("OPENAI_EMBED_MAX_CHARS", "400000"))
+AZURE_EMBED_CONCURRENCY = int(os.getenv("AZURE_EMBED_CONCURRENCY", "8"))
+
+async def _azure_embed(session, text: str) -> list:
+    AI_KEY = os.getenv("AI_SEARCH_KEY")
+    AI_ENDPOINT = os.getenv("AI_SEARCH_ENDPOINT")
+    
+    if not AI_KEY or not AI_ENDPOINT:
+        raise ValueError("Azure AI Search credentials not configured")
+    
+    # Azure expects the embedding endpoint format
+    url = f"{AI_ENDPOINT}/indexes/carismindex/docs/search.post.embedding"
+    
+    headers = {
+        "api-key": AI_KEY,
+        "Content-Type": "application/json"
+    }
+    
+    # Azure embedding request format
+    data = {
+        "text": text
+    }
+    
+    async with session.post(url, json=data, headers=headers) as response:
+        if response.status != 200:
+            error_text = await response.text()
+            raise Exception(f"Azure embedding failed: {error_text}")
+        
+        result = await response.json()
+        return result.get("embedding", [])
+
+def normalize_rows(vectors):
+    """Return float32 unit rows (zero rows stay zero) so cosine similarity is a dot product."""
+    import numpy as np
+    
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+def _chunk_texts(texts, max_items, max_chars):
+    """Split texts into consecutive chunks bounded by item count and total characters."""
+    chunk, chars = [], 0
+    for text in texts:
+        if chunk and (len(chunk) >= max_items or chars + len(text) > max_chars):
+            yield chunk
+            chunk, chars = [], 0
+        chunk.append(text)
+        chars += len(text)
+    if chunk:
+        yield chunk
 
 # Embedding function with multiple provider options
+@instrumented("embed_text", upstream=lambda text, provider="azure": provider)
 async def embed_text(text: str, provider: str = "azure") -> list:
     """
     Generate embeddings for text using various providers.
@@ -30,74 +150,80 @@ async def embed_text(text: str, provider: str = "azure") -> list:
         List of floats representing the embedding vector
     """
     
+    vectors = await embed_texts([text], provider)
+    return vectors[0].tolist()
+
+@instrumented("embed_texts", upstream=lambda texts, provider="azure": provider)
+async def embed_texts(texts: list, provider: str = "azure"):
+    """
+    Generate embeddings for many texts in as few model calls / requests as possible.
+    
+    Args:
+        texts: The texts to embed
+        provider: "azure", "openai", or "local"
+    
+    Returns:
+        float32 NumPy matrix of shape (len(texts), dim), rows in input order
+    """
+    import numpy as np
+    
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+    
+    if provider not in ("azure", "openai", "local"):
+        raise ValueError(f"Unknown provider: {provider}")
+    
+    # Serve what we can from the cache, embed each missing text once
+    keys = [embedding_cache.key(provider, text) for text in texts]
+    found = await embedding_cache.get_many(keys)
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key not in found:
+            missing.setdefault(key, text)
+    cache_requests.inc(len(found), cache="embeddings", upstream=provider, result="hit")
+    cache_requests.inc(len(missing), cache="embeddings", upstream=provider, result="miss")
+    
+    if missing:
+        vectors = await _embed_uncached(list(missing.values()), provider)
+        fresh = dict(zip(missing.keys(), vectors))
+        await embedding_cache.set_many(fresh)
+        found.update(fresh)
+    
+    return np.stack([found[key] for key in keys]).astype(np.float32, copy=False)
+
+@instrumented("embed_upstream", upstream=lambda texts, provider: provider)
+async def _embed_uncached(texts: list, provider: str):
+    """Call the provider for every text (no cache), returning an (n, d) float32 matrix."""
+    import numpy as np
+    
     if provider == "azure":
-        # Azure AI Search embedding
-        AI_KEY = os.getenv("AI_SEARCH_KEY")
-        AI_ENDPOINT = os.getenv("AI_SEARCH_ENDPOINT")
+        # The Azure endpoint takes one text per call - fan out over the shared session
+        semaphore = asyncio.Semaphore(AZURE_EMBED_CONCURRENCY)
         
-        if not AI_KEY or not AI_ENDPOINT:
-            raise ValueError("Azure AI Search credentials not configured")
+        async def embed_one(session, text):
+            async with semaphore:
+                return await _azure_embed(session, text)
         
-        async with aiohttp.ClientSession() as session:
-            # Azure expects the embedding endpoint format
-            url = f"{AI_ENDPOINT}/indexes/carismindex/docs/search.post.embedding"
-            
-            headers = {
-                "api-key": AI_KEY,
-                "Content-Type": "application/json"
-            }
-            
-            # Azure embedding request format
-            data = {
-                "text": text
-            }
-            
-            async with session.post(url, json=data, headers=headers) as response:
-                if response.status != 200:
-                    error_text = await response.text()
-                    raise Exception(f"Azure embedding failed: {error_text}")
-                
-                result = await response.json()
-                return result.get("embedding", [])
+        session = get_session()
+        vectors = await asyncio.gather(*(embed_one(session, t) for t in texts))
+        return np.asarray(vectors, dtype=np.float32)
     
     elif provider == "openai":
-        # OpenAI embeddings (requires openai package and API key)
-        OPENAI_KEY = os.getenv("OPENAI_API_KEY")
-        
-        if not OPENAI_KEY:
-            raise ValueError("OpenAI API key not configured")
-        
-        # You'll need to: pip install openai
-        import openai
-        
-        client = openai.AsyncOpenAI(api_key=OPENAI_KEY)
-        
-        response = await client.embeddings.create(
-            model="text-embedding-3-small",  # Or "text-embedding-ada-002"
-            input=text
-        )
-        
-        return response.data[0].embedding
+        # One request per chunk using the list form of `input`
+        client = get_model("openai")
+        rows = []
+        for chunk in _chunk_texts(texts, OPENAI_EMBED_MAX_INPUTS, OPENAI_EMBED_MAX_CHARS):
+            response = await client.embeddings.create(
+                model=OPENAI_EMBED_MODEL,
+                input=chunk
+            )
+            # Results carry their input index; don't rely on response order
+            rows.extend(d.embedding for d in sorted(response.data, key=lambda d: d.index))
+        return np.asarray(rows, dtype=np.float32)
     
     elif provider == "local":
-        # Free local embeddings using sentence-transformers
-        # You'll need to: pip install sentence-transformers
-        try:
-            from sentence_transformers import SentenceTransformer
-            
-            # Load model (downloads on first use, ~400MB)
-            model = SentenceTransformer('all-MiniLM-L6-v2')
-            
-            # Generate embedding
-            embedding = model.encode(text)
-            
-            return embedding.tolist()
-        
-        except ImportError:
-            raise ImportError(
-                "sentence-transformers not installed. "
-                "Run: pip install sentence-transformers"
-            )
+        # Thread pool + micro-batching, so encode never blocks the event loop
+        return await local_encoder.encode(texts)
     
     else:
         raise ValueError(f"Unknown provider: {provider}")
@@ -115,21 +241,19 @@ async def find_similar_topics(query_text: str, all_topics: list, provider: str =
     """
     import numpy as np
     
-    # Get query embedding
-    query_embedding = await embed_text(query_text, provider)
-    query_vec = np.array(query_embedding)
+    if not all_topics:
+        return []
     
-    # Calculate similarities
-    similarities = []
-    for topic in all_topics:
-        topic_embedding = await embed_text(topic, provider)
-        topic_vec = np.array(topic_embedding)
-        
-        # Cosine similarity
-        similarity = np.dot(query_vec, topic_vec) / (np.linalg.norm(query_vec) * np.linalg.norm(topic_vec))
-        similarities.append((topic, similarity))
+    # Query and topics in one batched call: row 0 is the query
+    vectors = await embed_texts([query_text] + list(all_topics), provider)
+    query_vec, topic_vecs = vectors[0], vectors[1:]
+    
+    # Cosine similarity against every topic at once
+    scores = normalize_rows(topic_vecs) @ normalize_rows(query_vec[None, :])[0]
     
-    # Sort by similarity
-    similarities.sort(key=lambda x: x[1], reverse=True)
+    # Top-k without sorting everything
+    k = min(top_k, len(all_topics))
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top], kind="stable")]
     
-    return similarities[:top_k]
+    return [(all_topics[i], float(scores[i])) for i in top]
@@ -0,0 +1,59 @@
+# <app/warmup.py>
+import asyncio, time
+from . import embeddings, generate
+from .topics import topic_index
+
+# Background warm-up state: the app accepts requests (and answers /health)
+# straight away, /ready turns 200 once the heavy loads below have finished
+# and succeeded (a failed load keeps it at 503 and is listed in "failed")
+_state = {"task": None, "started": None, "finished": None}
+
+async def _run():
+    # Load the embedding model once per worker instead of on every request
+    if embeddings.EMBED_WARMUP:
+        await embeddings.warm_up()
+        try:
+            await topic_index.ensure_loaded()
+        except Exception as e:
+            print(f"Topic index warm-up failed: {e}")
+    await generate.warm_up()
+    _state["finished"] = time.monotonic()
+
+def start():
+    """Schedule the warm-up without blocking startup (called from the app lifespan)."""
+    _state["started"] = time.monotonic()
+    _state["finished"] = None
+    _state["task"] = asyncio.create_task(_run())
+
+async def stop():
+    task = _state["task"]
+    if task is not None and not task.done():
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+def failed() -> list:
+    """Components whose warm-up finished without loading."""
+    if _state["finished"] is None:
+        return []
+    down = []
+    if embeddings.EMBED_WARMUP and not embeddings.is_ready("local"):
+        down.append("embeddings")
+    if not generate.llm_ready():
+        down.append("llm")
+    return down
+
+def is_ready() -> bool:
+    return _state["finished"] is not None and not failed()
+
+def status() -> dict:
+    started, finished = _state["started"], _state["finished"]
+    return {
+        "ready": is_ready(),
+        "failed": failed(),
+        "warmup_ms": round((finished - started) * 1000, 1) if started and finished else None,
+        "models": embeddings.model_status(),
+        "llm": generate.llm_ready(),
+    }
@@ -0,0 +1,62 @@
+# <benchmarks/bench_dedupe.py>
+"""
+Scaling benchmark for the dedupe engine on synthetic embeddings.
+
+    python -m benchmarks.bench_dedupe [sizes...]
+
+Compares the old per-pair Python loop (small sizes only), exact blocked
+search and LSH buckets. "recall" is the share of duplicates the exact
+engine removes that LSH removes too.
+"""
+import sys, time
+import numpy as np
+from app.dedupe import _select_exact, _select_lsh
+from app.utils import normalize_rows
+
+DIM = 384  # all-MiniLM-L6-v2
+THRESHOLD = 0.85
+DUP_RATE = 0.3
+LEGACY_MAX = 2000
+
+def synthetic_vectors(n, seed=42):
+    """n vectors where ~DUP_RATE are noisy copies of earlier ones."""
+    rng = np.random.default_rng(seed)
+    n_base = max(1, int(n * (1 - DUP_RATE)))
+    base = rng.standard_normal((n_base, DIM)).astype(np.float32)
+    source = rng.integers(0, n_base, n - n_base)
+    dups = base[source] + 0.25 * rng.standard_normal((n - n_base, DIM)).astype(np.float32)
+    vectors = np.vstack([base, dups])
+    return vectors[rng.permutation(n)]
+
+def legacy_loop(vectors, threshold):
+    kept = []
+    for vec in vectors:
+        if not any(np.dot(vec, s) / (np.linalg.norm(vec) * np.linalg.norm(s)) > threshold for s in kept):
+            kept.append(vec)
+    return kept
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+def main(sizes):
+    print(f"{'n':>7} {'legacy s':>9} {'exact s':>9} {'lsh s':>9} {'kept':>7} {'lsh kept':>9} {'recall':>7}")
+    for n in sizes:
+        vectors = synthetic_vectors(n)
+        unit = normalize_rows(vectors)
+
+        legacy = "-"
+        if n <= LEGACY_MAX:
+            _, t = timed(legacy_loop, vectors, THRESHOLD)
+            legacy = f"{t:.3f}"
+
+        exact, t_exact = timed(_select_exact, unit, THRESHOLD)
+        lsh, t_lsh = timed(_select_lsh, unit, THRESHOLD)
+
+        exact_dups = n - len(exact)
+        recall = (n - len(lsh)) / exact_dups if exact_dups else 1.0
+        print(f"{n:>7} {legacy:>9} {t_exact:>9.3f} {t_lsh:>9.3f} {len(exact):>7} {len(lsh):>9} {recall:>7.1%}")
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [100, 1000, 5000, 20000, 50000])
@@ -0,0 +1,60 @@
+# <benchmarks/bench_imports.py>
+"""
+Cold-start benchmark: import cost of the app, per module.
+
+    python -m benchmarks.bench_imports [runs] [--all]
+
+Imports `app` in fresh interpreters with `-X importtime` and reports the
+median cumulative import time of each app module and of the heavy
+dependencies (numpy, langchain_openai, sentence_transformers, ...) if
+anything pulls them in at import. --all lists every module above 5 ms.
+"""
+import os, statistics, subprocess, sys, time
+
+HEAVY = ("numpy", "torch", "sentence_transformers", "langchain_openai", "langchain_core", "openai", "redis")
+
+def import_profile():
+    """One fresh `import app`: (wall seconds, {module: cumulative µs})."""
+    env = {**os.environ, "EMBED_WARMUP": "false"}
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"],
+                          capture_output=True, text=True, env=env, check=True)
+    wall = time.perf_counter() - start
+
+    cumulative = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _self_us, cum_us, name = line[len("import time:"):].split("|")
+        cumulative[name.strip()] = int(cum_us)
+    return wall, cumulative
+
+def main(argv):
+    runs = int(next((a for a in argv if a.isdigit()), 5))
+    show_all = "--all" in argv
+
+    walls, profiles = [], []
+    for _ in range(runs):
+        wall, profile = import_profile()
+        walls.append(wall)
+        profiles.append(profile)
+
+    def median_ms(name):
+        return statistics.median(p.get(name, 0) for p in profiles) / 1000
+
+    names = set().union(*profiles)
+    if show_all:
+        rows = [n for n in names if median_ms(n) >= 5]
+    else:
+        rows = [n for n in names if n == "app" or n.startswith("app.") or n.split(".")[0] in HEAVY and "." not in n]
+
+    print(f"python -c 'import app' wall time: median {statistics.median(walls) * 1000:.0f} ms over {runs} runs")
+    print(f"{'module':<40}{'cumulative ms':>14}")
+    for name in sorted(rows, key=median_ms, reverse=True):
+        print(f"{name:<40}{median_ms(name):>14.1f}")
+
+    loaded = [m for m in HEAVY if m in names]
+    print("heavy dependencies imported at startup:", ", ".join(loaded) or "none")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
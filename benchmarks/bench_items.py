@@ -0,0 +1,85 @@
+# <benchmarks/bench_items.py>
+"""
+Per-item overhead of the item representation and response encoding.
+
+    python -m benchmarks.bench_items [n ...]
+
+For /trends/breakthrough-shaped work (request models in, scored items out)
+compares the old path - pydantic models converted back to dicts, then
+FastAPI's jsonable_encoder + json.dumps on the way out - with the current
+one - app.items.Item records, serialized by app.items.dumps (orjson). The
+dedupe/score work itself is the same for both and left out. Reports µs per
+item for each step and retained bytes per item.
+"""
+import json, statistics, sys, time, tracemalloc
+
+from . import stubs
+
+def _trend_models(n):
+    from app.main import TrendItem
+    return [TrendItem(**{k: d[k] for k in ("source", "headline", "url", "published")})
+            for d in stubs.synthetic_items(n)]
+
+def _old_convert(models):
+    return [m.dict() if hasattr(m, "dict") else m for m in models]
+
+def _old_encode(rows):
+    from fastapi.encoders import jsonable_encoder
+    return json.dumps(jsonable_encoder(rows), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def _new_convert(models):
+    from app.items import as_items
+    return as_items(models)
+
+def _new_encode(rows):
+    from app.items import dumps
+    return dumps(rows)
+
+def _score(rows):
+    for i, row in enumerate(rows):
+        row["viralScore"] = (i % 100) / 100
+
+def _time_us(fn, arg, n, reps=7):
+    samples = []
+    for _ in range(reps):
+        start = time.perf_counter()
+        fn(arg)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) / n * 1e6
+
+def _retained_bytes(convert, models, n):
+    import warnings
+    tracemalloc.start()
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")  # .dict() is deprecated on pydantic v2
+        rows = convert(models)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del rows
+    return size / n
+
+def run(n):
+    import warnings
+    warnings.simplefilter("ignore", DeprecationWarning)
+    models = _trend_models(n)
+    results = {}
+    for name, convert, encode in (("dict + jsonable_encoder", _old_convert, _old_encode),
+                                  ("Item + dumps", _new_convert, _new_encode)):
+        rows = convert(models)
+        _score(rows)
+        results[name] = {
+            "convert_us": _time_us(convert, models, n),
+            "encode_us": _time_us(encode, rows, n),
+            "bytes": _retained_bytes(convert, models, n),
+        }
+    return results
+
+def main(argv):
+    sizes = [int(a) for a in argv] or [1000, 10000]
+    print(f"{'n':>7}  {'path':<26}{'convert µs/item':>17}{'encode µs/item':>16}{'bytes/item':>12}")
+    for n in sizes:
+        for name, r in run(n).items():
+            print(f"{n:>7}  {name:<26}{r['convert_us']:>17.2f}{r['encode_us']:>16.2f}{r['bytes']:>12.0f}")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,192 @@
+# <benchmarks/stubs.py>
+"""
+Offline stand-ins for the benchmark suite: a deterministic fake embedding
+model, synthetic headline corpora and a local HTTP server replaying the
+recorded Reddit / Azure AI Search / SerpAPI responses in fixtures/.
+"""
+import asyncio, hashlib, json, os, random, re, time
+from urllib.parse import urlsplit
+import numpy as np
+from aiohttp import web
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+DIM = 384  # all-MiniLM-L6-v2
+
+_WORD = re.compile(r"\w+")
+
+class FakeEmbeddingModel:
+    """
+    Deterministic SentenceTransformer stand-in: a hashed bag of words.
+
+    Headlines sharing most words get similar vectors, so dedupe and topic
+    search behave plausibly; the same text always maps to the same vector.
+    """
+
+    def __init__(self, dim=DIM):
+        self.dim = dim
+        self._slots = {}
+
+    def _word_slots(self, word):
+        slots = self._slots.get(word)
+        if slots is None:
+            h = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+            slots = self._slots[word] = (h % self.dim, (h >> 16) % self.dim, (h >> 32) % self.dim)
+        return slots
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True, show_progress_bar=False, **kwargs):
+        single = isinstance(texts, str)
+        texts = [texts] if single else texts
+        rows = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for word in _WORD.findall(text.lower()):
+                a, b, c = self._word_slots(word)
+                rows[i, a] += 1.0
+                rows[i, b] += 0.5
+                rows[i, c] -= 0.5
+        return rows[0] if single else rows
+
+_VOCAB = {
+    "subject": ["AI", "ChatGPT", "TikTok", "LinkedIn", "Email", "SEO", "Influencer", "B2B", "Gen Z",
+                "Privacy", "First-party data", "Video", "Attribution", "Automation", "Podcast", "Retail media"],
+    "verb": ["is changing", "boosts", "kills", "reshapes", "doubles", "rescues", "breaks", "redefines"],
+    "object": ["conversion rates", "brand engagement", "customer data", "ad budgets", "ROI", "lead scoring",
+               "personalization", "content strategy", "holiday campaigns", "social commerce"],
+    "tail": ["in 2025", "for startups", "says new study", "- here's the data", "?", "according to CMOs",
+             "for B2B teams", "this quarter"],
+}
+
+def synthetic_headline(rng):
+    return " ".join(rng.choice(_VOCAB[part]) for part in ("subject", "verb", "object", "tail"))
+
+def synthetic_items(n, dup_rate=0.3, seed=42, now=None):
+    """
+    n scrape-shaped items; about dup_rate of them are near-copies of earlier
+    headlines (prefix/suffix noise), the rest are fresh combinations.
+    """
+    rng = random.Random(seed)
+    now = now or time.time()
+    items = []
+    for i in range(n):
+        if items and rng.random() < dup_rate:
+            headline = rng.choice(("Breaking: ", "", "Report: ")) + rng.choice(items)["headline"] + rng.choice(("", " (update)"))
+        else:
+            headline = f"{synthetic_headline(rng)} #{i}"
+        items.append({
+            "source": rng.choice(("reddit", "ai-search", "serpapi")),
+            "headline": headline,
+            "url": f"https://example.com/{i}",
+            "published": now - rng.uniform(0, 7 * 86400),
+            "score": rng.choice((0, 10, 80, 200, 700, 1500)),
+            "topic": "synthetic",
+        })
+    return items
+
+def synthetic_topics(n, seed=7):
+    rng = random.Random(seed)
+    return [f"{rng.choice(_VOCAB['subject'])} {rng.choice(_VOCAB['object'])} {i}" for i in range(n)]
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        return json.load(f)
+
+# URL path served by the stub -> fixture file
+ROUTES = {
+    "/r/marketing/search.json": "reddit.json",
+    "/indexes/{index}/docs": "azure_search.json",
+    "/search.json": "serpapi.json",
+}
+
+# Fixtures hold one page; requests for any later page get these (end of results)
+LAST_PAGES = {
+    "reddit.json": {"kind": "Listing", "data": {"after": None, "children": []}},
+    "azure_search.json": {"value": []},
+}
+
+def _later_page(request):
+    query = request.query
+    return "after" in query or int(query.get("$skip", 0) or 0) > 0
+
+class StubServer:
+    """
+    Local upstream replaying fixtures, with optional per-request latency.
+    Responses carry an ETag and conditional requests get a 304, like the
+    real APIs' caching proxies.
+    """
+
+    def __init__(self, latency_ms=0.0):
+        self.latency = latency_ms / 1000
+        self.requests = 0
+        self.not_modified = 0
+        self._runner = None
+        self.base_url = None
+
+    def _handler(self, fixture):
+        first = json.dumps(load_fixture(fixture)).encode("utf-8")
+        last = json.dumps(LAST_PAGES.get(fixture, {})).encode("utf-8")
+
+        async def handle(request):
+            self.requests += 1
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            body = last if fixture in LAST_PAGES and _later_page(request) else first
+            etag = '"%s"' % hashlib.blake2b(body, digest_size=8).hexdigest()
+            if request.headers.get("If-None-Match") == etag:
+                self.not_modified += 1
+                return web.Response(status=304, headers={"ETag": etag})
+            return web.Response(body=body, content_type="application/json", headers={"ETag": etag})
+        return handle
+
+    async def start(self):
+        app = web.Application()
+        for path, fixture in ROUTES.items():
+            app.router.add_get(path, self._handler(fixture))
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://127.0.0.1:{port}"
+        return self
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+def offline_sources(base_url):
+    """scrape.SOURCES with every request rebased onto the stub server and all sources enabled."""
+    from app import scrape
+
+    def rebase(build):
+        def request(topic):
+            url, params, headers = build(topic)
+            return base_url + urlsplit(url).path, params, headers
+        return request
+
+    return {name: (rebase(build), parse, lambda: True) for name, (build, parse, _) in scrape.SOURCES.items()}
+
+def install_offline(base_url=None):
+    """
+    Point the app at the fakes: fake local model, in-memory caches only,
+    embedding and scrape caches bypassed (every run does the full work), and
+    sources served by the stub at base_url.
+    """
+    from app import cache, embeddings, scrape, utils
+
+    embeddings._models["local"] = FakeEmbeddingModel()
+    embeddings._status["local"] = "ready"
+    cache._backend = cache.MemoryKV()
+
+    class NoEmbeddingCache(embeddings.EmbeddingCache):
+        async def get_many(self, keys):
+            return {}
+
+        async def set_many(self, vectors):
+            pass
+
+    utils.embedding_cache = NoEmbeddingCache()
+    scrape.scrape_cache.ttl = 0
+    if base_url:
+        scrape.AI_ENDPOINT = base_url
+        scrape.AI_KEY = scrape.AI_KEY or "offline"
+        scrape.SERP_KEY = scrape.SERP_KEY or "offline"
+        scrape.SOURCES = offline_sources(base_url)
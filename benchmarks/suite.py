@@ -0,0 +1,210 @@
+# <benchmarks/suite.py>
+"""
+Offline benchmark suite: no network, no model download.
+
+    python -m benchmarks.suite                      # compare against baseline.json
+    python -m benchmarks.suite --sizes 1000 100000  # corpus sizes for the batch cases
+    python -m benchmarks.suite --save               # record a new baseline
+    python -m benchmarks.suite --only dedupe
+
+Cases: score_items, dedupe_headlines and find_similar_topics on synthetic
+corpora, plus the full /trends/discover handler (ASGI, in-process) with
+Reddit/Azure/SerpAPI replayed from fixtures/ by a local stub server, both
+live and served from ingest snapshots, and /trends/breakthrough on 1000
+posted items. The local embedding model is a deterministic fake (see
+stubs.py).
+
+Each case reports throughput, p50/p99 latency and peak traced memory
+(measured in a separate run so tracemalloc doesn't skew the timings). A
+case regresses when p50 or peak memory exceeds the baseline by more than
+--tolerance; the exit code is 1 if anything regressed. Baselines are
+machine-specific - record them on the hardware that runs the comparison.
+"""
+import argparse, asyncio, json, os, statistics, sys, time, tracemalloc
+
+os.environ.setdefault("EMBED_WARMUP", "false")
+os.environ.setdefault("INTERNAL_API_KEY", "bench")
+
+from . import stubs
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+DEFAULT_SIZES = [1000, 10000]
+
+def _reps(n, budget=200_000, low=3, high=50):
+    """Fewer repetitions for bigger inputs."""
+    return max(low, min(high, budget // max(n, 1)))
+
+def _percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, round(q * (len(ordered) - 1)))]
+
+async def _measure(make_call, reps, units):
+    """Run make_call() reps times (plus one warm-up); returns the case stats."""
+    await make_call()
+    samples = []
+    for _ in range(reps):
+        start = time.perf_counter()
+        await make_call()
+        samples.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    await make_call()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    p50 = statistics.median(samples)
+    return {
+        "reps": reps,
+        "p50_ms": round(p50 * 1000, 3),
+        "p99_ms": round(_percentile(samples, 0.99) * 1000, 3),
+        "throughput": round(units / p50, 1),  # units per second at p50
+        "peak_mb": round(peak / 2**20, 2),
+    }
+
+def _score_case(n):
+    from app.score import score_items
+    items = stubs.synthetic_items(n)
+
+    async def call():
+        score_items(items, top_n=20)
+    return call, _reps(n), n
+
+def _dedupe_case(n):
+    from app.dedupe import dedupe_headlines
+    items = stubs.synthetic_items(n)
+
+    async def call():
+        await dedupe_headlines(items)
+    return call, _reps(n, budget=50_000), n
+
+def _topics_case(n):
+    from app.utils import find_similar_topics
+    topics = stubs.synthetic_topics(n)
+
+    async def call():
+        await find_similar_topics("AI personalization for B2B", topics, provider="local", top_k=5)
+    return call, _reps(n, budget=100_000), n
+
+CORPUS_CASES = {
+    "score_items": _score_case,
+    "dedupe_headlines": _dedupe_case,
+    "find_similar_topics": _topics_case,
+}
+
+async def _discover_case(stub, snapshots=False, reps=20):
+    import httpx
+    from app import app
+    from app.clients import startup, shutdown
+    from app.ingest import ingestor
+    from app.topics import default_topics
+
+    await startup()
+    ingestor.snapshots.clear()
+    if snapshots:
+        # What the background ingestor would have materialized
+        for topic in default_topics():
+            await ingestor.refresh(topic)
+    transport = httpx.ASGITransport(app=app)
+    headers = {"x-api-key": os.environ["INTERNAL_API_KEY"]}
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers) as client:
+            async def call():
+                r = await client.get("/trends/discover", params={"interest": "AI in marketing", "top_k": 3})
+                r.raise_for_status()
+            before, before_304 = stub.requests, stub.not_modified
+            stats = await _measure(call, reps, 1)
+            stats["upstream_requests_per_call"] = round((stub.requests - before) / (reps + 2), 1)
+            stats["not_modified_per_call"] = round((stub.not_modified - before_304) / (reps + 2), 1)
+            return stats
+    finally:
+        await shutdown()
+
+async def _breakthrough_case(n=1000, reps=10):
+    import httpx
+    from app import app
+    items = [{k: d[k] for k in ("source", "headline", "url", "published")} for d in stubs.synthetic_items(n)]
+    body = {"items": items, "threshold": 0.0}
+    transport = httpx.ASGITransport(app=app)
+    headers = {"x-api-key": os.environ["INTERNAL_API_KEY"]}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers) as client:
+        async def call():
+            r = await client.post("/trends/breakthrough", json=body)
+            r.raise_for_status()
+        return await _measure(call, reps, n)
+
+async def run(sizes, only=None, upstream_ms=0.0):
+    stub = await stubs.StubServer(latency_ms=upstream_ms).start()
+    stubs.install_offline(stub.base_url)
+    results = {}
+    try:
+        for name, make in CORPUS_CASES.items():
+            if only and only not in name:
+                continue
+            for n in sizes:
+                call, reps, units = make(n)
+                results[f"{name}[{n}]"] = await _measure(call, reps, units)
+                print(_row(f"{name}[{n}]", results[f"{name}[{n}]"]), flush=True)
+        for name, snapshots in (("trends_discover", False), ("trends_discover_snapshot", True)):
+            if not only or only in name:
+                results[name] = await _discover_case(stub, snapshots)
+                print(_row(name, results[name]), flush=True)
+        if not only or only in "trends_breakthrough[1000]":
+            results["trends_breakthrough[1000]"] = await _breakthrough_case()
+            print(_row("trends_breakthrough[1000]", results["trends_breakthrough[1000]"]), flush=True)
+    finally:
+        await stub.stop()
+    return results
+
+def _row(name, s):
+    return f"{name:<28}{s['reps']:>5}{s['throughput']:>14,.1f}{s['p50_ms']:>11.2f}{s['p99_ms']:>11.2f}{s['peak_mb']:>10.2f}"
+
+def compare(results, baseline, tolerance):
+    """Return a list of human-readable regressions."""
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        for metric in ("p50_ms", "peak_mb"):
+            # Ignore noise on tiny absolute values
+            floor = 0.5 if metric == "p50_ms" else 0.25
+            if current[metric] > max(base[metric] * (1 + tolerance), base[metric] + floor):
+                regressions.append(f"{name}: {metric} {base[metric]} -> {current[metric]}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark suite")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--only", help="run cases whose name contains this")
+    parser.add_argument("--upstream-ms", type=float, default=0.0, help="latency added by the stub server")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before flagging")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save", action="store_true", help="write results as the new baseline")
+    args = parser.parse_args(argv)
+
+    print(f"{'case':<28}{'reps':>5}{'items/s':>14}{'p50 ms':>11}{'p99 ms':>11}{'peak MB':>10}")
+    results = asyncio.run(run(args.sizes, args.only, args.upstream_ms))
+
+    if args.save:
+        # Merge, so saving a subset (--only/--sizes) keeps the other cases
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as f:
+                baseline = json.load(f)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({**baseline, **results}, f, indent=2, sort_keys=True)
+        print(f"baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("no baseline to compare against (run with --save)")
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        regressions = compare(results, json.load(f), args.tolerance)
+    for line in regressions:
+        print("REGRESSION", line)
+    print("no regressions" if not regressions else f"{len(regressions)} regression(s)")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
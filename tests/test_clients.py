@@ -0,0 +1,13 @@
+import asyncio
+from app import clients
+
+def test_session_shared_within_loop_and_replaced_across_loops():
+    async def grab():
+        return clients.get_session(), clients.get_session()
+
+    first, again = asyncio.run(grab())
+    second, _ = asyncio.run(grab())
+
+    assert first is again
+    assert second is not first
+    asyncio.run(clients.shutdown())
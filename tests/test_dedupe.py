@@ -0,0 +1,47 @@
+import asyncio
+import numpy as np
+from app import dedupe
+from app.utils import normalize_rows
+
+def fake_embed_texts(vectors):
+    async def embed(texts, provider="local"):
+        return np.array([vectors[t] for t in texts], dtype=np.float32)
+    return embed
+
+def test_dedupe_keeps_first_of_similar(monkeypatch):
+    vectors = {"a": [1, 0], "a again": [0.99, 0.05], "b": [0, 1]}
+    monkeypatch.setattr(dedupe, "embed_texts", fake_embed_texts(vectors))
+    items = [{"headline": h} for h in ["a", "a again", "b"]]
+
+    res = asyncio.run(dedupe.dedupe_headlines(items))
+
+    assert [x["headline"] for x in res] == ["a", "b"]
+
+def test_exact_engine_matches_pairwise_loop():
+    rng = np.random.default_rng(0)
+    base = rng.standard_normal((60, 16))
+    vectors = np.vstack([base, base[:30] + 0.05 * rng.standard_normal((30, 16))])[rng.permutation(90)]
+
+    expected = []
+    for i, vec in enumerate(vectors):
+        if all(np.dot(vec, vectors[j]) / (np.linalg.norm(vec) * np.linalg.norm(vectors[j])) <= 0.85
+               for j in expected):
+            expected.append(i)
+
+    unit = normalize_rows(vectors)
+    assert dedupe._select_exact(unit, 0.85, block_size=7, kept_chunk=5) == expected
+    assert dedupe._select_lsh(unit, 0.85, n_bits=4, n_tables=8) == expected
+
+def test_index_dedupes_across_batches(monkeypatch):
+    vectors = {"a": [1, 0], "a again": [0.99, 0.05], "b": [0, 1], "c": [-1, 0]}
+    monkeypatch.setattr(dedupe, "embed_texts", fake_embed_texts(vectors))
+    index = dedupe.DedupeIndex(0.85)
+
+    async def run():
+        first = await index.dedupe([{"headline": "a"}, {"headline": "b"}])
+        second = await index.dedupe([{"headline": "a again"}, {"headline": "c"}])
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert [x["headline"] for x in first] == ["a", "b"]
+    assert [x["headline"] for x in second] == ["c"]
@@ -0,0 +1,107 @@
+from app import embeddings
+
+def test_model_loaded_once(monkeypatch):
+    calls = []
+    monkeypatch.setitem(embeddings._LOADERS, "local", lambda: calls.append(1) or object())
+    monkeypatch.setattr(embeddings, "_models", {})
+    monkeypatch.setattr(embeddings, "_status", {})
+
+    first = embeddings.get_model("local")
+    second = embeddings.get_model("local")
+
+    assert first is second
+    assert len(calls) == 1
+    assert embeddings.model_status() == {"local": "ready"}
+
+def test_chunk_texts_respects_limits():
+    from app.utils import _chunk_texts
+    chunks = list(_chunk_texts(["aa", "bb", "cc", "dddd"], max_items=2, max_chars=5))
+    assert chunks == [["aa", "bb"], ["cc"], ["dddd"]]
+
+def test_embed_texts_caches_vectors(monkeypatch, tmp_path):
+    import asyncio
+    import numpy as np
+    from app import cache, utils
+
+    calls = []
+    async def fake_uncached(texts, provider):
+        calls.append(list(texts))
+        return np.array([[len(t), 1.0] for t in texts], dtype=np.float32)
+
+    monkeypatch.setattr(cache, "_backend", cache.SQLiteKV(str(tmp_path / "kv.db")))
+    monkeypatch.setattr(utils, "embedding_cache", embeddings.EmbeddingCache(maxsize=10))
+    monkeypatch.setattr(utils, "_embed_uncached", fake_uncached)
+
+    first = asyncio.run(utils.embed_texts(["a", "bb", "a"], provider="local"))
+    utils.embedding_cache.memory.clear()  # force the second call through the backend tier
+    second = asyncio.run(utils.embed_texts(["bb", "a"], provider="local"))
+
+    assert calls == [["a", "bb"]]
+    assert first.shape == (3, 2)
+    assert np.array_equal(second, first[[1, 0]])
+    assert utils.embedding_cache.counters["backend_hits"] == 2
+
+class CountingModel:
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts, **kwargs):
+        import numpy as np
+        self.calls.append(list(texts))
+        return np.array([[float(len(t)), 1.0] for t in texts], dtype=np.float32)
+
+def test_local_encoder_merges_calls_while_busy(monkeypatch):
+    import asyncio
+    model = CountingModel()
+    monkeypatch.setattr(embeddings, "get_model", lambda provider="local": model)
+    encoder = embeddings.LocalEncoder(pool_size=1, max_batch_latency_ms=0, max_batch=100, max_queue=5)
+
+    async def run():
+        # The first call takes the only thread; the next two arrive while it is busy
+        results = await asyncio.gather(encoder.encode(["a"]), encoder.encode(["bb"]), encoder.encode(["ccc", "d"]))
+        try:
+            await asyncio.gather(encoder.encode(["x"] * 3), encoder.encode(["y"] * 3))
+        except embeddings.EmbeddingQueueFull:
+            return results, True
+        return results, False
+
+    results, rejected = asyncio.run(run())
+    encoder.close()
+
+    assert model.calls[:2] == [["a"], ["bb", "ccc", "d"]]
+    assert [r[:, 0].tolist() for r in results] == [[1.0], [2.0], [3.0, 1.0]]
+    assert encoder.counters["merged_calls"] == 1
+    assert rejected
+
+def test_dedupe_of_more_items_than_the_encoder_queue(monkeypatch):
+    import asyncio
+    import numpy as np
+    from app import dedupe, utils
+
+    class NoCache(embeddings.EmbeddingCache):
+        async def get_many(self, keys):
+            return {}
+
+        async def set_many(self, vectors):
+            pass
+
+    class StoryModel(CountingModel):
+        def encode(self, texts, **kwargs):
+            # "<story> ..." -> one-hot on the story number: same story, same vector
+            self.calls.append(list(texts))
+            return np.eye(5, dtype=np.float32)[[int(t.split()[0]) for t in texts]]
+
+    model = StoryModel()
+    monkeypatch.setattr(embeddings, "get_model", lambda provider="local": model)
+    encoder = embeddings.LocalEncoder(pool_size=2, max_batch=4, max_queue=10)
+    monkeypatch.setattr(utils, "local_encoder", encoder)
+    monkeypatch.setattr(utils, "embedding_cache", NoCache())
+
+    # 25 distinct headlines about 5 stories
+    items = [{"headline": f"{i % 5} take #{i}"} for i in range(25)]
+    kept = asyncio.run(dedupe.dedupe_headlines(items))
+    encoder.close()
+
+    assert len(kept) == 5  # semantic, not the exact-match fallback
+    assert max(len(call) for call in model.calls) <= 4
+    assert encoder.counters["rejected"] == 0 and encoder.depth == 0
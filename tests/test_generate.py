@@ -0,0 +1,51 @@
+import asyncio
+from app import generate
+
+def test_generate_batch_caps_concurrency_and_budget(monkeypatch):
+    running = {"now": 0, "peak": 0}
+    async def fake_generate(headline, tone, platform):
+        running["now"] += 1
+        running["peak"] = max(running["peak"], running["now"])
+        await asyncio.sleep(0.01)
+        running["now"] -= 1
+        return f"{tone} {platform}: {headline}", 10
+    monkeypatch.setattr(generate, "_generate", fake_generate)
+    monkeypatch.setattr(generate, "GENERATE_MAX_TOKENS", 50)
+
+    async def run():
+        return [r async for r in generate.generate_batch(
+            ["h1", "h2", "h3"], ["fun", "bold"], ["linkedin"], concurrency=2, token_budget=10_000
+        )]
+
+    results = asyncio.run(run())
+
+    assert len(results) == 6
+    assert all("content" in r for r in results)
+    assert running["peak"] == 2
+
+    async def run_tight():
+        budget = generate._estimate_tokens("h1", "fun", "linkedin")
+        return [r async for r in generate.generate_batch(
+            ["h1"], ["fun", "bold"], ["linkedin"], concurrency=1, token_budget=budget
+        )]
+
+    tight = asyncio.run(run_tight())
+    assert sorted("error" in r for r in tight) == [False, True]
+
+def test_generate_copy_is_cached_unless_bypassed(monkeypatch):
+    calls = []
+    async def fake_complete(prompt):
+        calls.append(prompt)
+        return f"copy {len(calls)}", 42
+    monkeypatch.setattr(generate, "_complete", fake_complete)
+    monkeypatch.setattr(generate, "copy_cache", generate.CopyCache(backend="memory"))
+
+    async def run():
+        first = await generate.generate_copy("AI news", "curious", "linkedin")
+        second = await generate.generate_copy("AI news", "curious", "linkedin")
+        fresh = await generate.generate_copy("AI news", "curious", "linkedin", bypass_cache=True)
+        return first, second, fresh
+
+    assert asyncio.run(run()) == ("copy 1", "copy 1", "copy 2")
+    assert len(calls) == 2
+    assert generate.copy_cache.counters["tokens_saved"] == 42
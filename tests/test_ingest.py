@@ -0,0 +1,42 @@
+import asyncio
+from app import ingest
+
+def test_gather_serves_snapshots_and_fetches_unknown_topics_live(monkeypatch):
+    calls = []
+
+    async def fake_gather_sources(topic, partial=None):
+        topics = topic if isinstance(topic, list) else [topic]
+        calls.append(list(topics))
+        items = [{"headline": f"{t} news", "url": f"https://x/{t}", "topic": t} for t in topics]
+        timings = {"total_ms": 1.0, "partial": False, "topics": {t: {"ms": 1.0, "sources": {}} for t in topics}}
+        return {"items": items, "timings": timings}
+
+    async def fake_dedupe(items):
+        return items
+
+    monkeypatch.setattr(ingest, "gather_sources", fake_gather_sources)
+    monkeypatch.setattr(ingest, "dedupe_headlines", fake_dedupe)
+    ingestor = ingest.TrendIngestor(max_age=60)
+
+    async def run():
+        await ingestor.refresh("seo")
+        return await ingestor.gather(["seo", "podcasts"])
+
+    result = asyncio.run(run())
+
+    assert calls == [["seo"], ["podcasts"]]  # only the unknown topic went live
+    assert [item["headline"] for item in result["items"]] == ["seo news", "podcasts news"]
+    assert result["snapshot_age"]["seo"] is not None and result["snapshot_age"]["podcasts"] is None
+    assert "viralScore" in ingestor.snapshots["seo"]["scored"][0]
+    assert "viralScore" not in ingestor.snapshots["seo"]["items"][0]
+    assert ingestor.counters["served"] == 1 and ingestor.counters["live_fallbacks"] == 1
+
+def test_catalogue_is_capped_and_skips_dynamic_topics(monkeypatch):
+    monkeypatch.setattr(ingest, "default_topics", lambda: ["a", "b", "c"])
+    monkeypatch.setattr(ingest.topic_index, "topics", ["c", "client-1", "client-2"])
+
+    assert ingest.TrendIngestor(max_topics=2)._catalogue() == ["a", "b"]
+    assert ingest.TrendIngestor(dynamic_topics=True)._catalogue() == ["a", "b", "c", "client-1", "client-2"]
+
+    budget = ingest.TrendIngestor(daily_refreshes=2)
+    assert [budget._spend() for _ in range(3)] == [True, True, False]
@@ -0,0 +1,19 @@
+import json
+from app.items import as_items, dumps
+
+def test_item_behaves_like_a_dict_and_serializes_compactly():
+    a, b = as_items([
+        {"source": "reddit", "headline": "A", "url": "u1", "published": 1.0, "score": 10, "topic": "seo", "extra": 1},
+        {"source": "reddit", "headline": "B", "url": "u2", "topic": "".join(["s", "eo"])},
+    ])
+    a["viralScore"] = 0.5
+    a.embedding = [0.1, 0.2]
+
+    assert a.get("score", 0) == 10 and b.get("score", 0) == 0
+    assert "score" not in b and "viralScore" in a
+    assert a.topic is b.topic  # interned
+    assert dict(b) == {"source": "reddit", "headline": "B", "url": "u2", "published": None, "topic": "seo"}
+    assert json.loads(dumps({"items": [a]})) == {"items": [{
+        "source": "reddit", "headline": "A", "url": "u1", "published": 1.0,
+        "score": 10, "topic": "seo", "viralScore": 0.5,
+    }]}
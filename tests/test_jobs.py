@@ -0,0 +1,95 @@
+import asyncio
+import httpx
+from app import jobs as pq
+
+def test_queue_publishes_once_and_dead_letters_ambiguous_failures(tmp_path):
+    posted = []
+    async def fake_linkedin(payload):
+        posted.append(payload["text"])
+        if payload["text"] == "lost":
+            raise httpx.ReadTimeout("response lost")
+        return {"status": "ok", "id": "urn:li:ugcPost:1"}
+
+    async def run():
+        queue = pq.PublishQueue(store=pq.SQLiteJobStore(str(tmp_path / "q.db")),
+                                publishers={"linkedin": fake_linkedin})
+        job, created = await queue.enqueue("linkedin", {"text": "hello"})
+        again, created_again = await queue.enqueue("linkedin", {"text": "hello"})
+        lost, _ = await queue.enqueue("linkedin", {"text": "lost"})
+        while await queue.run_once():
+            pass
+        return (created, created_again, again["id"] == job["id"],
+                await queue.get(job["id"]), await queue.get(lost["id"]))
+
+    created, created_again, same_job, done, dead = asyncio.run(run())
+
+    assert (created, created_again, same_job) == (True, False, True)
+    assert posted == ["hello", "lost"]
+    assert done["status"] == "done" and done["result"]["id"] == "urn:li:ugcPost:1"
+    assert dead["status"] == "dead" and "ReadTimeout" in dead["error"]
+
+def test_open_circuit_requeues_after_reset_without_spending_an_attempt(tmp_path):
+    from app import retry
+
+    async def blocked(payload):
+        raise retry.CircuitOpenError("circuit open for api.linkedin.com")
+
+    async def run():
+        queue = pq.PublishQueue(store=pq.SQLiteJobStore(str(tmp_path / "q.db")), publishers={"linkedin": blocked})
+        job, _ = await queue.enqueue("linkedin", {"text": "hi"})
+        await queue.run_once()
+        return await queue.get(job["id"])
+
+    before = pq.time.time()
+    job = asyncio.run(run())
+
+    assert job["status"] == "queued" and job["attempts"] == 0
+    assert job["run_after"] >= before + retry.CIRCUIT_RESET
+    assert pq.classify_publish_error(retry.CircuitOpenError("x")) == "retry"
+
+def test_idempotency_key_expires_and_dead_jobs_can_be_resubmitted(tmp_path, monkeypatch):
+    async def broken(payload):
+        raise httpx.HTTPStatusError("401", request=httpx.Request("POST", "https://x"),
+                                    response=httpx.Response(401))
+
+    async def run():
+        queue = pq.PublishQueue(store=pq.SQLiteJobStore(str(tmp_path / "q.db")), publishers={"linkedin": broken})
+        dead, _ = await queue.enqueue("linkedin", {"text": "hi"})
+        await queue.run_once()
+        retry_job, created = await queue.enqueue("linkedin", {"text": "hi"})
+
+        queue.publishers["linkedin"] = fake_ok
+        await queue.run_once()
+        _, created_while_fresh = await queue.enqueue("linkedin", {"text": "hi"})
+        monkeypatch.setattr(pq, "PUBLISH_IDEMPOTENCY_TTL", -1)
+        _, created_after_ttl = await queue.enqueue("linkedin", {"text": "hi"})
+        return (await queue.get(dead["id"]))["status"], retry_job["id"] != dead["id"], created, \
+            created_while_fresh, created_after_ttl
+
+    async def fake_ok(payload):
+        return {"status": "ok"}
+
+    assert asyncio.run(run()) == ("dead", True, True, False, True)
+
+def test_rate_limited_platform_does_not_hold_up_others(tmp_path):
+    posted = []
+    async def publish(payload):
+        posted.append(payload["text"])
+        return {"status": "ok"}
+
+    async def run():
+        queue = pq.PublishQueue(store=pq.SQLiteJobStore(str(tmp_path / "q.db")),
+                                publishers={"linkedin": publish, "facebook": publish})
+        queue.buckets["linkedin"] = pq.TokenBucket(per_minute=0.001, burst=1)
+        for i in range(3):
+            await queue.enqueue("linkedin", {"text": f"li {i}"})
+        for i in range(2):
+            await queue.enqueue("facebook", {"text": f"fb {i}"})
+        while await queue.run_once():
+            pass
+        return await queue.store.counts()
+
+    counts = asyncio.run(run())
+
+    assert posted == ["li 0", "fb 0", "fb 1"]
+    assert counts == {"done": 3, "queued": 2}
@@ -0,0 +1,55 @@
+import asyncio, gzip, json
+import numpy as np
+import pytest
+from app import dedupe, pipeline
+
+def test_bulk_breakthrough_parses_gzip_ndjson_in_chunks(monkeypatch):
+    vectors = {"AI breaking news": [1, 0], "AI breaking news!": [0.99, 0.05], "dull": [0, 1], "late": [-1, 0]}
+    async def fake_embed(texts, provider="local"):
+        return np.array([vectors[t] for t in texts], dtype=np.float32)
+    monkeypatch.setattr(dedupe, "embed_texts", fake_embed)
+
+    lines = [json.dumps({"source": "crawler", "headline": h, "url": f"u{i}"})
+             for i, h in enumerate(["AI breaking news", "dull", "AI breaking news!", "late"])]
+    lines.insert(1, '{"headline": 1}')
+    body = gzip.compress(("\n".join(lines) + "\n").encode())
+
+    async def chunks():
+        for i in range(0, len(body), 7):
+            yield body[i:i + 7]
+
+    async def run():
+        source = pipeline.iter_ndjson_lines(chunks(), gzipped=True)
+        parse = lambda line: json.loads(line) if b'"source"' in line else 1 / 0
+        return [e async for e in pipeline.breakthrough_stream(source, parse, threshold=0.7, chunk_items=2, max_items=4)]
+
+    events = asyncio.run(run())
+
+    assert [e["headline"] for e in events if e["type"] == "item"] == ["AI breaking news"]
+    assert [e["line"] for e in events if e["type"] == "error"] == [2]
+    done = events[-1]
+    assert (done["received"], done["invalid"], done["unique"]) == (4, 1, 2)
+    assert done["truncated"] == "more than 4 items"
+
+def test_ndjson_lines_stop_at_max_bytes():
+    async def chunks():
+        yield gzip.compress(b"\n" * 10_000)
+
+    async def run():
+        return [line async for line in pipeline.iter_ndjson_lines(chunks(), gzipped=True, max_bytes=1000)]
+
+    with pytest.raises(pipeline.BulkLimitExceeded, match="1000 bytes"):
+        asyncio.run(run())
+
+def test_bulk_response_turns_a_broken_send_into_client_disconnect():
+    from starlette.requests import ClientDisconnect
+    from app.main import DuplexStreamingResponse
+
+    async def body():
+        yield b"{}\n"
+
+    async def send(message):
+        raise OSError("connection reset")
+
+    with pytest.raises(ClientDisconnect):
+        asyncio.run(DuplexStreamingResponse(body())({"type": "http"}, None, send))
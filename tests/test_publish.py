@@ -0,0 +1,26 @@
+import asyncio
+import httpx
+from app import publish
+
+def test_linkedin_author_looked_up_once_per_token(monkeypatch):
+    requests = []
+    def handler(request):
+        requests.append((request.method, request.url.path, request.headers["Authorization"]))
+        if request.url.path == "/v2/me":
+            return httpx.Response(200, json={"id": "abc"})
+        return httpx.Response(201, json={"id": "urn:li:ugcPost:1"})
+
+    monkeypatch.setattr(publish, "identities", publish.IdentityCache())
+    monkeypatch.setattr(publish, "LI_TOKEN", "main-token")
+    monkeypatch.setattr(publish, "LI_ACCOUNTS", {"brand": "brand-token"})
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            await asyncio.gather(*(publish.post_linkedin({"text": f"post {i}"}, client=client) for i in range(3)))
+            await publish.post_linkedin({"text": "brand post", "account": "brand"}, client=client)
+
+    asyncio.run(run())
+
+    lookups = [auth for method, path, auth in requests if path == "/v2/me"]
+    assert lookups == ["Bearer main-token", "Bearer brand-token"]
+    assert sum(1 for _, path, _ in requests if path == "/v2/ugcPosts") == 4
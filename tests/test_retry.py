@@ -0,0 +1,64 @@
+import asyncio
+import httpx
+import pytest
+from app import retry
+
+def status_error(code, headers=None):
+    request = httpx.Request("GET", "https://example.com")
+    response = httpx.Response(code, headers=headers, request=request)
+    return httpx.HTTPStatusError(f"{code}", request=request, response=response)
+
+def test_only_transient_errors_are_retried():
+    calls = {"auth": 0, "busy": 0}
+
+    @retry.async_retry(retries=3, delay=0, name="test.auth")
+    async def auth():
+        calls["auth"] += 1
+        raise status_error(401)
+
+    @retry.async_retry(retries=3, delay=0, name="test.busy")
+    async def busy():
+        calls["busy"] += 1
+        if calls["busy"] < 3:
+            raise status_error(503, {"Retry-After": "0"})
+        return "ok"
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(auth())
+    assert asyncio.run(busy()) == "ok"
+    assert calls == {"auth": 1, "busy": 3}
+    assert retry.metrics["test.busy"]["retries"] == 2
+
+def test_circuit_opens_after_repeated_failures(monkeypatch):
+    monkeypatch.setitem(retry.breakers, "flaky.example", retry.CircuitBreaker(failures=2, reset=60))
+    calls = []
+
+    @retry.async_retry(retries=1, upstream="flaky.example", name="test.flaky")
+    async def flaky():
+        calls.append(1)
+        raise asyncio.TimeoutError()
+
+    for _ in range(2):
+        with pytest.raises(asyncio.TimeoutError):
+            asyncio.run(flaky())
+    with pytest.raises(retry.CircuitOpenError):
+        asyncio.run(flaky())
+    assert len(calls) == 2
+
+def test_cancelled_trial_call_frees_the_half_open_slot(monkeypatch):
+    breaker = retry.CircuitBreaker(failures=1, reset=0)
+    breaker.failure()  # open; reset=0 makes it half-open straight away
+    monkeypatch.setitem(retry.breakers, "slow.example", breaker)
+
+    @retry.async_retry(retries=1, upstream="slow.example", name="test.slow")
+    async def slow(delay):
+        await asyncio.sleep(delay)
+        return "ok"
+
+    async def run():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(slow(1), 0.01)  # the trial is cancelled
+        return await slow(0)
+
+    assert asyncio.run(run()) == "ok"
+    assert breaker.state == "closed"
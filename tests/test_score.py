@@ -5,3 +5,39 @@ def test_scores_sort_desc():
     res = score_items(sample)
     assert res[0]["viralScore"] >= res[1]["viralScore"]
 
+
+def test_indicators_match_whole_words_only():
+    res = score_items([
+        {"headline": "He said to maintain it"},
+        {"headline": "AI wins"},
+        {"headline": "First party data rules"},
+    ])
+    scores = {x["headline"]: x["viralScore"] for x in res}
+    assert scores["He said to maintain it"] == 0.5
+    assert scores["AI wins"] == 0.65
+    assert scores["First party data rules"] == 0.65
+
+def test_top_n_matches_full_sort():
+    sample = [{"headline": h} for h in ["ai", "x", "chatgpt ai", "breaking ai news?", "y"]]
+    full = score_items([dict(x) for x in sample])
+    top = score_items([dict(x) for x in sample], top_n=3)
+    assert [x["headline"] for x in top] == [x["headline"] for x in full[:3]]
+
+def test_parse_timestamp_formats():
+    from app.utils import parse_timestamp
+    now = 1_700_000_000.0
+    assert parse_timestamp(1_700_000_000) == now
+    assert parse_timestamp(1_700_000_000_000) == now
+    assert parse_timestamp("2023-11-14T22:13:20Z") == now
+    assert parse_timestamp("Tue, 14 Nov 2023 22:13:20 +0000") == now
+    assert parse_timestamp("11/14/2023, 10:13 PM, +0000 UTC") == now - 20
+    assert parse_timestamp("3 hours ago", now=now) == now - 3 * 3600
+    assert parse_timestamp("an hour ago", now=now) == now - 3600
+    assert parse_timestamp("not a date") is None
+
+def test_recency_decays_continuously():
+    import time
+    now = time.time()
+    res = score_items([{"headline": h, "published": now - hours * 3600}
+                       for h, hours in [("old", 200), ("fresh", 1), ("day", 24)]])
+    assert [x["headline"] for x in res] == ["fresh", "day", "old"]
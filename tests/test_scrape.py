@@ -0,0 +1,114 @@
+import asyncio
+from app import scrape
+
+def test_gather_sources_fans_out_and_keeps_partial_results(monkeypatch):
+    async def fake_fetch(session, url, params=None, headers=None):
+        if "serpapi" in url:
+            await asyncio.sleep(5)  # slow upstream, cut off by the deadline
+        return {"data": {"children": [
+            {"data": {"title": params["q"], "permalink": "/x", "created_utc": 0, "score": 10}}
+        ]}}
+
+    monkeypatch.setattr(scrape, "fetch", fake_fetch)
+    monkeypatch.setattr(scrape, "scrape_cache", scrape.ScrapeCache(ttl=0))
+    monkeypatch.setattr(scrape, "SERP_KEY", "key")
+    monkeypatch.setattr(scrape, "AI_ENDPOINT", "")
+
+    result = asyncio.run(scrape.gather_sources(["a", "b"], deadline=0.2, partial=True))
+
+    assert result["topics_searched"] == ["a", "b"]
+    assert [x["headline"] for x in result["items"]] == ["a", "b"]
+    assert result["timings"]["partial"] is True
+    assert result["timings"]["topics"]["a"]["sources"]["serpapi"]["error"] == "deadline exceeded"
+
+def test_scrape_cache_coalesces_and_serves_stale():
+    calls = []
+    async def fetcher():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return [{"headline": f"v{len(calls)}"}], None
+
+    async def run():
+        cache = scrape.ScrapeCache(ttl=60, stale=60)
+        first = await asyncio.gather(*(cache.get_or_fetch("k", fetcher) for _ in range(5)))
+
+        # Age the entry past its TTL: served stale, refreshed in the background
+        entry = await cache._read("k")
+        entry["fetched_at"] -= 90
+        await cache.backend.mset({"k": scrape.json.dumps(entry).encode()})
+        stale = await cache.get_or_fetch("k", fetcher)
+        await asyncio.sleep(0.05)
+        fresh = await cache.get_or_fetch("k", fetcher)
+        return first, stale, fresh, cache.counters
+
+    first, stale, fresh, counters = asyncio.run(run())
+
+    assert len(calls) == 2
+    assert {status for _, _, status in first} == {"miss"}
+    assert counters["coalesced"] == 4
+    assert stale == ([{"headline": "v1"}], None, "stale")
+    assert fresh == ([{"headline": "v2"}], None, "hit")
+
+def test_ai_search_pages_fetched_concurrently_up_to_budget(monkeypatch):
+    skips = []
+    async def fake_fetch(session, url, params=None, headers=None):
+        skips.append(params.get("$skip", 0))
+        await asyncio.sleep(0.01)
+        return {"value": [{"title": f"{params.get('$skip', 0)}-{i}", "link": "u"} for i in range(params["$top"])]}
+
+    monkeypatch.setattr(scrape, "fetch", fake_fetch)
+    monkeypatch.setattr(scrape, "SCRAPE_ITEM_BUDGET", 70)
+    monkeypatch.setattr(scrape, "AI_ENDPOINT", "https://search.example")
+    monkeypatch.setattr(scrape, "AI_SEARCH_PAGE_SIZE", 30)
+
+    async def run():
+        limit = asyncio.Semaphore(10)
+        return await scrape._fetch_pages(None, "ai-search", "t", limit, limit)
+
+    items = asyncio.run(run())
+    assert sorted(skips) == [0, 30, 60]
+    assert len(items) == 70
+
+class _Response:
+    def __init__(self, status, headers, data=None):
+        self.status, self.headers, self._data = status, headers, data
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    async def json(self):
+        return self._data
+
+class _Session:
+    def __init__(self):
+        self.sent = []
+
+    def get(self, url, params=None, headers=None):
+        self.sent.append(headers)
+        if headers.get("If-None-Match") == '"v1"':
+            return _Response(304, {"ETag": '"v1"'})
+        return _Response(200, {"ETag": '"v1"'}, {"n": len(self.sent)})
+
+def test_fetch_revalidates_with_etag():
+    session = _Session()
+    first = asyncio.run(scrape.fetch(session, "https://etag.example/x", params={"q": "a"}))
+    second = asyncio.run(scrape.fetch(session, "https://etag.example/x", params={"q": "a"}))
+
+    assert first == second == {"n": 1}
+    assert "If-None-Match" not in session.sent[0]
+    assert session.sent[1]["If-None-Match"] == '"v1"'
+
+def test_validator_cache_is_bounded_by_bytes():
+    cache = scrape.ValidatorCache(maxsize=10, maxbytes=10)
+    cache.set("a", '"a"', None, b"12345")
+    cache.set("b", '"b"', None, b"123456")
+    cache.set("huge", '"h"', None, b"x" * 11)
+
+    assert cache.get("a") is None and cache.get("huge") is None
+    assert cache.get("b") == ('"b"', None, b"123456") and cache.bytes == 6
@@ -0,0 +1,78 @@
+import asyncio
+import numpy as np
+from app.seen import SeenIndex
+
+def test_seen_index_matches_by_vector_or_url_within_window(tmp_path):
+    rng = np.random.default_rng(0)
+    old = rng.standard_normal((3, 16)).astype(np.float32)
+    other = rng.standard_normal((2, 16)).astype(np.float32)
+    index = SeenIndex(path=str(tmp_path), window_days=1, threshold=0.9)
+
+    async def run():
+        await index.add(old, ["https://a", "https://b", "https://c"], now=1000.0)
+        query = np.vstack([old[0] + 0.01, other])
+        mask = await index.seen(query, ["https://x", "https://b", "https://y"], now=2000.0)
+        expired = await index.seen(query, ["https://x", "https://b", "https://y"], now=1000.0 + 2 * 86400)
+        return mask, expired
+
+    mask, expired = asyncio.run(run())
+    assert mask.tolist() == [True, True, False]
+    assert expired.tolist() == [False, False, False]
+
+    # Reopened from disk
+    reopened = SeenIndex(path=str(tmp_path), window_days=1, threshold=0.9)
+    assert asyncio.run(reopened.seen(old[2:], ["https://z"], now=1500.0)).tolist() == [True]
+    assert asyncio.run(reopened.evict(now=1000.0 + 2 * 86400)) == 3
+    assert reopened.stats()["size"] == 0
+
+def test_seen_index_is_shared_between_processes_on_one_directory(tmp_path):
+    # Two instances stand in for two workers mapping the same files
+    rng = np.random.default_rng(1)
+    vectors = rng.standard_normal((2, 16)).astype(np.float32)
+    worker_a = SeenIndex(path=str(tmp_path), window_days=1)
+    worker_b = SeenIndex(path=str(tmp_path), window_days=1)
+
+    async def run():
+        await worker_a.add(vectors[:1], ["https://a"], now=1000.0)
+        await worker_b.add(vectors[1:], ["https://b"], now=1001.0)
+        return await worker_a.seen(vectors, ["https://x", "https://y"], now=1002.0)
+
+    assert asyncio.run(run()).tolist() == [True, True]
+    assert worker_a.stats()["size"] == worker_b.stats()["size"] == 2
+
+def test_discover_only_marks_returned_items_as_seen(monkeypatch, tmp_path):
+    import json
+    from app import main, seen
+
+    async def fake_embed(texts, provider="local"):
+        # One orthogonal direction per headline: nothing is a near-duplicate
+        return np.eye(32, dtype=np.float32)[[int(t.split("#")[1]) for t in texts]]
+
+    async def fake_search(interest, top_k=3):
+        return [("seo", 1.0)]
+
+    async def fake_gather(topics, live=True):
+        items = [{"source": "reddit", "headline": f"story #{i}", "url": f"https://x/{i}", "topic": "seo",
+                  "score": i} for i in range(25)]
+        return {"items": items, "timings": {"topics": {"seo": {"ms": 1.0}}}}
+
+    async def no_dedupe(items):
+        return items
+
+    monkeypatch.setattr(seen, "embed_texts", fake_embed)
+    monkeypatch.setattr(main, "seen_index", seen.SeenIndex(path=str(tmp_path)))
+    monkeypatch.setattr(main.topic_index, "search", fake_search)
+    monkeypatch.setattr(main, "_gather", fake_gather)
+    monkeypatch.setattr(main, "dedupe_headlines", no_dedupe)
+
+    async def call():
+        response = await main.discover_trends(interest="seo", exclude_seen=True, live=True)
+        return json.loads(response.body)
+
+    first = asyncio.run(call())
+    second = asyncio.run(call())
+
+    assert len(first["trending_content"]) == 20 and first["excluded_seen"] == 0
+    assert second["excluded_seen"] == 20 and len(second["trending_content"]) == 5
+    returned = {item["url"] for item in first["trending_content"]}
+    assert not returned & {item["url"] for item in second["trending_content"]}
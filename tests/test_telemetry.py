@@ -0,0 +1,30 @@
+import asyncio
+from app import telemetry
+
+def test_instrumented_feeds_histogram_and_server_timing(monkeypatch):
+    monkeypatch.setattr(telemetry, "stage_seconds", telemetry.Histogram("t_seconds", "test", buckets=(0.5, 1)))
+    monkeypatch.setattr(telemetry, "stage_errors", telemetry.Counter("t_errors_total", "test"))
+
+    @telemetry.instrumented("fetch", upstream=lambda url: url.split("/")[2])
+    async def fetch(url):
+        if "bad" in url:
+            raise ValueError(url)
+        return url
+
+    async def run():
+        timings = telemetry.start_request()
+        await fetch("https://www.reddit.com/r/x")
+        try:
+            await fetch("https://bad.example/x")
+        except ValueError:
+            pass
+        return timings
+
+    timings = asyncio.run(run())
+    assert [stage for stage, _ in timings] == ["fetch", "fetch"]
+    assert telemetry.server_timing_header(timings).startswith("fetch;dur=")
+
+    text = "\n".join(telemetry.stage_seconds.render() + telemetry.stage_errors.render())
+    assert 't_seconds_bucket{stage="fetch",upstream="www.reddit.com",le="0.5"} 1' in text
+    assert 't_seconds_count{stage="fetch",upstream="bad.example"} 1' in text
+    assert 't_errors_total{stage="fetch",upstream="bad.example"} 1' in text
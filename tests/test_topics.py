@@ -0,0 +1,30 @@
+import asyncio
+import numpy as np
+from app import topics
+
+VECTORS = {
+    "ai": [1, 0, 0],
+    "tiktok": [0, 1, 0],
+    "privacy": [0, 0, 1],
+    "ai tools": [0.9, 0.1, 0],
+}
+
+def test_search_and_incremental_reload(monkeypatch):
+    embedded = []
+    async def fake_embed_texts(texts, provider="local"):
+        embedded.extend(texts)
+        return np.array([VECTORS[t] for t in texts], dtype=np.float32)
+    monkeypatch.setattr(topics, "embed_texts", fake_embed_texts)
+
+    async def run():
+        index = topics.TopicIndex()
+        await index.load(["ai", "tiktok"])
+        assert await index.add(["tiktok", "privacy"]) == 1
+        results = await index.search("ai tools", top_k=2)
+        return index, results
+
+    index, results = asyncio.run(run())
+
+    assert index.topics == ["ai", "tiktok", "privacy"]
+    assert [t for t, _ in results] == ["ai", "tiktok"]
+    assert embedded == ["ai", "tiktok", "privacy", "ai tools"]
@@ -0,0 +1,57 @@
+import asyncio, subprocess, sys
+from app import cache, embeddings, generate, warmup
+from app.topics import TopicIndex
+
+def test_import_does_not_load_heavy_dependencies():
+    code = ("import sys, app; "
+            "print(','.join(m for m in ('numpy', 'langchain_openai', 'sentence_transformers') if m in sys.modules))")
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == ""
+
+def test_ready_after_background_warm_up(monkeypatch):
+    gate = {}
+    async def slow_warm_up():
+        await gate["event"].wait()
+
+    monkeypatch.setattr(embeddings, "EMBED_WARMUP", False)
+    monkeypatch.setattr(generate, "warm_up", slow_warm_up)
+    monkeypatch.setattr(generate, "llm_ready", lambda: True)
+
+    async def run():
+        gate["event"] = asyncio.Event()
+        warmup.start()
+        await asyncio.sleep(0)
+        before = warmup.status()["ready"]
+        gate["event"].set()
+        await warmup._state["task"]
+        return before, warmup.status()
+
+    before, after = asyncio.run(run())
+    assert before is False
+    assert after["ready"] is True and after["warmup_ms"] is not None
+
+def test_not_ready_when_a_warm_up_load_fails(monkeypatch):
+    def broken_loader():
+        raise RuntimeError("model download failed")
+
+    async def no_llm():
+        pass
+
+    monkeypatch.setattr(embeddings, "EMBED_WARMUP", True)
+    monkeypatch.setitem(embeddings._LOADERS, "local", broken_loader)
+    monkeypatch.setattr(embeddings, "_models", {})
+    monkeypatch.setattr(embeddings, "_status", {})
+    monkeypatch.setattr(generate, "warm_up", no_llm)
+    monkeypatch.setattr(generate, "llm_ready", lambda: True)
+    # Keep the topic catalogue load off the on-disk cache
+    monkeypatch.setattr(cache, "_backend", cache.MemoryKV())
+    monkeypatch.setattr(warmup, "topic_index", TopicIndex())
+
+    async def run():
+        warmup.start()
+        await warmup._state["task"]
+        return warmup.status()
+
+    status = asyncio.run(run())
+    assert status["ready"] is False and status["failed"] == ["embeddings"]
+    assert status["models"] == {"local": "error"}